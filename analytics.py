@@ -0,0 +1,188 @@
+# analytics.py
+
+import numpy as np
+import pandas as pd
+
+from constants import MTS_CATEGORIES
+
+TREND_FREQUENCIES = {"Tag": "day", "Woche": "week", "Monat": "month"}
+DURATION_QUANTILES = [0.5, 0.9]
+
+
+def build_case_frame(cases):
+    """Überführt Fälle einmalig in ein spaltenorientiertes DataFrame für die Auswertungen.
+
+    Pro Fall bleiben nur die Kennzahlen (Anzahlen statt Testlisten); Diagnose und MTS-Kategorie
+    sind kategorial, Zeitstempel liegen als datetime64 mit vorberechneten Tag/Woche/Monat-Spalten vor.
+    ``duration`` ist die erwartete Durchlaufzeit bei Eingang (``expected_tat``); Fälle ohne diesen
+    Wert (Import, Altfälle) gehen mit ihrer reinen Messdauer (``estimated_total_duration``) ein.
+    Spaltenspeicher (``column_arrays``) werden direkt übernommen, ohne einzelne Fälle zu lesen.
+    """
+    if hasattr(cases, 'column_arrays'):
+        return _frame_from_columns(cases.column_arrays())
+    cases = list(cases)
+    return _case_frame(
+        created=pd.to_datetime(pd.Series([c.get('created_date') for c in cases], dtype=object), format='ISO8601', errors='coerce'),
+        diagnosis=pd.Categorical([c.get('suspected_diagnosis') or "" for c in cases]),
+        mts_category=pd.Categorical([c.get('mts_category') for c in cases], categories=MTS_CATEGORIES, ordered=True),
+        tests=np.fromiter((len(c.get('ordered_tests') or ()) for c in cases), dtype=np.int32, count=len(cases)),
+        missing=np.fromiter((len(c.get('missing_tests') or ()) for c in cases), dtype=np.int32, count=len(cases)),
+        unnecessary=np.fromiter((len(c.get('unnecessary_tests') or ()) for c in cases), dtype=np.int32, count=len(cases)),
+        duration=np.fromiter((_case_duration(c) for c in cases), dtype=np.int32, count=len(cases)),
+    )
+
+def _case_duration(case):
+    tat = case.get('expected_tat')
+    return tat if tat is not None else (case.get('estimated_total_duration') or 0)
+
+def _recode(codes, strings, categories=None, missing=None):
+    # Codes des Spaltenspeichers (Index in ``strings``, -1 = fehlt) -> Kategorie-Codes
+    used, inverse = np.unique(codes, return_inverse=True)
+    labels = [strings[code] if code >= 0 else missing for code in used]
+    if categories is None:
+        categories = sorted({label for label in labels if label is not None})
+    position = {label: i for i, label in enumerate(categories)}
+    remap = np.array([position.get(label, -1) for label in labels], dtype=np.int64)
+    return remap[inverse.reshape(-1)] if len(remap) else np.zeros(0, dtype=np.int64), categories
+
+def _frame_from_columns(columns):
+    strings = columns['strings']
+    diagnosis_codes, diagnoses = _recode(columns['suspected_diagnosis_codes'], strings, missing="")
+    mts_codes, _ = _recode(columns['mts_category_codes'], strings, categories=MTS_CATEGORIES)
+    return _case_frame(
+        created=pd.Series(columns['created']),
+        diagnosis=pd.Categorical.from_codes(diagnosis_codes, categories=diagnoses),
+        mts_category=pd.Categorical.from_codes(mts_codes, categories=MTS_CATEGORIES, ordered=True),
+        tests=columns['n_ordered_tests'],
+        missing=columns['n_missing_tests'],
+        unnecessary=columns['n_unnecessary_tests'],
+        duration=np.where(columns['tat'] >= 0, columns['tat'], columns['duration']),
+    )
+
+def _case_frame(created, diagnosis, mts_category, tests, missing, unnecessary, duration):
+    day = created.dt.floor('D')
+    return pd.DataFrame({
+        "created": created,
+        "day": day,
+        "week": day - pd.to_timedelta(day.dt.weekday, unit='D'),
+        "month": day - pd.to_timedelta(day.dt.day - 1, unit='D'),
+        "diagnosis": diagnosis,
+        "mts_category": mts_category,
+        "tests": tests,
+        "missing": missing,
+        "unnecessary": unnecessary,
+        "compliant": missing == 0,
+        "over_ordered": unnecessary > 0,
+        "duration": duration,
+    })
+
+def filter_frame(df, mts_categories=None, diagnoses=None, start=None, end=None):
+    """Filtert per boolescher Maske; ``start``/``end`` sind Tage (inklusive)."""
+    mask = np.ones(len(df), dtype=bool)
+    if mts_categories:
+        mask &= df['mts_category'].isin(mts_categories).to_numpy()
+    if diagnoses:
+        mask &= df['diagnosis'].isin(diagnoses).to_numpy()
+    if start is not None:
+        mask &= (df['day'] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (df['day'] <= pd.Timestamp(end)).to_numpy()
+    return df[mask]
+
+def summary(df):
+    """Globale Kennzahlen der (gefilterten) Fälle."""
+    if df.empty:
+        return {"cases": 0, "tests": 0, "compliance": 0.0, "overOrdering": 0.0, "medianDuration": 0.0}
+    return {
+        "cases": len(df),
+        "tests": int(df['tests'].sum()),
+        "compliance": float(df['compliant'].mean()),
+        "overOrdering": float(df['over_ordered'].mean()),
+        "medianDuration": float(df['duration'].median()),
+    }
+
+def _group_codes(df, by):
+    column = df[by]
+    codes = column.cat.codes.to_numpy().astype(np.int64)
+    valid = codes >= 0
+    if valid.all():
+        return codes, column.cat.categories, slice(None)
+    return codes[valid], column.cat.categories, valid
+
+def _duration_counts(codes, durations):
+    """Dünnes Histogramm: nur vorkommende (Gruppe, Dauer)-Paare mit Anzahl, sortiert nach Gruppe und Dauer.
+
+    Der Speicher wächst mit der Zahl verschiedener Paare (höchstens der Fallzahl), nicht mit
+    Gruppen × längster Dauer wie ein dichtes Histogramm.
+    """
+    width = int(durations.max()) + 1 if len(durations) else 1
+    keys, counts = np.unique(codes.astype(np.int64) * width + durations, return_counts=True)
+    return keys // width, keys % width, counts
+
+def _histogram_quantile(histogram, groups, q):
+    # Kleinster Wert, bis zu dem mindestens q aller Fälle der Gruppe reichen (Rangwert)
+    group_of, durations, counts = histogram
+    result = np.zeros(groups)
+    if not len(counts):
+        return result
+    totals = np.bincount(group_of, weights=counts, minlength=groups)
+    group_start = np.concatenate(([0], np.cumsum(totals)))[group_of]
+    reached = np.cumsum(counts) - group_start >= np.maximum(q * totals, 1)[group_of]
+    positions = np.flatnonzero(reached)
+    found, first = np.unique(group_of[positions], return_index=True)
+    result[found] = durations[positions[first]]
+    return result
+
+def cohort_stats(df, by):
+    """Kennzahlen je Kohorte (``by`` = 'diagnosis' oder 'mts_category').
+
+    Alle Summen laufen per ``np.bincount`` über die Kategorie-Codes, die Quantile der
+    Durchlaufzeit über ein dünnes Histogramm je Gruppe; nur Kohorten mit Fällen erscheinen im Ergebnis.
+    """
+    codes, categories, valid = _group_codes(df, by)
+    groups = len(categories)
+
+    def total(column):
+        return np.bincount(codes, weights=df[column].to_numpy()[valid], minlength=groups)
+
+    cases = np.bincount(codes, minlength=groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats = pd.DataFrame({
+            "cases": cases,
+            "tests": total('tests').astype(np.int64),
+            "tests_per_case": total('tests') / cases,
+            "compliance": total('compliant') / cases,
+            "over_ordering": total('over_ordered') / cases,
+            "missing_tests": total('missing').astype(np.int64),
+            "unnecessary_tests": total('unnecessary').astype(np.int64),
+            "duration_mean": total('duration') / cases,
+        }, index=pd.CategoricalIndex(categories, categories=categories, ordered=df[by].cat.ordered, name=by))
+    histogram = _duration_counts(codes, df['duration'].to_numpy()[valid])
+    for q in DURATION_QUANTILES:
+        stats[f"duration_p{int(q * 100)}"] = _histogram_quantile(histogram, groups, q)
+    return stats[cases > 0]
+
+def duration_distribution(df, by='mts_category'):
+    """Häufigkeit der Durchlaufzeit (Minuten, siehe ``build_case_frame``) je Kohorte: Zeilen = Dauer, Spalten = Kohorte.
+
+    Nur vorkommende Dauern und Kohorten erscheinen; gedacht für wenige Kohorten wie die MTS-Kategorien.
+    """
+    if df.empty:
+        return pd.DataFrame()
+    codes, categories, valid = _group_codes(df, by)
+    group_of, durations, counts = _duration_counts(codes, df['duration'].to_numpy()[valid])
+    used_groups, group_index = np.unique(group_of, return_inverse=True)
+    used_durations, duration_index = np.unique(durations, return_inverse=True)
+    table = np.zeros((len(used_durations), len(used_groups)), dtype=np.int64)
+    table[duration_index, group_index] = counts
+    return pd.DataFrame(table, index=pd.Index(used_durations, name="duration"), columns=categories[used_groups])
+
+def trend(df, frequency='day'):
+    """Fälle, Compliance- und Überanforderungsrate je Zeitintervall ('day', 'week', 'month')."""
+    grouped = df.groupby(frequency, sort=True)
+    return grouped.agg(
+        cases=('tests', 'size'),
+        compliance=('compliant', 'mean'),
+        over_ordering=('over_ordered', 'mean'),
+        duration_mean=('duration', 'mean'),
+    )
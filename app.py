@@ -1,21 +1,23 @@
 # app.py
 
 import streamlit as st
-from utils import init_state, custom_css, MTS_COLOR_MAP, delete_case, update_case, MTS_CATEGORIES, LAB_CATEGORIES_BADGE_MAP
-from datetime import datetime
+from utils import init_state, finish_rerun, get_case_service, custom_css, render_jobs, case_export, EXPORT_DOWNLOAD_LIMIT, STORAGE_DB_ENV, CASE_PAGE_SIZES, MTS_COLOR_MAP, delete_case, update_case, get_recommendation_provider, evaluate_quality, lab_test_options, MTS_CATEGORIES, LAB_CATEGORIES_BADGE_MAP
+from instrumentation import section
+from exporter import export_file_name
 import time
 
 # Setup
 st.set_page_config(layout="wide", page_title="LabAssist Dashboard | Kritische Übersicht")
-init_state() 
+init_state("Dashboard")
 custom_css()
 
 # --- Datenabruf ---
-cases = st.session_state.patient_cases
-lab_tests = st.session_state.lab_tests
-recommendations = st.session_state.recommendations
+section("Datenabruf")
+case_service = get_case_service()
+cases = case_service.cases
 
 # --- Header Section (Fixed, Bombastisch) ---
+section("Header")
 st.markdown(f"""
     <div class="main-header">
         <div style="display: flex; align-items: center; gap: 1rem;">
@@ -36,17 +38,16 @@ st.markdown(f"""
 # Platzhalter für den fixed Header
 st.markdown('<div class="header-spacer"></div>', unsafe_allow_html=True)
 
+# Laufende Hintergrundjobs dieser Session (z.B. Neubewertung nach Regeländerung)
+render_jobs()
+
 # --- Dashboard Hauptbereich ---
 with st.container(border=False):
     st.markdown('<div class="max-w-7xl mx-auto py-0">', unsafe_allow_html=True)
 
-    # --- Stats Calculation ---
-    stats = {
-        "totalCases": len(cases),
-        "averageTests": (sum(len(c.get('ordered_tests', [])) for c in cases) / len(cases) if len(cases) > 0 else 0),
-        "casesWithWarnings": sum(1 for c in cases if c.get('missing_tests', []) or c.get('unnecessary_tests', [])),
-        "avgDuration": (sum(c.get('estimated_total_duration', 0) for c in cases) / len(cases) if len(cases) > 0 else 0)
-    }
+    # --- Stats (laufend gepflegt vom CaseService, siehe domain.CaseStats) ---
+    section("Stats")
+    stats = case_service.stats.as_dict()
 
     # --- Stats Cards Section (4 Columns) ---
     st.markdown("## Kritische Metriken 📊")
@@ -97,9 +98,37 @@ with st.container(border=False):
         </div>
         """, unsafe_allow_html=True)
 
+    # --- Export (Audit) ---
+    section("Export")
+    with st.expander("Fälle exportieren 📥"):
+        col_format, col_compress, col_download = st.columns([2, 2, 3], vertical_alignment="bottom")
+        with col_format:
+            export_format = st.selectbox("Format", options=['csv', 'parquet'], format_func=str.upper, key="export_format")
+        with col_compress:
+            export_compress = st.checkbox("Komprimieren", value=True, key="export_compress",
+                                          help="CSV als gzip, Parquet mit zstd")
+        export_compression = ('gzip' if export_format == 'csv' else 'zstd') if export_compress else None
+        with col_download:
+            if len(cases) <= EXPORT_DOWNLOAD_LIMIT:
+                st.download_button(
+                    f"{len(cases)} Fälle herunterladen",
+                    data=case_export(export_format, export_compression),
+                    file_name=export_file_name(export_format, export_compression),
+                    mime="text/csv" if export_format == 'csv' and not export_compression else "application/octet-stream",
+                    on_click="ignore",
+                    key="export_download",
+                )
+        if len(cases) > EXPORT_DOWNLOAD_LIMIT:
+            # Der Browser-Download hält die ganze Datei im Speicher des Servers; große Bestände über die Kommandozeile
+            compression_option = f" --compression {export_compression}" if export_compression else ""
+            st.info(f"{len(cases)} Fälle sind zu viele für den Download im Browser. Export direkt in eine Datei:", icon="ℹ️")
+            st.code(f"python exporter.py {export_file_name(export_format, export_compression)} --format {export_format}"
+                    f"{compression_option} --db ${STORAGE_DB_ENV}", language="bash")
+
     st.markdown("---") 
 
     # --- Recent Cases Section (Card) ---
+    section("Fallliste")
     st.markdown('<div class="stCard-custom">', unsafe_allow_html=True)
     st.markdown('<div class="stCard-header">Letzte Fälle 🩺</div>', unsafe_allow_html=True)
     st.markdown('<div class="stCard-content">', unsafe_allow_html=True)
@@ -114,9 +143,12 @@ with st.container(border=False):
             </div>
         """, unsafe_allow_html=True)
     else:
-        sorted_cases = sorted(cases, key=lambda x: datetime.fromisoformat(x['created_date']), reverse=True)
+        # Nur die sichtbare Seite rendern; der Fallspeicher hält einen nach Erstellungszeit sortierten Index und gecachte Datumstexte
+        page_size = st.session_state.cases_page_size
+        page_count = (len(cases) + page_size - 1) // page_size
+        st.session_state.cases_page = max(0, min(st.session_state.cases_page, page_count - 1))
         
-        for case_item in sorted_cases:
+        for case_item in cases.page(st.session_state.cases_page * page_size, page_size):
             mts_style = f'background-color: {MTS_COLOR_MAP.get(case_item["mts_category"], "#94A3B8")};'
             
             has_warnings = bool(case_item.get('missing_tests') or case_item.get('unnecessary_tests'))
@@ -157,7 +189,7 @@ with st.container(border=False):
                     """, unsafe_allow_html=True)
 
             with col_date_buttons:
-                st.markdown(f'<p style="text-align: right; color: #64748B; font-size: 0.75rem;">{datetime.fromisoformat(case_item["created_date"]).strftime("%d.%m.%Y, %H:%M")}</p>', unsafe_allow_html=True)
+                st.markdown(f'<p style="text-align: right; color: #64748B; font-size: 0.75rem;">{case_item.created_label}</p>', unsafe_allow_html=True)
                 
                 # Buttons
                 col_edit_btn, col_delete_btn = st.columns(2)
@@ -195,11 +227,26 @@ with st.container(border=False):
 
             st.markdown('</div>', unsafe_allow_html=True) # End case item container
 
+        # --- Seitennavigation ---
+        col_prev, col_page_info, col_page_size, col_next = st.columns([0.2, 0.4, 0.2, 0.2])
+        with col_prev:
+            st.button("← Neuere", key="cases_page_prev", disabled=st.session_state.cases_page == 0, use_container_width=True,
+                      on_click=lambda: st.session_state.update(cases_page=st.session_state.cases_page - 1))
+        with col_page_info:
+            st.markdown(f'<p style="text-align: center; color: #64748B; font-size: 0.875rem;">Seite {st.session_state.cases_page + 1} von {page_count} ({len(cases)} Fälle)</p>', unsafe_allow_html=True)
+        with col_page_size:
+            st.selectbox("Fälle pro Seite", options=CASE_PAGE_SIZES, key="cases_page_size", label_visibility="collapsed",
+                         on_change=lambda: st.session_state.update(cases_page=0))
+        with col_next:
+            st.button("Ältere →", key="cases_page_next", disabled=st.session_state.cases_page >= page_count - 1, use_container_width=True,
+                      on_click=lambda: st.session_state.update(cases_page=st.session_state.cases_page + 1))
+
     st.markdown('</div>', unsafe_allow_html=True) 
     st.markdown('</div>', unsafe_allow_html=True)
 
 
     # --- Quick Links Section ---
+    section("Quick Links")
     st.markdown("## Management-Tools 🛠️")
     col_links_1, col_links_2 = st.columns(2)
 
@@ -227,16 +274,18 @@ with st.container(border=False):
 
 
 # --- Edit Dialog (Modal-Simulation) ---
+section("Bearbeiten-Dialog")
 if st.session_state.get('edit_dialog_open', False) and st.session_state.get('edit_case_id'):
     # Verwenden Sie ein leeres st.container(), um den Inhalt des Modals zu kapseln
     with st.container():
         case_id = st.session_state.edit_case_id
-        current_case = next((c for c in cases if c['id'] == case_id), None)
+        current_case = cases.get(case_id)
 
         if current_case:
             st.subheader(f"Fall {current_case.get('case_number', 'N/A')} bearbeiten")
             
-            with st.form(key="edit_case_form", clear_on_submit=False):
+            # Kein st.form: die Testsuche muss die Auswahlliste ohne Absenden aktualisieren können
+            with st.container(border=True, key="edit_case_form"):
                 # Patienteninformationen
                 st.markdown("#### Patientendaten")
                 col_p1, col_p2, col_p3 = st.columns(3)
@@ -258,7 +307,7 @@ if st.session_state.get('edit_dialog_open', False) and st.session_state.get('edi
                 
                 # Vitalparameter
                 st.markdown("#### Vitalparameter")
-                current_vitals = current_case.get('vitals', {})
+                current_vitals = current_case.get('vitals') or {}  # Importierte Fälle können ohne Vitalparameter sein
                 col_v1_edit, col_v2_edit = st.columns(2)
                 with col_v1_edit:
                     edited_blood_pressure = st.text_input("Blutdruck (mmHG)", value=current_vitals.get('blood_pressure', ''), key="edit_bp")
@@ -271,10 +320,11 @@ if st.session_state.get('edit_dialog_open', False) and st.session_state.get('edi
 
                 # Angeforderte Tests
                 st.markdown("#### Angeforderte Tests")
-                all_lab_test_codes = [t['test_code'] for t in lab_tests]
+                edit_test_query = st.text_input("Labortest suchen", key="edit_test_search_query",
+                                                placeholder="Code, Name oder Kategorie, z.B. 'trop' oder 'gerinnung'")
                 edited_ordered_tests = st.multiselect(
                     "Aktuell angeforderte Tests",
-                    options=all_lab_test_codes,
+                    options=lab_test_options(edit_test_query, keep=st.session_state.get('edit_ordered_tests', current_case.get('ordered_tests', []))),
                     default=current_case.get('ordered_tests', []),
                     key="edit_ordered_tests",
                     help="Wählen Sie die Tests, die aktuell für diesen Fall durchgeführt werden sollen. Die Qualitätsprüfung basiert auf der Verdachtsdiagnose."
@@ -283,33 +333,25 @@ if st.session_state.get('edit_dialog_open', False) and st.session_state.get('edi
                 # Speichern und Abbrechen
                 col_dialog_buttons_1, col_dialog_buttons_2 = st.columns(2)
                 with col_dialog_buttons_1:
-                    if st.form_submit_button("Speichern", type="primary"):
-                        # Logik zur Neuberechnung der Qualität (siehe utils.py)
-                        matching_rec = next((r for r in recommendations if r['diagnosis_name'].lower() == edited_suspected_diagnosis.lower() and r['mts_category'] == edited_mts_category), None)
-                        
-                        missing, unnecessary, max_duration = [], [], 0
-                        
-                        if matching_rec and edited_ordered_tests:
-                            mandatory_tests = matching_rec.get('mandatory_tests', [])
-                            recommended_set = set(matching_rec.get('recommended_tests', []))
-                            optional_test_codes = set(matching_rec.get('optional_tests', []))
-
-                            missing = [t for t in mandatory_tests if t not in edited_ordered_tests]
-                            unnecessary = [t for t in edited_ordered_tests if t not in recommended_set and t not in optional_test_codes]
-                            max_duration = max([t['estimated_duration_minutes'] for t in lab_tests if t['test_code'] in edited_ordered_tests], default=0)
-                        
+                    if st.button("Speichern", key="edit_case_save", type="primary"):
                         updated_data = {
                             "patient_number": edited_patient_number, "age": edited_age, "gender": edited_gender, "mts_category": edited_mts_category,
                             "suspected_diagnosis": edited_suspected_diagnosis, "ordered_tests": edited_ordered_tests,
-                            "missing_tests": missing, "unnecessary_tests": unnecessary, "estimated_total_duration": max_duration,
                             "vitals": {"blood_pressure": edited_blood_pressure, "temperature": edited_temperature, "heart_rate": edited_heart_rate,
                                        "respiratory_rate": edited_respiratory_rate, "oxygen_saturation": edited_oxygen_saturation, "blood_sugar": edited_blood_sugar}
                         }
+                        # Empfehlung neu bestimmen wie bei der Analyse im Assistenten (Diagnose, MTS-Kategorie oder Vitalwerte können sich geändert haben),
+                        # danach die Qualität dagegen prüfen (siehe utils.py)
+                        matching_rec = get_recommendation_provider().recommend(edited_suspected_diagnosis, edited_mts_category, {**current_case, **updated_data})
+                        updated_data["recommended_tests"] = matching_rec['recommended_tests'] if matching_rec else []
+                        updated_data.update(evaluate_quality(edited_ordered_tests, matching_rec))
                         update_case(case_id, updated_data)
                         st.session_state.edit_dialog_open = False
                         st.toast(f"Fall {current_case['case_number']} aktualisiert.", icon="👍")
                         st.rerun()
                 with col_dialog_buttons_2:
-                    if st.form_submit_button("Abbrechen"):
+                    if st.button("Abbrechen", key="edit_case_cancel"):
                         st.session_state.edit_dialog_open = False
-                        st.rerun()
\ No newline at end of file
+                        st.rerun()
+
+finish_rerun()
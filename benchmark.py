@@ -0,0 +1,218 @@
+# benchmark.py
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import analytics
+import quality
+from constants import MTS_CATEGORIES
+from domain import CaseService, CaseStats, CatalogService, RecommendationService
+from rules import RULE_FIELDS, OPERATORS, VitalRuleEngine
+from storage import SessionStorage, SQLiteStorage
+from synthetic import scaled_dataset, generate_cases
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000]
+DEFAULT_REPEAT = 5
+SEED = 42
+LOOKUPS = 10_000 # Empfehlungsabfragen je Messung
+MUTATIONS = 200 # Fälle je Messung für create/update/delete
+PANEL_SUGGESTIONS = 200 # Sparvorschläge je Messung (Ziel: jeder unter 50 ms)
+VITAL_RULES = 5_000 # synthetische Vitalregeln, gegen die LOOKUPS Fälle ausgewertet werden
+DASHBOARD_PAGE_SIZE = 25
+REGRESSION_THRESHOLD = 1.2 # Median langsamer als Faktor x gegenüber der Vergleichsdatei = Regression
+BENCHMARKS = ['generate', 'load', 'recommendation_lookup', 'panel_suggestion', 'vital_rules', 'quality_evaluation', 'create_case', 'update_case',
+              'delete_case', 'dashboard_stats', 'dashboard_page', 'analytics_frame']
+
+
+# --- Messung ---
+def _timed(fn):
+    gc.collect()
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+def _result(name, size, ops, seconds):
+    best = min(seconds)
+    return {
+        "benchmark": name,
+        "size": size,
+        "ops": ops,
+        "repeat": len(seconds),
+        "min_s": best,
+        "median_s": statistics.median(seconds),
+        "per_op_us": best / ops * 1e6 if ops else None,
+    }
+
+
+# --- Zustand wie init_state, direkt über die Services (ohne Streamlit) ---
+def _open_storage(db_path):
+    # Für jede Größe eine eigene (leere) Datenbank
+    return SQLiteStorage(db_path) if db_path else SessionStorage()
+
+def _load_state(storage, data=None):
+    """Entspricht get_catalog_service + init_state: Katalog, Fallbestand und Kennzahlen aufbauen."""
+    if data is None:
+        data = {**storage.load_catalog(), "patient_cases": list(storage.iter_cases())}
+    catalog = CatalogService(storage, data)
+    return catalog, RecommendationService(catalog), CaseService(storage, data['patient_cases'])
+
+
+def _vital_rules(rng, count, test_codes):
+    """Zufällige Vitalregeln mit ein bis drei Bedingungen; Schwellen im Bereich der synthetischen Vitalwerte."""
+    thresholds = {'age': (18, 90), 'heart_rate': (50, 150), 'systolic': (80, 180), 'diastolic': (50, 110),
+                  'temperature': (35.5, 40.5), 'respiratory_rate': (10, 32), 'oxygen_saturation': (85, 100), 'blood_sugar': (60, 250)}
+    return [{
+        "id": str(i),
+        "name": f"Regel {i + 1}",
+        "conditions": [{"field": field, "op": rng.choice(OPERATORS), "value": round(rng.uniform(*thresholds[field]), 1)}
+                       for field in rng.sample(list(RULE_FIELDS), rng.randint(1, 3))],
+        "tests": rng.sample(test_codes, 2),
+        "mts_categories": rng.sample(MTS_CATEGORIES, 2) if rng.random() < 0.3 else [],
+    } for i in range(count)]
+
+
+# --- Benchmarks je Größe ---
+def run_size(size, repeat, only, db_dir=None):
+    results = []
+
+    def record(name, ops, fn, times=repeat):
+        if name in only:
+            results.append(_result(name, size, ops, [_timed(fn) for _ in range(times)]))
+            _report(results[-1])
+
+    data = {}
+    record('generate', size, lambda: data.update(scaled_dataset(size, seed=SEED)), times=1)
+    if not data:
+        data.update(scaled_dataset(size, seed=SEED))
+
+    storage = _open_storage(os.path.join(db_dir, f"bench-{size}.db") if db_dir else None)
+    if isinstance(storage, SQLiteStorage):
+        storage.seed(data)
+        record('load', size, lambda: _load_state(storage))
+    else:
+        record('load', size, lambda: _load_state(storage, data))
+    catalog, recommendation_service, case_service = _load_state(storage, data)
+    snapshot = catalog.snapshot
+
+    rng = random.Random(SEED)
+    recommendations = data['recommendations']
+    queries = [(rec['diagnosis_name'].upper() if rng.random() < 0.5 else rec['diagnosis_name'], rng.choice(MTS_CATEGORIES))
+               for rec in rng.choices(recommendations, k=LOOKUPS)]
+    record('recommendation_lookup', LOOKUPS, lambda: [recommendation_service.find(d, m, snapshot) for d, m in queries])
+    panel_queries = rng.choices(recommendations, k=PANEL_SUGGESTIONS)
+    record('panel_suggestion', PANEL_SUGGESTIONS,
+           lambda: [recommendation_service.suggest_panel(rec, rec['mts_category'], snapshot=snapshot) for rec in panel_queries])
+    engine = VitalRuleEngine(_vital_rules(rng, VITAL_RULES, [test['test_code'] for test in data['lab_tests']]))
+    rule_cases = rng.choices(data['patient_cases'], k=LOOKUPS)
+    record('vital_rules', LOOKUPS, lambda: [engine.match(case) for case in rule_cases])
+
+    by_key = {(rec['diagnosis_name'], rec['mts_category']): rec for rec in recommendations}
+    items = [(case['ordered_tests'], by_key[(case['suspected_diagnosis'], case['mts_category'])]) for case in data['patient_cases']]
+    record('quality_evaluation', len(items), lambda: quality.evaluate_quality_batch(items, snapshot.test_catalog))
+
+    # create -> update -> delete derselben Fälle, damit der Bestand je Wiederholung gleich bleibt
+    template = generate_cases(MUTATIONS, data, seed=SEED + 2)
+    crud = {'create_case': [], 'update_case': [], 'delete_case': []}
+    for _ in range(repeat if crud.keys() & only else 0):
+        new_cases = [dict(case) for case in template]
+        crud['create_case'].append(_timed(lambda: [case_service.create(case) for case in new_cases]))
+        created = [case['id'] for case in new_cases]
+        crud['update_case'].append(_timed(lambda: [case_service.update(case_id, {"age": 50, "symptoms": "Dyspnoe"}) for case_id in created]))
+        crud['delete_case'].append(_timed(lambda: [case_service.delete(case_id) for case_id in created]))
+    for name, seconds in crud.items():
+        if name in only and seconds:
+            results.append(_result(name, size, MUTATIONS, seconds))
+            _report(results[-1])
+
+    cases = case_service.cases
+    record('dashboard_stats', len(cases), lambda: CaseStats(cases).as_dict())
+    record('dashboard_page', DASHBOARD_PAGE_SIZE,
+           lambda: (case_service.stats.as_dict(), [case.created_label for case in cases.page(0, DASHBOARD_PAGE_SIZE)]))
+    record('analytics_frame', len(cases), lambda: analytics.build_case_frame(cases))
+    if isinstance(storage, SQLiteStorage):
+        storage.close()
+    return results
+
+
+# --- Ausgabe & Vergleich ---
+def _report(result):
+    per_op = f"{result['per_op_us']:12.2f} µs/op" if result['per_op_us'] is not None else ""
+    print(f"{result['benchmark']:<22} n={result['size']:<9} median {result['median_s'] * 1000:10.2f} ms  min {result['min_s'] * 1000:10.2f} ms {per_op}", flush=True)
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD, storage=None):
+    """Vergleicht Mediane mit einer früheren Ergebnisdatei; liefert die Liste der Regressionen."""
+    if storage is not None and baseline['meta'].get('storage') != storage:
+        print(f"\nWarnung: Vergleichsdatei nutzt Storage {baseline['meta'].get('storage')!r}, dieser Lauf {storage!r}")
+    previous = {(r['benchmark'], r['size']): r for r in baseline['results']}
+    regressions = []
+    print(f"\nVergleich mit {baseline['meta'].get('revision') or 'Basis'} ({baseline['meta'].get('created')}):")
+    for result in results:
+        old = previous.get((result['benchmark'], result['size']))
+        if old is None or not old['median_s']:
+            continue
+        ratio = result['median_s'] / old['median_s']
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{result['benchmark']:<22} n={result['size']:<9} {old['median_s'] * 1000:10.2f} -> {result['median_s'] * 1000:10.2f} ms  x{ratio:5.2f}{flag}")
+        if flag:
+            regressions.append({**result, "baseline_median_s": old['median_s'], "ratio": ratio})
+    return regressions
+
+
+# --- Kommandozeile ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Misst die Kernpfade (ohne Browser) mit synthetischen Daten und schreibt die Ergebnisse als JSON.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Anzahl Fälle je Lauf (Katalog wächst mit), z.B. 100 1000 1000000")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--storage", choices=['session', 'sqlite'], default='session', help="sqlite: Laden und CRUD gegen eine temporäre Datenbank")
+    parser.add_argument("--output", help="JSON-Ergebnisdatei (Standard: benchmark-<Revision>-<Zeit>.json)")
+    parser.add_argument("--compare", help="Frühere Ergebnisdatei; Regressionen führen zu Exit-Code 1")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    revision = _git_revision()
+    meta = {
+        "created": datetime.now().isoformat(timespec='seconds'),
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": args.storage,
+        "repeat": args.repeat,
+        "seed": SEED,
+    }
+    results = []
+    with tempfile.TemporaryDirectory(prefix="labassist-bench-") as db_dir:
+        for size in args.sizes:
+            results.extend(run_size(size, args.repeat, set(args.only), db_dir if args.storage == 'sqlite' else None))
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold, args.storage)
+
+    output = args.output or f"benchmark-{revision or 'local'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({"meta": meta, "results": results, "regressions": regressions}, f, indent=2, ensure_ascii=False)
+    print(f"\nErgebnisse gespeichert: {output}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
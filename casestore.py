@@ -0,0 +1,500 @@
+# casestore.py
+
+import bisect
+import threading
+from array import array
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from constants import BLOOD_PRESSURE_PATTERN
+
+EPOCH = datetime(1970, 1, 1)
+MISSING = -1
+NAN = float('nan')
+DATE_LABEL_FORMAT = "%d.%m.%Y, %H:%M"
+SMALL_INT_LIMIT = 32768  # Alter, Dauer und ganzzahlige Vitalparameter liegen in int16-Spalten
+LABEL_CACHE_SIZE = 10_000  # Zwischengespeicherte Anzeigetexte von created_date (eine Tabellenseite braucht ~50)
+STRING_FIELDS = ['gender', 'mts_category', 'suspected_diagnosis', 'symptoms']
+INT_VITALS = ['heart_rate', 'respiratory_rate', 'oxygen_saturation', 'blood_sugar']
+VITAL_FIELDS = ['blood_pressure', 'temperature', *INT_VITALS]
+LIST_FIELDS = ['ordered_tests', 'recommended_tests', 'missing_tests', 'unnecessary_tests']
+# Feldreihenfolge der dict-Ansicht (wie von create_case erzeugt)
+FIELDS = ['id', 'case_number', 'patient_number', 'age', 'gender', 'mts_category', 'symptoms', 'vitals',
+          'suspected_diagnosis', *LIST_FIELDS, 'estimated_total_duration', 'expected_tat', 'created_date']
+
+
+class _Interner:
+    """Bildet wiederkehrende Werte (Kategorien, Diagnosen, ganze Testlisten) auf fortlaufende Codes ab."""
+
+    __slots__ = ('codes', 'values')
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def local_naive(moment):
+    """Zeitpunkt als naives datetime in Ortszeit, der Konvention der ganzen App (``datetime.now()``); Zeitzonen werden umgerechnet."""
+    return moment.astimezone().replace(tzinfo=None) if moment.tzinfo is not None else moment
+
+
+def _micros(moment):
+    delta = local_naive(moment) - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _to_micros(value):
+    """ISO-String -> (Mikrosekunden seit 1970 in Ortszeit, verlustfrei rekonstruierbar?); (0, False) bei ungültigen Werten."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return 0, False
+    return _micros(parsed), parsed.tzinfo is None and parsed.isoformat() == value
+
+
+class CaseView(Mapping):
+    """Nur-lesende dict-Ansicht auf eine Zeile des ``CompactCaseStore``.
+
+    Verhält sich für Seiten- und Exportcode wie das bisherige Fall-dict (``get``, ``[]``,
+    ``**case``, ``dict(case)``); Listen und ``vitals`` werden bei jedem Zugriff neu erzeugt.
+    Änderungen laufen über ``replace``, das eine neue Zeile schreibt – bestehende Ansichten
+    zeigen daher weiter den alten Stand, wie zuvor die unveränderten dicts.
+    """
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._store._field(self._row, key)
+
+    def __iter__(self):
+        return iter(self._store._keys(self._row))
+
+    def __len__(self):
+        return len(self._store._keys(self._row))
+
+    def __eq__(self, other):
+        # Gleiche Zeile = gleicher Stand (Zeilen werden nie überschrieben)
+        if isinstance(other, CaseView) and other._store is self._store and other._row == self._row:
+            return True
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    @property
+    def created(self):
+        """Erstellungszeitpunkt als datetime (aus der Zeitstempelspalte, ohne String-Parsing)."""
+        return self._store._created_at(self._row)
+
+    @property
+    def created_label(self):
+        """Anzeigetext des Erstellungszeitpunkts (``DATE_LABEL_FORMAT``), je Zeile einmal formatiert."""
+        return self._store._created_label(self._row)
+
+    def __repr__(self):
+        return f"CaseView({dict(self)!r})"
+
+
+class CompactCaseStore:
+    """Spaltenorientierter Fallspeicher mit derselben Schnittstelle wie ``domain.RecordStore``.
+
+    Eine Zeile belegt nur Array-Einträge: Zeitstempel als Mikrosekunden (int64), Alter und
+    Vitalparameter als Zahlenspalten (-1 = fehlt), Kategorien, Diagnosen, Symptome und ganze
+    Testlisten als Codes auf gemeinsam genutzte Werte (jede Testliste hat zusätzlich eine
+    Bitmaske). Ids und Patientennummern bleiben Strings. Werte, die nicht verlustfrei in
+    die Spalten passen (z.B. Zeitzonen, Kommazahlen, Zusatzfelder), liegen in ``_extra``.
+
+    Ersetzte und gelöschte Zeilen bleiben bis ``compact`` liegen, damit ausgegebene Ansichten
+    gültig bleiben. Wie ``RecordStore`` mit Sortierindex nach ``created_date`` und optionalem
+    Gruppenindex (``group_key``).
+    """
+
+    def __init__(self, records=(), group_key=None):
+        self.version = 0
+        self._ids = []
+        self._rows = {}  # Id -> aktuelle Zeile
+        self._created = array('q')
+        self._case_prefix = array('i')
+        self._case_counter = array('q')
+        self._patient_numbers = []
+        self._age = array('h')
+        self._strings = _Interner()  # Kategorien, Diagnosen, Symptome, Präfixe
+        self._string_columns = {field: array('i') for field in STRING_FIELDS}
+        self._systolic = array('h')
+        self._diastolic = array('h')
+        self._temperature = array('d')
+        self._int_vitals = {field: array('h') for field in INT_VITALS}
+        self._test_lists = _Interner()  # Tupel von Testcodes
+        self._list_masks = []
+        self._test_bits = {}
+        self._lists = {field: array('i') for field in LIST_FIELDS}
+        self._duration = array('h')
+        self._tat = array('h')  # Erwartete Durchlaufzeit bei Eingang (tat.py), fehlt bei Altfällen
+        self._extra = {}  # Zeile -> {Feld: Originalwert}
+        self._labels = {}  # Zeile -> Anzeigetext von created_date
+        self._labels_lock = threading.Lock()  # Leser füllen den Cache ohne die Sperre des Dienstes
+        self._order = []  # Zeilen, sortiert nach (created_date, id)
+        self._group_key = group_key
+        self._groups = {} if group_key is not None else None
+        # Erstbefüllung: erst alle Zeilen schreiben, dann einmal sortieren
+        for record in records:
+            self._rows[record['id']] = self._append(record)
+        self._order = sorted(self._rows.values(), key=self._sort_key)
+        if self._groups is not None:
+            for record_id, row in self._rows.items():
+                self._groups.setdefault(self._group_key(CaseView(self, row)), set()).add(record_id)
+
+    # --- Kodierung ---
+    def _list_code(self, values):
+        code = self._test_lists.code(tuple(values))
+        if code == len(self._list_masks):
+            mask = 0
+            for test_code in values:
+                mask |= self._test_bits.setdefault(test_code, 1 << len(self._test_bits))
+            self._list_masks.append(mask)
+        return code
+
+    def _append(self, record):
+        row = len(self._ids)
+        get = record.get
+        strings = self._strings.codes
+        extra = {field: value for field, value in record.items() if value is None or field not in FIELDS}
+
+        created_date = get('created_date')
+        micros, exact = _to_micros(created_date)
+        if not exact:
+            extra['created_date'] = created_date
+        self._created.append(micros)
+
+        # Fallnummer "<Präfix>-<Zähler>" als Präfix-Code + Zahl, sofern exakt rekonstruierbar
+        case_number = get('case_number')
+        prefix, _, counter = case_number.rpartition('-') if isinstance(case_number, str) else ('', '', '')
+        if prefix and counter.isdigit() and f"{int(counter):02}" == counter:
+            self._case_prefix.append(self._strings.code(prefix))
+            self._case_counter.append(int(counter))
+        else:
+            self._case_prefix.append(MISSING)
+            self._case_counter.append(MISSING)
+            if case_number is not None:
+                extra['case_number'] = case_number
+
+        self._ids.append(record['id'])
+        self._patient_numbers.append(get('patient_number'))
+        for field, column in self._string_columns.items():
+            value = get(field)
+            code = strings.get(value) if isinstance(value, str) else MISSING
+            if code is None:
+                code = self._strings.code(value)
+            elif code == MISSING and value is not None:
+                extra[field] = value
+            column.append(code)
+
+        for field, column in (('age', self._age), ('estimated_total_duration', self._duration), ('expected_tat', self._tat)):
+            value = get(field)
+            if type(value) is int and 0 <= value < SMALL_INT_LIMIT:
+                column.append(value)
+            else:
+                column.append(MISSING)
+                if value is not None:
+                    extra[field] = value
+
+        vitals = get('vitals') or {}
+        extra_vitals = {field: value for field, value in vitals.items() if field not in VITAL_FIELDS}
+        blood_pressure = vitals.get('blood_pressure')
+        bp_match = BLOOD_PRESSURE_PATTERN.match(blood_pressure) if isinstance(blood_pressure, str) else None
+        if bp_match and blood_pressure != f"{int(bp_match.group(1))}/{int(bp_match.group(2))}":
+            bp_match = None  # Nur exakt rekonstruierbare Schreibweisen in die Spalten (keine Leerzeichen, führenden Nullen)
+        self._systolic.append(int(bp_match.group(1)) if bp_match else MISSING)
+        self._diastolic.append(int(bp_match.group(2)) if bp_match else MISSING)
+        if blood_pressure is not None and not bp_match:
+            extra_vitals['blood_pressure'] = blood_pressure
+        temperature = vitals.get('temperature')
+        if type(temperature) is float:
+            self._temperature.append(temperature)
+        else:
+            self._temperature.append(NAN)
+            if temperature is not None:
+                extra_vitals['temperature'] = temperature
+        for field, column in self._int_vitals.items():
+            value = vitals.get(field)
+            if type(value) is int and 0 <= value < SMALL_INT_LIMIT:
+                column.append(value)
+            else:
+                column.append(MISSING)
+                if value is not None:
+                    extra_vitals[field] = value
+        if extra_vitals:
+            extra['vitals'] = extra_vitals
+
+        list_codes = self._test_lists.codes
+        for field, column in self._lists.items():
+            values = get(field)
+            if isinstance(values, list):
+                code = list_codes.get(tuple(values))
+                column.append(self._list_code(values) if code is None else code)
+            else:
+                column.append(MISSING)
+                if values is not None:
+                    extra[field] = values
+
+        if extra:
+            self._extra[row] = extra
+        return row
+
+    def _field(self, row, key):
+        extra = self._extra.get(row)
+        if key == 'vitals':
+            return self._vitals(row, extra)
+        if extra is not None and key in extra:
+            return extra[key]
+        if key == 'id':
+            return self._ids[row]
+        if key == 'created_date':
+            return (EPOCH + timedelta(microseconds=self._created[row])).isoformat()
+        if key == 'case_number':
+            if self._case_counter[row] == MISSING:
+                raise KeyError(key)
+            return f"{self._strings.values[self._case_prefix[row]]}-{self._case_counter[row]:02}"
+        if key == 'patient_number':
+            value = self._patient_numbers[row]
+            if value is None:
+                raise KeyError(key)
+            return value
+        column = self._string_columns.get(key)
+        if column is not None:
+            code = column[row]
+        elif key in self._lists:
+            code = self._lists[key][row]
+            if code == MISSING:
+                raise KeyError(key)
+            return list(self._test_lists.values[code])
+        elif key == 'age':
+            code = self._age[row]
+        elif key == 'estimated_total_duration':
+            code = self._duration[row]
+        elif key == 'expected_tat':
+            code = self._tat[row]
+        else:
+            raise KeyError(key)
+        if code == MISSING:
+            raise KeyError(key)
+        return self._strings.values[code] if column is not None else code
+
+    def _vitals(self, row, extra):
+        if extra is not None and extra.get('vitals', {}) is None:
+            return None
+        vitals = {}
+        if self._systolic[row] != MISSING:
+            vitals['blood_pressure'] = f"{self._systolic[row]}/{self._diastolic[row]}"
+        temperature = self._temperature[row]
+        if temperature == temperature:  # NaN = fehlt
+            vitals['temperature'] = temperature
+        for field in INT_VITALS:
+            value = self._int_vitals[field][row]
+            if value != MISSING:
+                vitals[field] = value
+        if extra is not None and 'vitals' in extra:
+            vitals.update(extra['vitals'])
+        return vitals
+
+    def _created_at(self, row):
+        extra = self._extra.get(row)
+        if extra is not None and 'created_date' in extra:
+            # Nur nicht exakt abbildbare Werte (z.B. mit Zeitzone) werden hier geparst
+            try:
+                return datetime.fromisoformat(extra['created_date'])
+            except (TypeError, ValueError):
+                return None
+        return EPOCH + timedelta(microseconds=self._created[row])
+
+    def _created_label(self, row):
+        label = self._labels.get(row)
+        if label is None:
+            created = self._created_at(row)
+            label = created.strftime(DATE_LABEL_FORMAT) if created is not None else ""
+            with self._labels_lock:
+                if len(self._labels) >= LABEL_CACHE_SIZE:
+                    self._labels.pop(next(iter(self._labels)))  # ältester Eintrag zuerst
+                self._labels[row] = label
+        return label
+
+    def _keys(self, row):
+        extra = self._extra.get(row) or {}
+        present = {
+            'id': True,
+            'case_number': self._case_counter[row] != MISSING,
+            'patient_number': self._patient_numbers[row] is not None,
+            'age': self._age[row] != MISSING,
+            'vitals': True,
+            'estimated_total_duration': self._duration[row] != MISSING,
+            'expected_tat': self._tat[row] != MISSING,
+            'created_date': True,
+        }
+        for field, column in self._string_columns.items():
+            present[field] = column[row] != MISSING
+        for field, column in self._lists.items():
+            present[field] = column[row] != MISSING
+        keys = [field for field in FIELDS if present[field] or field in extra]
+        keys.extend(field for field in extra if field not in FIELDS)
+        return keys
+
+    # --- Indizes ---
+    def _sort_key(self, row):
+        return (self._created[row], self._ids[row])
+
+    def _index(self, row):
+        bisect.insort(self._order, row, key=self._sort_key)
+        if self._groups is not None:
+            self._groups.setdefault(self._group_key(CaseView(self, row)), set()).add(self._ids[row])
+
+    def _unindex(self, row):
+        i = bisect.bisect_left(self._order, self._sort_key(row), key=self._sort_key)
+        if i < len(self._order) and self._order[i] == row:
+            del self._order[i]
+        if self._groups is not None:
+            group = self._group_key(CaseView(self, row))
+            ids = self._groups.get(group)
+            if ids is not None:
+                ids.discard(self._ids[row])
+                if not ids:
+                    del self._groups[group]
+
+    # --- RecordStore-Schnittstelle ---
+    def __iter__(self):
+        return (CaseView(self, row) for row in list(self._rows.values()))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, record_id):
+        return record_id in self._rows
+
+    def get(self, record_id, default=None):
+        row = self._rows.get(record_id)
+        return default if row is None else CaseView(self, row)
+
+    def add(self, record):
+        self.remove(record['id'])
+        self.version += 1
+        row = self._append(record)
+        self._rows[record['id']] = row
+        self._index(row)
+
+    def replace(self, record):
+        """Schreibt den neuen Stand als neue Zeile; die alte bleibt für bestehende Ansichten erhalten."""
+        old = self._rows.get(record['id'])
+        if old is not None:
+            self._unindex(old)
+        self.version += 1
+        row = self._append(record)
+        self._rows[record['id']] = row
+        self._index(row)
+
+    def remove(self, record_id):
+        """Entfernt den Fall und gibt seine (weiterhin lesbare) Ansicht zurück; None, falls unbekannt."""
+        row = self._rows.pop(record_id, None)
+        if row is None:
+            return None
+        self.version += 1
+        self._unindex(row)
+        return CaseView(self, row)
+
+    def group(self, key):
+        rows = (self._rows.get(record_id) for record_id in list(self._groups.get(key, ())))
+        return [CaseView(self, row) for row in rows if row is not None]
+
+    def snapshot(self):
+        return [CaseView(self, row) for row in list(self._rows.values())]
+
+    def page(self, offset, limit, descending=True):
+        n = len(self._order)
+        if descending:
+            rows = reversed(self._order[max(n - offset - limit, 0):max(n - offset, 0)])
+        else:
+            rows = self._order[offset:offset + limit]
+        return [CaseView(self, row) for row in rows]
+
+    def since(self, moment):
+        """Fälle mit Erstellungszeitpunkt ab ``moment`` (naiv = Ortszeit, oder mit Zeitzone), älteste zuerst; per Bisektion im Sortierindex."""
+        i = bisect.bisect_left(self._order, (_micros(moment), ''), key=self._sort_key)
+        return [CaseView(self, row) for row in self._order[i:]]
+
+    def copy(self):
+        """Kompaktierte Kopie ohne ersetzte/gelöschte Zeilen; Ansichten auf diesen Speicher bleiben gültig.
+
+        Wie die Erstbefüllung: alle Zeilen schreiben, dann einmal sortieren (statt je Zeile einzufügen).
+        """
+        clone = CompactCaseStore((dict(CaseView(self, row)) for row in list(self._rows.values())), group_key=self._group_key)
+        clone.version = self.version
+        return clone
+
+    compact = copy
+
+    @property
+    def garbage(self):
+        """Anzahl ersetzter/gelöschter Zeilen, die erst ``compact`` freigibt."""
+        return len(self._ids) - len(self._rows)
+
+    # --- Spalten für Auswertungen ---
+    def column_arrays(self):
+        """Aktuelle Fälle als NumPy-Spalten für vektorisierte Auswertungen (ohne dict-Ansichten).
+
+        Kategorien und Diagnosen kommen als Codes auf ``strings``, Testlisten als Längen.
+        Liest ohne Sperre neben einem Schreiber: erst die Zeilen als Momentaufnahme, dann
+        Kopien der Spalten (eine Sicht per ``frombuffer`` ließe ein gleichzeitiges Anhängen scheitern).
+        """
+        import numpy as np  # erst hier, der Fallspeicher selbst kommt ohne NumPy aus
+
+        rows = np.array(list(self._rows.values()), dtype=np.int64)
+        list_lengths = np.array([len(tests) for tests in list(self._test_lists.values)], dtype=np.int32)
+
+        def take(column, dtype):
+            column = column[:]  # Kopie: alle Zeilen der Momentaufnahme sind bereits geschrieben
+            return np.frombuffer(column, dtype=dtype)[rows] if len(column) else np.zeros(0, dtype=dtype)
+
+        columns = {
+            "created": take(self._created, np.int64).astype('datetime64[us]'),
+            "duration": np.maximum(take(self._duration, np.int16).astype(np.int32), 0),
+            "tat": take(self._tat, np.int16).astype(np.int32),  # -1 = nicht erfasst
+            "strings": self._strings.values,
+        }
+        for field, column in self._string_columns.items():
+            columns[f"{field}_codes"] = take(column, np.int32)
+        for field, column in self._lists.items():
+            codes = take(column, np.int32)
+            lengths = list_lengths[np.maximum(codes, 0)] if len(list_lengths) else np.zeros(len(codes), dtype=np.int32)
+            columns[f"n_{field}"] = np.where(codes >= 0, lengths, 0)
+        return columns
+
+    def list_counts(self, field='ordered_tests', key_fields=('suspected_diagnosis', 'mts_category')):
+        """Häufigkeit jeder Testliste je Schlüssel über die aktuellen Fälle: {(Werte...): {Testcodes: Anzahl}}.
+
+        Gezählt wird auf den Codes der Spalten; jede verschiedene Liste wird nur einmal aufgelöst.
+        """
+        lists = self._lists[field]
+        columns = [self._string_columns[key_field] for key_field in key_fields]
+        counts = {}
+        for row in list(self._rows.values()):
+            key = tuple(column[row] for column in columns), lists[row]
+            counts[key] = counts.get(key, 0) + 1
+        strings, test_lists = self._strings.values, self._test_lists.values
+        result = {}
+        for (codes, list_code), count in counts.items():
+            key = tuple(None if code == MISSING else strings[code] for code in codes)
+            tests = () if list_code == MISSING else test_lists[list_code]
+            result.setdefault(key, {})[tests] = count
+        return result
+
+    def test_mask(self, record_id, field='ordered_tests'):
+        """Bitmaske einer Testliste (ein Bit je Testcode, eindeutig innerhalb des Speichers)."""
+        code = self._lists[field][self._rows[record_id]]
+        return 0 if code == MISSING else self._list_masks[code]
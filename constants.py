@@ -0,0 +1,12 @@
+# constants.py
+
+import re
+
+# Fachliche Konstanten ohne Streamlit-Abhängigkeit (auch für Importer & Skripte)
+MTS_CATEGORIES = ['Rot', 'Orange', 'Gelb', 'Grün', 'Blau']
+LABTEST_CATEGORIES = ['Hämatologie', 'Klinische Chemie', 'Gerinnung', 'Immunologie', 'Mikrobiologie']
+URGENCY_LEVELS = ['Standard', 'Dringend', 'Notfall']
+GENDER_OPTIONS = ['Männlich', 'Weiblich', 'Divers']
+FALLNUMMER_PRÄFIX = "2025" # Das Präfix für die fortlaufende Fallnummer
+CASE_COMPACT_MIN_GARBAGE = 1000 # Ersetzte Fallzeilen, ab denen kompaktiert werden darf
+BLOOD_PRESSURE_PATTERN = re.compile(r"^\s*(\d{2,3})\s*/\s*(\d{2,3})\s*$") # "systolisch/diastolisch" in mmHg, z.B. 130/85
@@ -0,0 +1,23 @@
+# domain/__init__.py
+"""Fachlogik ohne UI: Fälle, Katalog und Empfehlungen als reine Python-Services.
+
+Das Paket importiert weder Streamlit noch pandas und arbeitet mit dicts bzw. den
+Datensatzspeichern. Die Seiten greifen über ``utils`` darauf zu; Worker, CLIs und
+Benchmarks nutzen die Services direkt.
+"""
+
+from .records import RecordStore
+from .cases import CaseService, CaseStats, case_recommendation_key, reevaluation_job
+from .catalog import CatalogService, CatalogSnapshot
+from .recommendations import RecommendationService
+
+__all__ = [
+    "RecordStore",
+    "CaseService",
+    "CaseStats",
+    "case_recommendation_key",
+    "reevaluation_job",
+    "CatalogService",
+    "CatalogSnapshot",
+    "RecommendationService",
+]
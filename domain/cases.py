@@ -0,0 +1,199 @@
+# domain/cases.py
+
+import threading
+import uuid
+from datetime import datetime
+import quality
+from quality import recommendation_key
+from casestore import CompactCaseStore
+from constants import FALLNUMMER_PRÄFIX, CASE_COMPACT_MIN_GARBAGE
+
+# --- Konstanten ---
+REEVALUATION_CHUNK_SIZE = 5000
+
+
+def case_recommendation_key(case):
+    """Indexschlüssel (Diagnose, MTS-Kategorie) eines Falls, passend zu ``recommendation_key``."""
+    return recommendation_key(case.get('suspected_diagnosis'), case.get('mts_category'))
+
+
+# --- Kennzahlen ---
+class CaseStats:
+    """Laufende Aggregate für die Kritischen Metriken im Dashboard.
+
+    ``CaseService`` meldet jede Änderung per ``add``/``remove``, die Kennzahlen kosten
+    damit O(1) statt vier Durchläufen pro Rerun.
+    """
+
+    def __init__(self, cases=()):
+        self.total = 0
+        self.tests_sum = 0
+        self.duration_sum = 0
+        self.warnings = 0
+        for case in cases:
+            self.add(case)
+
+    @staticmethod
+    def _contribution(case):
+        return (len(case.get('ordered_tests', [])),
+                case.get('estimated_total_duration', 0),
+                1 if (case.get('missing_tests', []) or case.get('unnecessary_tests', [])) else 0)
+
+    def add(self, case):
+        tests, duration, warning = self._contribution(case)
+        self.total += 1
+        self.tests_sum += tests
+        self.duration_sum += duration
+        self.warnings += warning
+
+    def remove(self, case):
+        tests, duration, warning = self._contribution(case)
+        self.total -= 1
+        self.tests_sum -= tests
+        self.duration_sum -= duration
+        self.warnings -= warning
+
+    def as_dict(self):
+        return {
+            "totalCases": self.total,
+            "averageTests": self.tests_sum / self.total if self.total > 0 else 0,
+            "casesWithWarnings": self.warnings,
+            "avgDuration": self.duration_sum / self.total if self.total > 0 else 0,
+        }
+
+    def matches(self, cases):
+        """Vergleicht die laufenden Werte mit einer vollständigen Neuberechnung (für Tests/Debugging)."""
+        return CaseStats(cases).as_dict() == self.as_dict()
+
+
+# --- Fall-Service ---
+class CaseService:
+    """Fallbestand: Fallspeicher, Kennzahlen und Persistenz.
+
+    ``cases`` (``CompactCaseStore``) und ``stats`` sind nur zum Lesen gedacht; Änderungen
+    laufen über die Methoden, damit Fallspeicher, Kennzahlen und Storage zusammenpassen.
+    Nach dem Kompaktieren ist ``cases`` ein neues Objekt, Aufrufer lesen es daher jedes Mal neu.
+
+    Ein Service kann von mehreren Sessions (Threads) geteilt werden: Schreibzugriffe laufen
+    nacheinander unter ``_lock``. Leser brauchen keine Sperre: der Fallspeicher überschreibt
+    keine Zeilen, ``compact`` legt einen neuen Speicher an, und seine Lesemethoden arbeiten auf
+    Momentaufnahmen der Indizes und Kopien der Spalten statt auf den laufend erweiterten Strukturen.
+    """
+
+    def __init__(self, storage, cases=(), prefix=FALLNUMMER_PRÄFIX, compact_min_garbage=CASE_COMPACT_MIN_GARBAGE):
+        self.storage = storage
+        self.prefix = prefix
+        self.compact_min_garbage = compact_min_garbage
+        self._lock = threading.RLock()
+        self.cases = CompactCaseStore(cases, group_key=case_recommendation_key)
+        self.stats = CaseStats(self.cases)
+        self.counter = self._latest_counter()
+
+    def _latest_counter(self):
+        # Höchste fortlaufende Nummer mit eigenem Präfix; fremde oder kaputte Nummern zählen nicht
+        latest = 0
+        marker = f"{self.prefix}-"
+        for case in self.cases:
+            number = case.get('case_number') or ''
+            if number.startswith(marker):
+                try:
+                    latest = max(latest, int(number.rpartition('-')[2]))
+                except ValueError:
+                    pass
+        return latest
+
+    # --- CRUD ---
+    def create(self, data, now=None):
+        """Vergibt Id, Zeitstempel und fortlaufende Fallnummer, speichert den Fall und liefert ihn zurück."""
+        with self._lock:
+            # Mit gemeinsamem Storage vergibt das Backend die Nummer, damit Arbeitsplätze nicht kollidieren
+            counter = self.storage.next_case_counter(self.prefix)
+            self.counter = counter if counter is not None else self.counter + 1
+            data['id'] = str(uuid.uuid4())
+            data['created_date'] = (now or datetime.now()).isoformat()
+            data['case_number'] = f"{self.prefix}-{self.counter:02}"
+            self.storage.insert_cases([data])
+            self.cases.add(data)
+            self.stats.add(data)
+            return data
+
+    def update(self, case_id, data):
+        """Übernimmt die Felder aus ``data`` (ohne Id/Metadaten); liefert False für unbekannte Fälle."""
+        with self._lock:
+            case = self.cases.get(case_id)
+            if case is None:
+                return False
+            for key in ['id', 'created_date', 'updated_date', 'created_by']:
+                if key in data:
+                    del data[key]
+            updated = {**case, **data}
+            self.cases.replace(updated)
+            self.stats.remove(case)
+            self.stats.add(updated)
+            self.storage.update_case(updated)
+            self._compact()
+            return True
+
+    def delete(self, case_id):
+        """Löscht den Fall und liefert ihn zurück (None, falls unbekannt)."""
+        with self._lock:
+            self.storage.delete_case(case_id)
+            removed = self.cases.remove(case_id)
+            if removed is not None:
+                self.stats.remove(removed)
+                self._compact()
+            return removed
+
+    # --- Neubewertung ---
+    def affected(self, diagnosis_name, mts_category):
+        """Alle Fälle zu Diagnose/MTS-Kategorie aus dem Gruppenindex (kein Durchlauf über alle Fälle)."""
+        return self.cases.group(recommendation_key(diagnosis_name, mts_category))
+
+    def reevaluate(self, affected, recommendation, test_catalog):
+        """Bewertet ``affected`` gegen ``recommendation`` neu und übernimmt geänderte Fälle; liefert deren Anzahl."""
+        return self.apply_updates(quality.reevaluate_cases(affected, recommendation, test_catalog))
+
+    def apply_updates(self, updated_cases, originals=None):
+        """Übernimmt bereits vollständig berechnete Fälle in Fallspeicher, Kennzahlen und Storage.
+
+        Mit ``originals`` (Id -> Fall, auf dem die Berechnung beruht) werden Fälle übersprungen,
+        die inzwischen anderweitig geändert wurden. Liefert die Anzahl übernommener Fälle.
+        """
+        with self._lock:
+            cases = self.cases
+            applied = []
+            for updated in updated_cases:
+                old = cases.get(updated['id'])
+                if old is None or (originals is not None and old != originals.get(updated['id'])):
+                    continue
+                cases.replace(updated)
+                self.stats.remove(old)
+                self.stats.add(updated)
+                applied.append(updated)
+            if applied:
+                self.storage.update_cases(applied)
+                self._compact()
+            return len(applied)
+
+    def _compact(self):
+        # Gibt ersetzte/gelöschte Zeilen frei, sobald sie die aktuellen überwiegen
+        if self.cases.garbage > max(len(self.cases), self.compact_min_garbage):
+            self.cases = self.cases.compact()
+
+
+def reevaluation_job(context, service, affected, recommendation, test_catalog, chunk_size=REEVALUATION_CHUNK_SIZE):
+    """Neubewertung als Job (``jobs.JobRunner``): übernimmt die Ergebnisse blockweise selbst in ``service``.
+
+    So bleibt das Ergebnis erhalten, auch wenn die startende Session nicht mehr läuft.
+    ``apply_updates`` läuft unter dem Lock des Service und überspringt zwischenzeitlich
+    geänderte Fälle; bei Abbruch bleiben bereits übernommene Blöcke bestehen.
+    Liefert ``{"checked": geprüfte, "applied": übernommene Fälle}``.
+    """
+    applied = 0
+    for start in range(0, len(affected), chunk_size):
+        context.check_cancelled()
+        chunk = affected[start:start + chunk_size]
+        originals = {case['id']: case for case in chunk}
+        applied += service.apply_updates(quality.reevaluate_cases(chunk, recommendation, test_catalog), originals)
+        context.report((start + len(chunk)) / len(affected), f"{start + len(chunk)}/{len(affected)} Fälle geprüft, {applied} neu bewertet")
+    return {"checked": len(affected), "applied": applied}
@@ -0,0 +1,164 @@
+# domain/catalog.py
+
+import threading
+import uuid
+from quality import build_test_catalog, add_to_test_catalog, build_recommendation_index, recommendation_key
+from rules import VitalRuleEngine
+from .records import RecordStore
+
+
+# --- Katalogstand ---
+class CatalogSnapshot:
+    """Unveränderlicher Stand des Katalogs (Labortests, Empfehlungen, Diagnosen, Vitalregeln) inkl. abgeleiteter Indizes.
+
+    Snapshots werden nie verändert; alle Sessions lesen denselben Stand ohne eigene Kopie.
+    """
+
+    __slots__ = ('version', 'lab_tests', 'recommendations', 'diagnoses', 'recommendation_index', 'test_catalog', 'vital_rules', 'vital_engine')
+
+    def __init__(self, version, lab_tests, recommendations, diagnoses, recommendation_index, test_catalog, vital_rules, vital_engine):
+        self.version = version
+        self.lab_tests = lab_tests
+        self.recommendations = recommendations
+        self.diagnoses = diagnoses
+        self.recommendation_index = recommendation_index
+        self.test_catalog = test_catalog
+        self.vital_rules = vital_rules
+        self.vital_engine = vital_engine # aus ``vital_rules`` übersetzt, je Stand genau einmal
+
+    def evolve(self, **changes):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes, version=self.version + 1)
+        return CatalogSnapshot(**fields)
+
+
+# --- Katalog-Service (prozessweit) ---
+class CatalogService:
+    """Prozessweiter Katalog mit Copy-on-Write und Persistenz im übergebenen Storage.
+
+    Änderungen kopieren nur die betroffenen Strukturen, erhöhen die Version und tauschen
+    den Snapshot atomar aus. Leser (Sessions, Worker) übernehmen den neuen Stand, sobald sie
+    ``snapshot`` erneut abfragen.
+    """
+
+    def __init__(self, storage, data):
+        self.storage = storage
+        self._lock = threading.Lock()
+        self.snapshot = CatalogSnapshot(
+            version=1,
+            lab_tests=RecordStore(data['lab_tests']),
+            recommendations=RecordStore(data['recommendations']),
+            diagnoses=tuple(data['diagnoses']),
+            recommendation_index=build_recommendation_index(data['recommendations']),
+            test_catalog=build_test_catalog(data['lab_tests']),
+            vital_rules=RecordStore(data.get('vital_rules', [])),
+            vital_engine=VitalRuleEngine(data.get('vital_rules', [])),
+        )
+
+    @classmethod
+    def load(cls, storage, initial_data):
+        """Katalog aus dem Storage; ein leerer Storage wird mit ``initial_data()`` befüllt."""
+        data = storage.load_catalog()
+        if data is None:
+            data = initial_data()
+            storage.seed(data)
+        return cls(storage, data)
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    # --- Labortests ---
+    def create_lab_test(self, data):
+        """Vergibt die Id, speichert den Test und liefert ihn zurück."""
+        data['id'] = str(uuid.uuid4())
+        data['estimated_duration_minutes'] = int(data['estimated_duration_minutes'])
+        self.storage.insert_lab_test(data)
+        self.add_lab_test(data)
+        return data
+
+    def delete_lab_test(self, test_id):
+        """Löscht den Test und liefert ihn zurück (None, falls unbekannt)."""
+        self.storage.delete_lab_test(test_id)
+        return self.remove_lab_test(test_id)
+
+    def add_lab_test(self, test):
+        with self._lock:
+            old = self.snapshot
+            lab_tests = old.lab_tests.copy()
+            lab_tests.add(test)
+            # Die Bit-Zuordnung ist nur erweiterbar und wird zwischen den Ständen geteilt
+            test_catalog = {**old.test_catalog, "durations": dict(old.test_catalog['durations'])}
+            add_to_test_catalog(test_catalog, test)
+            self.snapshot = old.evolve(lab_tests=lab_tests, test_catalog=test_catalog)
+
+    def remove_lab_test(self, test_id):
+        with self._lock:
+            old = self.snapshot
+            if test_id not in old.lab_tests:
+                return None
+            lab_tests = old.lab_tests.copy()
+            removed = lab_tests.remove(test_id)
+            durations = dict(old.test_catalog['durations'])
+            durations.pop(removed['test_code'], None)
+            self.snapshot = old.evolve(lab_tests=lab_tests, test_catalog={**old.test_catalog, "durations": durations})
+            return removed
+
+    # --- Empfehlungen (nur Katalogstand, Persistenz über RecommendationService) ---
+    def add_recommendation(self, rec):
+        with self._lock:
+            old = self.snapshot
+            recommendations = old.recommendations.copy()
+            recommendations.add(rec)
+            key = recommendation_key(rec['diagnosis_name'], rec['mts_category'])
+            index = dict(old.recommendation_index)
+            index[key] = index.get(key, []) + [rec]
+            self.snapshot = old.evolve(recommendations=recommendations, recommendation_index=index)
+
+    def remove_recommendation(self, rec_id):
+        with self._lock:
+            old = self.snapshot
+            if rec_id not in old.recommendations:
+                return None
+            recommendations = old.recommendations.copy()
+            removed = recommendations.remove(rec_id)
+            key = recommendation_key(removed['diagnosis_name'], removed['mts_category'])
+            index = dict(old.recommendation_index)
+            matches = [r for r in index.get(key, []) if r['id'] != rec_id]
+            if matches:
+                index[key] = matches
+            else:
+                index.pop(key, None)
+            self.snapshot = old.evolve(recommendations=recommendations, recommendation_index=index)
+            return removed
+
+    # --- Vitalregeln ---
+    def create_vital_rule(self, data):
+        """Vergibt die Id, speichert die Regel und liefert sie zurück."""
+        data['id'] = str(uuid.uuid4())
+        VitalRuleEngine([data]) # ungültige Bedingungen vor dem Speichern abweisen (ValueError)
+        self.storage.insert_vital_rule(data)
+        self.add_vital_rule(data)
+        return data
+
+    def delete_vital_rule(self, rule_id):
+        """Löscht die Regel und liefert sie zurück (None, falls unbekannt)."""
+        self.storage.delete_vital_rule(rule_id)
+        return self.remove_vital_rule(rule_id)
+
+    def add_vital_rule(self, rule):
+        with self._lock:
+            old = self.snapshot
+            vital_rules = old.vital_rules.copy()
+            vital_rules.add(rule)
+            self.snapshot = old.evolve(vital_rules=vital_rules, vital_engine=VitalRuleEngine(vital_rules))
+
+    def remove_vital_rule(self, rule_id):
+        with self._lock:
+            old = self.snapshot
+            if rule_id not in old.vital_rules:
+                return None
+            vital_rules = old.vital_rules.copy()
+            removed = vital_rules.remove(rule_id)
+            self.snapshot = old.evolve(vital_rules=vital_rules, vital_engine=VitalRuleEngine(vital_rules))
+            return removed
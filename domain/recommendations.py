@@ -0,0 +1,69 @@
+# domain/recommendations.py
+
+import uuid
+from panel import PANEL_TAT_TARGET_MINUTES, SOLVER_TIME_LIMIT, panel_attributes, solve_panel
+from providers import LocalRuleProvider, RemoteRecommendationProvider, VitalRuleProvider
+from quality import lookup_recommendation
+
+
+# --- Empfehlungs-Service ---
+class RecommendationService:
+    """Empfehlungen nachschlagen, anlegen und löschen auf Basis des ``CatalogService``.
+
+    ``find`` liest standardmäßig den aktuellen Katalogstand; Aufrufer mit festgehaltenem
+    Stand (z.B. eine Session während eines Reruns) geben ihren Snapshot mit.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._panel_attributes = (None, {}, {}) # (Katalogversion, Kosten, Messdauer)
+
+    def find(self, diagnosis_name, mts_category, snapshot=None):
+        """Liefert die Empfehlung für Diagnose und MTS-Kategorie in O(1) oder None."""
+        index = (snapshot or self.catalog.snapshot).recommendation_index
+        return lookup_recommendation(index, diagnosis_name, mts_category)
+
+    def create(self, data):
+        """Vergibt die Id, speichert die Empfehlung und liefert sie zurück."""
+        data['id'] = str(uuid.uuid4())
+        self.catalog.storage.insert_recommendation(data)
+        self.catalog.add_recommendation(data)
+        return data
+
+    def delete(self, rec_id):
+        """Löscht die Empfehlung und liefert sie zurück (None, falls unbekannt)."""
+        self.catalog.storage.delete_recommendation(rec_id)
+        return self.catalog.remove_recommendation(rec_id)
+
+    def provider(self, url=None, timeout=2.0):
+        """Provider mit lokalem Regelwerk; mit ``url`` externer Dienst und lokales Regelwerk als Fallback.
+
+        In beiden Fällen ergänzen die Vitalregeln des aktuellen Katalogstands das Ergebnis.
+        """
+        source = LocalRuleProvider(self.find)
+        if url:
+            source = RemoteRecommendationProvider(url, timeout=timeout, fallback=source)
+        return VitalRuleProvider(source, lambda: self.catalog.snapshot.vital_engine)
+
+    def panel_attributes(self, snapshot=None):
+        """Testcode -> Kosten und Testcode -> Messdauer zum Katalogstand, je Version einmal berechnet."""
+        snapshot = snapshot or self.catalog.snapshot
+        version, costs, durations = self._panel_attributes
+        if version != snapshot.version:
+            costs, durations = panel_attributes(snapshot.lab_tests)
+            self._panel_attributes = (snapshot.version, costs, durations)
+        return costs, durations
+
+    def suggest_panel(self, recommendation, mts_category, durations=None, budget=None, snapshot=None, time_limit=SOLVER_TIME_LIMIT):
+        """Günstigstes Panel zur Empfehlung innerhalb der Ziel-Durchlaufzeit der MTS-Kategorie (siehe ``panel.solve_panel``).
+
+        Pflichttests sind immer enthalten, jeder weitere empfohlene Test ist eine Anforderung.
+        ``durations`` überschreibt die Messdauer aus dem Katalog je Testcode, z.B. mit den
+        simulierten Fertigstellungszeiten bei aktueller Laborauslastung.
+        """
+        costs, catalog_durations = self.panel_attributes(snapshot)
+        mandatory = recommendation.get('mandatory_tests', [])
+        groups = {code: [code] for code in recommendation.get('recommended_tests', []) if code not in mandatory}
+        solution = solve_panel(costs, {**catalog_durations, **(durations or {})}, required=mandatory, groups=groups,
+                               max_duration=PANEL_TAT_TARGET_MINUTES.get(mts_category), budget=budget, time_limit=time_limit)
+        return {**solution, "target": PANEL_TAT_TARGET_MINUTES.get(mts_category)}
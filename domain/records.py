@@ -0,0 +1,119 @@
+# domain/records.py
+
+import bisect
+
+
+# --- Datenhaltung ---
+class RecordStore:
+    """Geordneter, über die ID adressierter Datensatzspeicher.
+
+    Ein dict hält die Einfügereihenfolge, daher sind Lesen, Ersetzen und Löschen O(1)
+    ohne die Liste neu aufzubauen. Iteration liefert die Datensätze wie bisher die Liste.
+    Mit ``sort_field`` wird zusätzlich ein vorsortierter Index gepflegt, aus dem ``page``
+    Ausschnitte liefert, ohne bei jedem Rerun alle Datensätze zu sortieren. Mit ``group_key``
+    (Funktion Datensatz -> Schlüssel) liefert ``group`` alle Datensätze eines Schlüssels.
+    """
+
+    def __init__(self, records=(), sort_field=None, group_key=None):
+        self.version = 0 # wird bei jeder Änderung erhöht (Cache-Schlüssel für abgeleitete Daten)
+        self._records = {r['id']: r for r in records}
+        self._sort_field = sort_field
+        self._order = sorted(self._sort_entry(r) for r in self._records.values()) if sort_field else None
+        self._group_key = group_key
+        self._groups = None
+        if group_key is not None:
+            self._groups = {}
+            for record in self._records.values():
+                self._groups.setdefault(group_key(record), set()).add(record['id'])
+
+    def _sort_entry(self, record):
+        return (record[self._sort_field], record['id'])
+
+    def __iter__(self):
+        return iter(self._records.values())
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, record_id):
+        return record_id in self._records
+
+    def get(self, record_id, default=None):
+        return self._records.get(record_id, default)
+
+    def group(self, key):
+        """Alle Datensätze mit ``group_key(datensatz) == key``."""
+        return [self._records[record_id] for record_id in self._groups.get(key, ())]
+
+    def add(self, record):
+        self.remove(record['id'])
+        self.version += 1
+        self._records[record['id']] = record
+        if self._order is not None:
+            # Neue Fälle sind meist die jüngsten, insort landet dann am Listenende
+            bisect.insort(self._order, self._sort_entry(record))
+        if self._groups is not None:
+            self._groups.setdefault(self._group_key(record), set()).add(record['id'])
+
+    def replace(self, record):
+        """Ersetzt einen vorhandenen Datensatz an seiner Position."""
+        old = self._records.get(record['id'])
+        self.version += 1
+        if self._order is not None and (old is None or self._sort_entry(old) != self._sort_entry(record)):
+            if old is not None:
+                self._discard_sort_entry(old)
+            bisect.insort(self._order, self._sort_entry(record))
+        if self._groups is not None:
+            if old is not None:
+                self._discard_group_entry(old)
+            self._groups.setdefault(self._group_key(record), set()).add(record['id'])
+        self._records[record['id']] = record
+
+    def remove(self, record_id):
+        """Entfernt den Datensatz und gibt ihn zurück (None, falls unbekannt)."""
+        record = self._records.pop(record_id, None)
+        if record is not None:
+            self.version += 1
+        if record is not None and self._order is not None:
+            self._discard_sort_entry(record)
+        if record is not None and self._groups is not None:
+            self._discard_group_entry(record)
+        return record
+
+    def _discard_group_entry(self, record):
+        key = self._group_key(record)
+        ids = self._groups.get(key)
+        if ids is not None:
+            ids.discard(record['id'])
+            if not ids:
+                del self._groups[key]
+
+    def _discard_sort_entry(self, record):
+        entry = self._sort_entry(record)
+        i = bisect.bisect_left(self._order, entry)
+        if i < len(self._order) and self._order[i] == entry:
+            del self._order[i]
+
+    def snapshot(self):
+        """Liste der aktuellen Datensätze; ``list(dict.values())`` läuft in einem Schritt und ist damit threadsicher."""
+        return list(self._records.values())
+
+    def copy(self):
+        """Flache Kopie (Datensätze werden geteilt) für Copy-on-Write."""
+        clone = RecordStore.__new__(RecordStore)
+        clone.version = self.version
+        clone._records = dict(self._records)
+        clone._sort_field = self._sort_field
+        clone._order = list(self._order) if self._order is not None else None
+        clone._group_key = self._group_key
+        clone._groups = {key: set(ids) for key, ids in self._groups.items()} if self._groups is not None else None
+        return clone
+
+    def page(self, offset, limit, descending=True):
+        """Liefert ``limit`` Datensätze ab ``offset`` in Sortierreihenfolge (Standard: neueste zuerst)."""
+        n = len(self._order)
+        if descending:
+            entries = reversed(self._order[max(n - offset - limit, 0):max(n - offset, 0)])
+        else:
+            entries = self._order[offset:offset + limit]
+        return [self._records[record_id] for _, record_id in entries]
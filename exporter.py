@@ -0,0 +1,138 @@
+# exporter.py
+
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import sys
+import time
+
+from importer import VITAL_RANGES, VITALS_PREFIX, LIST_SEPARATOR
+from storage import SQLiteStorage
+
+DEFAULT_CHUNK_SIZE = 5000
+CASE_FIELDS = ['case_number', 'id', 'created_date', 'patient_number', 'age', 'gender', 'mts_category', 'suspected_diagnosis', 'symptoms']
+VITAL_FIELDS = ['blood_pressure', *VITAL_RANGES]
+LIST_FIELDS = ['ordered_tests', 'recommended_tests', 'missing_tests', 'unnecessary_tests']
+EXPORT_COLUMNS = [*CASE_FIELDS, *(VITALS_PREFIX + f for f in VITAL_FIELDS), *LIST_FIELDS, 'estimated_total_duration', 'expected_tat']
+FORMATS = ['csv', 'parquet']
+CSV_COMPRESSIONS = [None, 'gzip']
+PARQUET_COMPRESSIONS = [None, 'snappy', 'zstd', 'gzip']
+
+
+def flatten_case(case):
+    """Bildet einen Fall auf die Exportspalten ab: Vitalparameter als ``vitals.*``-Spalten, Testlisten bleiben Listen."""
+    vitals = case.get('vitals') or {}
+    row = {field: case.get(field) for field in CASE_FIELDS}
+    for field in VITAL_FIELDS:
+        row[VITALS_PREFIX + field] = vitals.get(field)
+    for field in LIST_FIELDS:
+        row[field] = list(case.get(field) or [])
+    row['estimated_total_duration'] = case.get('estimated_total_duration')
+    row['expected_tat'] = case.get('expected_tat')
+    return row
+
+def _chunks(cases, chunk_size):
+    cases = iter(cases)
+    while True:
+        chunk = list(itertools.islice(cases, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --- CSV ---
+def write_csv(cases, target, compression=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Schreibt Fälle blockweise als CSV (UTF-8) in die Binärdatei ``target``.
+
+    Listenspalten werden mit ``;`` verbunden, damit ``importer.py`` die Datei wieder lesen kann.
+    Liefert die Anzahl geschriebener Fälle.
+    """
+    raw = gzip.GzipFile(fileobj=target, mode='wb') if compression == 'gzip' else target
+    text = io.TextIOWrapper(raw, encoding='utf-8', newline='', write_through=False)
+    try:
+        writer = csv.DictWriter(text, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        count = 0
+        for chunk in _chunks(cases, chunk_size):
+            rows = [flatten_case(case) for case in chunk]
+            for row in rows:
+                for field in LIST_FIELDS:
+                    row[field] = LIST_SEPARATOR.join(row[field])
+            writer.writerows(rows)
+            count += len(rows)
+        text.flush()
+    finally:
+        text.detach()
+    if raw is not target:
+        raw.close()
+    return count
+
+
+# --- Parquet ---
+def parquet_schema():
+    import pyarrow as pa
+    types = {'age': pa.int64(), 'estimated_total_duration': pa.int64(), 'expected_tat': pa.int64(), VITALS_PREFIX + 'blood_pressure': pa.string()}
+    for field, (_, _, kind) in VITAL_RANGES.items():
+        types[VITALS_PREFIX + field] = pa.float64() if kind is float else pa.int64()
+    for field in LIST_FIELDS:
+        types[field] = pa.list_(pa.string())
+    return pa.schema([(column, types.get(column, pa.string())) for column in EXPORT_COLUMNS])
+
+def write_parquet(cases, target, compression='zstd', chunk_size=DEFAULT_CHUNK_SIZE):
+    """Schreibt Fälle als Parquet, eine Row Group pro Block; Listenspalten als ``list<string>``.
+
+    ``target`` ist ein Pfad oder eine Binärdatei. Liefert die Anzahl geschriebener Fälle.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    count = 0
+    with pq.ParquetWriter(target, schema, compression=compression or 'none') as writer:
+        for chunk in _chunks(cases, chunk_size):
+            rows = [flatten_case(case) for case in chunk]
+            columns = {column: [row[column] for row in rows] for column in EXPORT_COLUMNS}
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            count += len(rows)
+    return count
+
+def export_cases(cases, target, fmt='csv', compression=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    if fmt == 'csv':
+        return write_csv(cases, target, compression, chunk_size)
+    if fmt == 'parquet':
+        return write_parquet(cases, target, compression, chunk_size)
+    raise ValueError(f"Unbekanntes Exportformat: {fmt}")
+
+def export_file_name(fmt, compression=None, stem="faelle"):
+    suffix = ".csv.gz" if fmt == 'csv' and compression == 'gzip' else f".{fmt}"
+    return stem + suffix
+
+
+# --- Kommandozeile ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportiert alle Fälle der SQLite-Datenbank als CSV oder Parquet.")
+    parser.add_argument("output", help="Zieldatei")
+    parser.add_argument("--db", required=True, help="Pfad zur SQLite-Datenbank (wie LABASSIST_DB_PATH)")
+    parser.add_argument("--format", choices=FORMATS, default='csv')
+    parser.add_argument("--compression", help="csv: gzip; parquet: snappy, zstd (Standard) oder gzip")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    compression = args.compression or ('zstd' if args.format == 'parquet' else None)
+    allowed = CSV_COMPRESSIONS if args.format == 'csv' else PARQUET_COMPRESSIONS
+    if compression not in allowed:
+        parser.error(f"Kompression {compression!r} ist für {args.format} nicht verfügbar")
+
+    started = time.perf_counter()
+    storage = SQLiteStorage(args.db)
+    with open(args.output, 'wb') as target:
+        count = export_cases(storage.iter_cases(args.chunk_size), target, args.format, compression, args.chunk_size)
+    seconds = time.perf_counter() - started
+    print(f"{count} Fälle exportiert in {seconds:.2f} s ({count / seconds if seconds else 0:,.0f} Zeilen/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
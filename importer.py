@@ -0,0 +1,286 @@
+# importer.py
+
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import math
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from constants import MTS_CATEGORIES, GENDER_OPTIONS, FALLNUMMER_PRÄFIX, BLOOD_PRESSURE_PATTERN
+from quality import build_test_catalog, build_recommendation_index, lookup_recommendation, evaluate_quality_batch
+from storage import SQLiteStorage
+
+# Wertebereiche wie in den Eingabefeldern des Assistenten (pages/02_Neuer_Fall.py)
+AGE_RANGE = (0, 120)
+VITAL_RANGES = {
+    "temperature": (30.0, 42.0, float),
+    "heart_rate": (30, 200, int),
+    "respiratory_rate": (5, 50, int),
+    "oxygen_saturation": (50, 100, int),
+    "blood_sugar": (30, 500, int),
+}
+VITALS_PREFIX = "vitals." # Flache CSV-Spalten wie ``vitals.heart_rate``
+LIST_SEPARATOR = ";" # Trennzeichen für Testlisten in CSV-Zellen
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 50
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+class RecordError(ValueError):
+    """Ein Datensatz ist ungültig und wird übersprungen."""
+
+
+# --- Lesen (zeilenweise, auch .gz) ---
+def detect_format(path):
+    suffixes = [s.lower() for s in Path(path).suffixes]
+    if suffixes and suffixes[-1] == ".gz":
+        suffixes.pop()
+    fmt = FORMATS.get(suffixes[-1] if suffixes else "")
+    if fmt is None:
+        raise ValueError(f"Unbekanntes Dateiformat: {path} (erwartet .csv oder .jsonl, optional .gz)")
+    return fmt
+
+def _open_text(path):
+    if str(path).lower().endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+def read_records(path, fmt=None, delimiter=","):
+    """Liefert ``(zeilennummer, rohdatensatz)`` einzeln, ohne die Datei komplett zu laden.
+
+    CSV-Zeilen kommen als dict, JSONL-Zeilen als unveränderter Text (geparst wird erst in
+    ``validate_record``, damit eine kaputte Zeile nicht den ganzen Import abbricht).
+    """
+    fmt = fmt or detect_format(path)
+    with _open_text(path) as handle:
+        if fmt == "csv":
+            reader = csv.DictReader(handle, delimiter=delimiter)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(handle, start=1):
+                if line.strip():
+                    yield line_no, line
+
+
+# --- Validierung ---
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def _number(raw, field, low, high, kind):
+    try:
+        if isinstance(raw, bool):
+            raise TypeError(raw)
+        number = float(raw)
+        if not math.isfinite(number):
+            raise ValueError(raw)
+    except (TypeError, ValueError, OverflowError):
+        raise RecordError(f"{field}: keine Zahl ({raw!r})") from None
+    if kind is int and not number.is_integer():
+        raise RecordError(f"{field}: keine ganze Zahl ({raw!r})")
+    value = kind(number)
+    if not low <= value <= high:
+        raise RecordError(f"{field}: {value} außerhalb {low}–{high}")
+    return value
+
+def _test_list(raw, field):
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        raw = raw.split(LIST_SEPARATOR)
+    elif not isinstance(raw, list) or not all(isinstance(t, str) for t in raw):
+        raise RecordError(f"{field}: erwartet Testcodes als Liste oder \"{LIST_SEPARATOR}\"-getrennten Text ({raw!r})")
+    return [t.strip() for t in raw if t.strip()]
+
+def validate_record(raw, known_tests):
+    """Prüft einen Rohdatensatz und liefert die Falldaten ohne Id, Fallnummer und Qualitätsfelder.
+
+    Pflicht sind Patientennummer, Alter, Geschlecht, MTS-Kategorie, Verdachtsdiagnose,
+    Erstellungsdatum (ISO 8601) und mindestens ein bekannter Testcode. Vitalparameter sind
+    optional, werden aber wie im Assistenten auf ihren Wertebereich geprüft.
+    """
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            raise RecordError(f"ungültiges JSON ({exc.msg})") from None
+        if not isinstance(raw, dict):
+            raise RecordError("JSON-Zeile ist kein Objekt")
+    if None in raw:
+        # csv.DictReader legt überzählige Felder unter None ab: Spalten sind verrutscht
+        raise RecordError(f"mehr Felder als Spalten in der Kopfzeile ({len(raw[None])} zu viel)")
+
+    for field in ("patient_number", "age", "gender", "mts_category", "suspected_diagnosis", "created_date"):
+        if _blank(raw.get(field)):
+            raise RecordError(f"{field} fehlt")
+    if raw["mts_category"] not in MTS_CATEGORIES:
+        raise RecordError(f"mts_category: unbekannte Kategorie {raw['mts_category']!r}")
+    if raw["gender"] not in GENDER_OPTIONS:
+        raise RecordError(f"gender: unbekannter Wert {raw['gender']!r}")
+    try:
+        created = datetime.fromisoformat(str(raw["created_date"]).strip())
+    except ValueError:
+        raise RecordError(f"created_date: kein ISO-Datum ({raw['created_date']!r})") from None
+
+    ordered_tests = _test_list(raw.get("ordered_tests"), "ordered_tests")
+    if not ordered_tests:
+        raise RecordError("ordered_tests: mindestens ein Test erforderlich")
+    unknown = [t for t in ordered_tests if t not in known_tests]
+    if unknown:
+        raise RecordError(f"ordered_tests: unbekannte Testcodes {', '.join(unknown)}")
+
+    vitals_object = raw.get("vitals") or {}
+    if not isinstance(vitals_object, dict):
+        raise RecordError(f"vitals: erwartet ein Objekt ({type(vitals_object).__name__})")
+    vitals_raw = dict(vitals_object)
+    for key, value in raw.items():
+        if isinstance(key, str) and key.startswith(VITALS_PREFIX):
+            vitals_raw[key[len(VITALS_PREFIX):]] = value
+    vitals = {}
+    blood_pressure = vitals_raw.get("blood_pressure")
+    if not _blank(blood_pressure):
+        match = BLOOD_PRESSURE_PATTERN.match(blood_pressure) if isinstance(blood_pressure, str) else None
+        if not match:
+            raise RecordError(f"blood_pressure: erwartet z.B. 130/85 ({blood_pressure!r})")
+        vitals["blood_pressure"] = f"{match.group(1)}/{match.group(2)}"
+    for field, (low, high, kind) in VITAL_RANGES.items():
+        if not _blank(vitals_raw.get(field)):
+            vitals[field] = _number(vitals_raw[field], field, low, high, kind)
+
+    symptoms = raw.get("symptoms") or ""
+    if not isinstance(symptoms, str):
+        raise RecordError(f"symptoms: erwartet Text ({type(symptoms).__name__})")
+
+    return {
+        "patient_number": str(raw["patient_number"]).strip(),
+        "age": _number(raw["age"], "age", *AGE_RANGE, int),
+        "gender": raw["gender"],
+        "mts_category": raw["mts_category"],
+        "suspected_diagnosis": " ".join(str(raw["suspected_diagnosis"]).split()),
+        "symptoms": symptoms,
+        "vitals": vitals,
+        "ordered_tests": ordered_tests,
+        "created_date": created.isoformat(),
+    }
+
+
+# --- Import ---
+class ImportReport:
+    """Ergebnis eines Imports inkl. Durchsatz; Fehler werden nur für die ersten Zeilen gesammelt."""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.errors = [] # (zeilennummer, meldung), höchstens MAX_REPORTED_ERRORS
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def reject(self, line_no, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "seconds": round(self.seconds, 3),
+            "rowsPerSecond": round(self.rows_per_second, 1),
+            "errors": [{"line": line, "message": message} for line, message in self.errors],
+        }
+
+def import_cases(records, storage, catalog, prefix=FALLNUMMER_PRÄFIX, chunk_size=DEFAULT_CHUNK_SIZE, next_counter=1, on_chunk=None):
+    """Importiert ``(zeilennummer, rohdatensatz)``-Paare blockweise in ``storage``.
+
+    Pro Block werden die gültigen Fälle gemeinsam geprüft (``evaluate_quality_batch``),
+    ein zusammenhängender Fallnummernbereich reserviert und alles in einer Transaktion
+    geschrieben. Es liegt immer nur ein Block im Speicher. ``catalog`` enthält
+    ``lab_tests`` und ``recommendations`` (z.B. aus ``storage.load_catalog()``);
+    ``next_counter`` gilt nur für Backends ohne eigenen Zähler. ``on_chunk(report)``
+    wird nach jedem geschriebenen Block aufgerufen.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    test_catalog = build_test_catalog(catalog["lab_tests"])
+    known_tests = set(test_catalog["durations"])
+    recommendation_index = build_recommendation_index(catalog["recommendations"])
+
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, chunk_size))
+        if not chunk:
+            break
+        report.rows += len(chunk)
+        cases = []
+        for line_no, raw in chunk:
+            try:
+                cases.append(validate_record(raw, known_tests))
+            except RecordError as exc:
+                report.reject(line_no, str(exc))
+        if cases:
+            recommendations = [lookup_recommendation(recommendation_index, c["suspected_diagnosis"], c["mts_category"]) for c in cases]
+            results = evaluate_quality_batch(zip((c["ordered_tests"] for c in cases), recommendations), test_catalog)
+            # Nummernvergabe und Schreiben in einer Transaktion: scheitert der Block, bleibt der Zähler unverändert
+            with storage.transaction():
+                first = storage.reserve_case_counters(prefix, len(cases))
+                if first is None:
+                    first = next_counter
+                for i, (case, rec, quality) in enumerate(zip(cases, recommendations, results)):
+                    case.update(quality)
+                    case["recommended_tests"] = rec["recommended_tests"] if rec else []
+                    case["id"] = str(uuid.uuid4())
+                    case["case_number"] = f"{prefix}-{first + i:02}"
+                storage.insert_cases(cases)
+            next_counter = first + len(cases)
+            report.imported += len(cases)
+        report.seconds = time.perf_counter() - started
+        if on_chunk is not None:
+            on_chunk(report)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+# --- Kommandozeile ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importiert Fälle aus CSV/JSONL (auch .gz) in die SQLite-Datenbank.")
+    parser.add_argument("file", help="Quelldatei (.csv, .jsonl, optional .gz)")
+    parser.add_argument("--db", required=True, help="Pfad zur SQLite-Datenbank (wie LABASSIST_DB_PATH)")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), help="Format statt Dateiendung")
+    parser.add_argument("--delimiter", default=",", help="CSV-Trennzeichen (Standard: ,)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Datensätze pro Transaktion")
+    parser.add_argument("--prefix", default=FALLNUMMER_PRÄFIX, help="Präfix der Fallnummern")
+    args = parser.parse_args(argv)
+
+    storage = SQLiteStorage(args.db)
+    catalog = storage.load_catalog()
+    if catalog is None:
+        parser.error("Die Datenbank enthält keinen Laborkatalog; bitte zuerst die App einmal mit LABASSIST_DB_PATH starten.")
+
+    def progress(report):
+        print(f"\r{report.rows} Zeilen, {report.imported} importiert, {report.rejected} abgelehnt "
+              f"({report.rows_per_second:,.0f} Zeilen/s)", end="", file=sys.stderr, flush=True)
+
+    report = import_cases(read_records(args.file, args.format, args.delimiter), storage, catalog,
+                          prefix=args.prefix, chunk_size=args.chunk_size, on_chunk=progress)
+    print(file=sys.stderr)
+    for line_no, message in report.errors:
+        print(f"Zeile {line_no}: {message}", file=sys.stderr)
+    if report.rejected > len(report.errors):
+        print(f"... {report.rejected - len(report.errors)} weitere Fehler", file=sys.stderr)
+    print(f"{report.imported}/{report.rows} Fälle importiert in {report.seconds:.2f} s ({report.rows_per_second:,.0f} Zeilen/s)")
+    return 0 if report.rejected == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
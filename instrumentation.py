@@ -0,0 +1,320 @@
+# instrumentation.py
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+PROFILE_ENV = "LABASSIST_PROFILE" # "cprofile", "tracemalloc" oder beides (kommagetrennt); ohne Angabe kein Profiling
+ELEMENT_COUNTER_ENV = "LABASSIST_COUNT_ELEMENTS" # "1": ausgegebene Elemente je Rerun zählen (hängt sich in interne Streamlit-API ein)
+METRICS_FILE_ENV = "LABASSIST_METRICS_FILE" # Prometheus-Textdatei (z.B. für den node_exporter-Textfile-Collector)
+METRICS_FILE_INTERVAL_SECONDS = 5.0 # Datei höchstens so oft neu schreiben
+RERUN_HISTORY = 50 # Letzte Reruns für die Admin-Seite
+PROFILE_TOP = 25 # Zeilen im cProfile-Auszug bzw. Allokationsstellen bei tracemalloc
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # Sekunden
+METRIC_PREFIX = "labassist"
+
+
+# --- Aggregate (prozessweit) ---
+class Histogram:
+    """Dauerverteilung mit festen Buckets wie ein Prometheus-Histogramm."""
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def quantile(self, q):
+        """Obergrenze des Buckets, in dem das Quantil liegt (wie ``histogram_quantile``, ohne Interpolation)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(DURATION_BUCKETS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Rerun:
+    """Messwerte eines Seitendurchlaufs: Abschnitte, Spans, ausgegebene Elemente und optional Profile."""
+
+    __slots__ = ('page', 'session', 'started', '_perf_started', 'last_activity', 'seconds', 'finished', 'sections', 'spans',
+                 'elements', '_section', '_profiler', 'profile', 'memory_peak', 'allocations')
+
+    def __init__(self, page, session=None):
+        self.page = page
+        self.session = session
+        self.started = time.time()
+        self._perf_started = self.last_activity = time.perf_counter()
+        self.seconds = None
+        self.finished = False # False: durch st.stop/st.rerun/Fehler vorzeitig beendet, erst beim nächsten Rerun abgeschlossen
+        self.sections = [] # [(Abschnitt, Sekunden)] in Seitenreihenfolge
+        self.spans = {} # Name -> [Anzahl, Sekunden]
+        self.elements = Counter() # Elementtyp (markdown, button, ...) -> Anzahl
+        self._section = None
+        self._profiler = None
+        self.profile = None
+        self.memory_peak = None
+        self.allocations = None
+
+    def as_dict(self):
+        return {
+            "page": self.page,
+            "started": self.started,
+            "seconds": self.seconds,
+            "finished": self.finished,
+            "sections": list(self.sections),
+            "spans": {name: tuple(values) for name, values in self.spans.items()},
+            "elements": dict(self.elements),
+            "profile": self.profile,
+            "memory_peak": self.memory_peak,
+            "allocations": self.allocations,
+        }
+
+
+class Metrics:
+    """Prozessweite Messwerte: Span-Histogramme, Zähler und die letzten Reruns.
+
+    Schreibzugriffe sind kurz und laufen unter einem Lock, da alle Sessions in eigenen
+    Threads messen. ``prometheus_text`` liefert das Textformat für Scraper.
+    """
+
+    def __init__(self, history=RERUN_HISTORY):
+        self._lock = threading.Lock()
+        self.spans = {} # Name -> Histogram
+        self.reruns = {} # Seite -> Histogram
+        self.counters = Counter() # (Name, Labels als sortiertes Tupel) -> Wert
+        self.history = deque(maxlen=history)
+        self.started = time.time()
+        self._file_written = 0.0
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def record_rerun(self, rerun):
+        with self._lock:
+            histogram = self.reruns.get(rerun.page)
+            if histogram is None:
+                histogram = self.reruns[rerun.page] = Histogram()
+            histogram.observe(rerun.seconds)
+            self.counters[("reruns", (("finished", str(rerun.finished).lower()), ("page", rerun.page)))] += 1
+            for kind, n in rerun.elements.items():
+                self.counters[("elements", (("page", rerun.page), ("type", kind)))] += n
+            self.history.append(rerun.as_dict())
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.reruns.clear()
+            self.counters.clear()
+            self.history.clear()
+            self.started = time.time()
+
+    def summary(self):
+        """Tabellenfertige Kopie der Aggregate (Liste von dicts je Span bzw. Seite)."""
+        with self._lock:
+            def rows(histograms, key):
+                return [{key: name, "count": h.count, "total_s": h.total, "mean_ms": h.total / h.count * 1000 if h.count else 0.0,
+                         "p90_ms": h.quantile(0.9) * 1000, "max_ms": h.max * 1000}
+                        for name, h in sorted(histograms.items(), key=lambda item: -item[1].total)]
+            return {
+                "spans": rows(self.spans, "span"),
+                "reruns": rows(self.reruns, "page"),
+                "counters": [{"name": name, **dict(labels), "value": value} for (name, labels), value in sorted(self.counters.items())],
+                "history": list(self.history),
+            }
+
+    # --- Prometheus-Textformat ---
+    def prometheus_text(self):
+        with self._lock:
+            lines = [f"# HELP {METRIC_PREFIX}_span_seconds Dauer instrumentierter Abschnitte",
+                     f"# TYPE {METRIC_PREFIX}_span_seconds histogram"]
+            for name, histogram in sorted(self.spans.items()):
+                lines.extend(_histogram_lines(f"{METRIC_PREFIX}_span_seconds", {"span": name}, histogram))
+            lines += [f"# HELP {METRIC_PREFIX}_rerun_seconds Dauer eines Seitendurchlaufs",
+                      f"# TYPE {METRIC_PREFIX}_rerun_seconds histogram"]
+            for page, histogram in sorted(self.reruns.items()):
+                lines.extend(_histogram_lines(f"{METRIC_PREFIX}_rerun_seconds", {"page": page}, histogram))
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+                for (counter, labels), value in sorted(self.counters.items()):
+                    if counter == name:
+                        lines.append(f"{METRIC_PREFIX}_{name}_total{_labels(dict(labels))} {value}")
+            lines += [f"# TYPE {METRIC_PREFIX}_metrics_start_time_seconds gauge",
+                      f"{METRIC_PREFIX}_metrics_start_time_seconds {self.started:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, force=False):
+        """Schreibt ``prometheus_text`` atomar nach ``path`` (höchstens alle ``METRICS_FILE_INTERVAL_SECONDS``)."""
+        now = time.monotonic()
+        if not force and now - self._file_written < METRICS_FILE_INTERVAL_SECONDS:
+            return False
+        self._file_written = now
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, path)
+        return True
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+def _histogram_lines(metric, labels, histogram):
+    cumulative = 0
+    for bound, n in zip(DURATION_BUCKETS, histogram.buckets):
+        cumulative += n
+        yield f"{metric}_bucket{_labels({**labels, 'le': repr(bound)})} {cumulative}"
+    yield f"{metric}_bucket{_labels({**labels, 'le': '+Inf'})} {histogram.count}"
+    yield f"{metric}_sum{_labels(labels)} {histogram.total:.6f}"
+    yield f"{metric}_count{_labels(labels)} {histogram.count}"
+
+
+metrics = Metrics()
+_current = ContextVar("labassist_rerun", default=None)
+
+
+# --- Spans ---
+@contextmanager
+def span(name):
+    """Misst den Block als Span ``name`` (prozessweit und im laufenden Rerun)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ended = time.perf_counter()
+        seconds = ended - started
+        metrics.observe(name, seconds)
+        rerun = _current.get()
+        if rerun is not None:
+            totals = rerun.spans.get(name)
+            if totals is None:
+                rerun.spans[name] = [1, seconds]
+            else:
+                totals[0] += 1
+                totals[1] += seconds
+            rerun.last_activity = ended
+
+def timed(name):
+    """Dekorator-Variante von ``span``."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- Reruns ---
+def profile_modes():
+    return {mode.strip().lower() for mode in os.environ.get(PROFILE_ENV, "").split(",") if mode.strip()}
+
+def begin_rerun(page, session=None):
+    """Startet die Messung eines Seitendurchlaufs im aktuellen Thread/Kontext."""
+    rerun = Rerun(page, session)
+    modes = profile_modes()
+    if 'tracemalloc' in modes:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+    if 'cprofile' in modes:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            rerun._profiler = profiler
+        except ValueError:
+            pass  # Es läuft bereits ein Profil (z.B. parallele Session); dieser Rerun bleibt ohne
+    _current.set(rerun)
+    return rerun
+
+def section(name):
+    """Beginnt den nächsten Seitenabschnitt; der vorige endet hier. Braucht keine Einrückung im Seitenskript."""
+    rerun = _current.get()
+    if rerun is None:
+        return
+    now = time.perf_counter()
+    _close_section(rerun, now)
+    rerun._section = (name, now)
+
+def _close_section(rerun, now):
+    if rerun._section is not None:
+        name, started = rerun._section
+        rerun.sections.append((name, now - started))
+        metrics.observe(f"{rerun.page}/{name}", now - started)
+        rerun._section = None
+    rerun.last_activity = now
+
+def count_element(kind):
+    """Zählt ein ausgegebenes UI-Element (``markdown``, ``button``, ...) im laufenden Rerun."""
+    rerun = _current.get()
+    if rerun is not None:
+        rerun.elements[kind] += 1
+        rerun.last_activity = time.perf_counter()
+
+def current_rerun():
+    return _current.get()
+
+def end_rerun(rerun=None, finished=True):
+    """Schließt den Rerun ab und übernimmt ihn in die Aggregate.
+
+    Vorzeitig beendete Reruns (``finished=False``) enden zum Zeitpunkt der letzten Messung.
+    """
+    if rerun is None:
+        rerun = _current.get()
+    if rerun is None or rerun.seconds is not None:
+        return None
+    now = time.perf_counter() if finished else rerun.last_activity
+    _close_section(rerun, now)
+    rerun.seconds = max(now - rerun._perf_started, 0.0)
+    rerun.finished = finished
+    if rerun._profiler is not None:
+        rerun._profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(rerun._profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        rerun.profile = out.getvalue()
+        rerun._profiler = None
+    if tracemalloc.is_tracing() and 'tracemalloc' in profile_modes():
+        rerun.memory_peak = tracemalloc.get_traced_memory()[1]
+        rerun.allocations = [str(stat) for stat in tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP]]
+    if _current.get() is rerun:
+        _current.set(None)
+    metrics.record_rerun(rerun)
+    path = os.environ.get(METRICS_FILE_ENV)
+    if path:
+        metrics.write_prometheus(path)
+    return rerun
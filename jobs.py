@@ -0,0 +1,206 @@
+# jobs.py
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, CancelledError
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Wird von ``JobContext.check_cancelled`` ausgelöst, wenn der Job abgebrochen werden soll."""
+
+
+class Job:
+    """Zustand eines Hintergrundjobs; wird nur vom Runner geschrieben, Seiten lesen ihn beim Pollen."""
+
+    __slots__ = ('id', 'name', 'owner', 'kind', 'status', 'progress', 'message', 'result', 'error',
+                 'created', 'started', 'finished', '_cancel', '_future')
+
+    def __init__(self, job_id, name, owner, kind):
+        self.id = job_id
+        self.name = name
+        self.owner = owner
+        self.kind = kind
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def done(self):
+        return self.status in FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobContext:
+    """Wird Thread-Jobs als erstes Argument übergeben: Fortschritt melden und Abbruch prüfen."""
+
+    def __init__(self, job):
+        self._job = job
+
+    @property
+    def job_id(self):
+        return self._job.id
+
+    @property
+    def cancelled(self):
+        return self._job.cancel_requested
+
+    def check_cancelled(self):
+        if self._job.cancel_requested:
+            raise JobCancelled()
+
+    def report(self, progress, message=None):
+        """Meldet den Fortschritt (0..1) und optional einen Statustext."""
+        self._job.progress = max(0.0, min(1.0, float(progress)))
+        if message is not None:
+            self._job.message = message
+
+
+class JobRunner:
+    """Prozessweiter Runner für lange Operationen auf einem begrenzten Thread-Pool.
+
+    Jobs bekommen eine Id, die im Session State überlebt; Seiten fragen den Zustand per
+    ``get``/``jobs`` ab, statt zu blockieren. Thread-Jobs erhalten einen ``JobContext`` für
+    Fortschritt und kooperativen Abbruch. CPU-lastige, picklebare Funktionen können mit
+    ``process=True`` in einem Prozess-Pool laufen (ohne Fortschritt; Abbruch nur vor dem Start).
+    Beendete Jobs werden nach ``keep_finished`` Einträgen verworfen (älteste zuerst).
+    """
+
+    def __init__(self, max_workers=2, process_workers=0, keep_finished=100):
+        self.max_workers = max_workers
+        self.process_workers = process_workers
+        self.keep_finished = keep_finished
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="labassist-job")
+        self._processes = None
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, name=None, owner=None, process=False, **kwargs):
+        """Startet ``fn(context, *args, **kwargs)`` (bzw. ``fn(*args, **kwargs)`` mit ``process=True``) und liefert die Job-Id."""
+        job = Job(f"job-{next(self._ids)}", name or getattr(fn, '__name__', 'job'), owner, "process" if process else "thread")
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        if process:
+            job.status = RUNNING
+            job.started = time.time()
+            job._future = self._process_pool().submit(fn, *args, **kwargs)
+            job._future.add_done_callback(lambda future: self._finish_process(job, future))
+        else:
+            job._future = self._threads.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _process_pool(self):
+        with self._lock:
+            if self._processes is None:
+                if not self.process_workers:
+                    raise RuntimeError("JobRunner ohne Prozess-Pool (process_workers=0)")
+                self._processes = ProcessPoolExecutor(max_workers=self.process_workers)
+            return self._processes
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            result = fn(JobContext(job), *args, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED)
+        except Exception as exc:
+            self._finish(job, FAILED, error=f"{type(exc).__name__}: {exc}")
+        else:
+            self._finish(job, DONE, result=result)
+
+    def _finish_process(self, job, future):
+        try:
+            result = future.result()
+        except CancelledError:
+            self._finish(job, CANCELLED)
+        except Exception as exc:
+            self._finish(job, FAILED, error=f"{type(exc).__name__}: {exc}")
+        else:
+            self._finish(job, DONE, result=result)
+
+    @staticmethod
+    def _finish(job, status, result=None, error=None):
+        job.result = result
+        job.error = error
+        if status == DONE:
+            job.progress = 1.0
+        job.finished = time.time()
+        if job.started is None:
+            job.started = job.finished
+        job.status = status
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        """Alle bekannten Jobs (optional nur eines Besitzers, z.B. einer Session), älteste zuerst."""
+        return [job for job in list(self._jobs.values()) if owner is None or job.owner == owner]
+
+    def cancel(self, job_id):
+        """Fordert den Abbruch an; wartende Jobs starten nicht mehr, laufende Thread-Jobs prüfen ``check_cancelled``."""
+        job = self._jobs.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            self._finish(job, CANCELLED)
+        return True
+
+    def result(self, job_id, timeout=None):
+        """Wartet (höchstens ``timeout`` Sekunden) auf das Ende und liefert das Ergebnis; Fehler werden als RuntimeError gemeldet."""
+        job = self._jobs[job_id]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not job.done:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(job_id)
+            time.sleep(0.05)
+        if job.status == FAILED:
+            raise RuntimeError(job.error)
+        return job.result
+
+    def forget(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.done:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait=False):
+        for job in self.jobs():
+            self.cancel(job.id)
+        self._threads.shutdown(wait=wait, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait, cancel_futures=True)
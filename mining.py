@@ -0,0 +1,346 @@
+# mining.py
+
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from constants import MTS_CATEGORIES
+from quality import normalize_diagnosis, recommendation_key
+
+# --- Schwellen für Regelvorschläge (Anteile der Fälle je Diagnose und MTS-Kategorie) ---
+MIN_CASES = 30 # Weniger Fälle ergeben keinen Vorschlag
+MIN_SUPPORT = 0.1 # Seltenere Testkombinationen werden nicht gesucht
+MANDATORY_SUPPORT = 0.8 # Tests, die mindestens so oft angefordert werden, gelten als Pflicht
+RECOMMENDED_SUPPORT = 0.5 # Empfohlen: größte Kombination (mit allen Pflicht-Tests), die mindestens so oft vorkommt
+OPTIONAL_SUPPORT = 0.2 # Übrige Tests ab diesem Anteil werden optional
+MAX_ITEMSET_SIZE = 8 # Längere Kombinationen werden nicht aufgezählt
+TOP_ITEMSETS = 5 # Häufigste Kombinationen (ab zwei Tests) je Vorschlag
+ROWS_PER_TASK = 250_000 # SQLite-Zeilen je Arbeitspaket beim parallelen Einlesen
+LIST_LABELS = {'recommended_tests': "Empfohlen", 'mandatory_tests': "Pflicht", 'optional_tests': "Optional"}
+
+
+# --- Transaktionen ---
+class CaseTransactions:
+    """Angeforderte Testlisten als Bitmasken, gezählt je (Diagnose, MTS-Kategorie).
+
+    Bit ``i`` steht für ``test_codes[i]`` (Katalogreihenfolge); Codes außerhalb des Katalogs
+    (gelöschte Tests) fallen weg. Gleiche Listen werden nur gezählt, daher bleibt der Umfang
+    auch bei Millionen Fällen klein. Diagnosen werden wie im Empfehlungsindex normalisiert;
+    als Anzeigename gilt die häufigste Schreibweise. Picklebar, damit Teilzählungen aus
+    Worker-Prozessen mit ``merge`` zusammengeführt werden können.
+    """
+
+    def __init__(self, test_codes):
+        self.test_codes = list(test_codes)
+        self.bits = {code: 1 << index for index, code in enumerate(self.test_codes)}
+        self.groups = {} # recommendation_key -> {Bitmaske: Anzahl}
+        self.names = {} # recommendation_key -> {Schreibweise: Anzahl}
+
+    def mask(self, tests):
+        bits = self.bits
+        mask = 0
+        for code in tests:
+            mask |= bits.get(code, 0)
+        return mask
+
+    def codes(self, mask):
+        """Bitmaske -> Testcodes in Katalogreihenfolge."""
+        codes = []
+        while mask:
+            lowest = mask & -mask
+            codes.append(self.test_codes[lowest.bit_length() - 1])
+            mask ^= lowest
+        return codes
+
+    def add(self, diagnosis_name, mts_category, mask, count=1):
+        key = recommendation_key(diagnosis_name, mts_category)
+        masks = self.groups.setdefault(key, {})
+        masks[mask] = masks.get(mask, 0) + count
+        names = self.names.setdefault(key, {})
+        names[diagnosis_name] = names.get(diagnosis_name, 0) + count
+
+    def merge(self, other):
+        for key, masks in other.groups.items():
+            target = self.groups.setdefault(key, {})
+            for mask, count in masks.items():
+                target[mask] = target.get(mask, 0) + count
+        for key, names in other.names.items():
+            target = self.names.setdefault(key, {})
+            for name, count in names.items():
+                target[name] = target.get(name, 0) + count
+        return self
+
+    def display_name(self, key):
+        names = self.names[key]
+        return max(names, key=lambda name: (names[name], name))
+
+    def __len__(self):
+        return sum(map(sum, (masks.values() for masks in self.groups.values())))
+
+
+def from_cases(cases, test_codes):
+    """Transaktionen aus dem Fallbestand: ``CompactCaseStore`` über ``list_counts``, sonst aus Fall-Dicts."""
+    transactions = CaseTransactions(test_codes)
+    if hasattr(cases, 'list_counts'):
+        for (diagnosis_name, mts_category), lists in cases.list_counts().items():
+            for tests, count in lists.items():
+                transactions.add(diagnosis_name or "", mts_category, transactions.mask(tests), count)
+    else:
+        for case in cases:
+            transactions.add(case.get('suspected_diagnosis') or "", case.get('mts_category'),
+                             transactions.mask(case.get('ordered_tests') or ()))
+    return transactions
+
+
+def _scan_rows(path, test_codes, rowids):
+    """Worker: zählt die Fälle eines Rowid-Bereichs der SQLite-Datenbank (nur lesend).
+
+    Gleiche (Diagnose, MTS-Kategorie, Testliste) werden schon als JSON-Text gezählt, so dass
+    jede verschiedene Liste nur einmal dekodiert wird.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        raw = {}
+        for row in conn.execute("SELECT suspected_diagnosis, mts_category, json_extract(data, '$.ordered_tests') "
+                                "FROM patient_cases WHERE rowid BETWEEN ? AND ?", rowids):
+            raw[row] = raw.get(row, 0) + 1
+    finally:
+        conn.close()
+    transactions = CaseTransactions(test_codes)
+    masks = {}
+    for (diagnosis_name, mts_category, tests), count in raw.items():
+        mask = masks.get(tests)
+        if mask is None:
+            mask = masks[tests] = transactions.mask(json.loads(tests) if tests else ())
+        transactions.add(diagnosis_name or "", mts_category, mask, count)
+    return transactions
+
+
+def scan_sqlite(path, test_codes, workers=None, rows_per_task=ROWS_PER_TASK, on_progress=None):
+    """Liest alle Fälle der SQLite-Datenbank in Rowid-Bereichen, mit ``workers`` Prozessen parallel."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        first, last = conn.execute("SELECT min(rowid), max(rowid) FROM patient_cases").fetchone()
+    finally:
+        conn.close()
+    transactions = CaseTransactions(test_codes)
+    if first is None:
+        return transactions
+    ranges = [(start, min(start + rows_per_task - 1, last)) for start in range(first, last + 1, rows_per_task)]
+    scan = partial(_scan_rows, path, transactions.test_codes)
+    for done, part in enumerate(_map(scan, ranges, workers), 1):
+        transactions.merge(part)
+        if on_progress is not None:
+            on_progress(done, len(ranges))
+    return transactions
+
+
+def _map(fn, items, workers, chunksize=1):
+    """``map`` über einen Prozess-Pool mit ``workers`` Prozessen; mit einem Worker ohne Pool."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(items) <= 1:
+        yield from map(fn, items)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        yield from pool.map(fn, items, chunksize=chunksize)
+
+
+# --- FP-Growth ---
+def fp_growth(transactions, min_count, max_size=MAX_ITEMSET_SIZE):
+    """Häufige Testkombinationen: {Bitmaske: Anzahl} für alle Itemsets mit Anzahl ≥ ``min_count``.
+
+    ``transactions`` sind Paare (Bitmaske, Anzahl). Der FP-Baum ordnet die Tests je Transaktion
+    nach Häufigkeit; bedingte Bäume werden rekursiv für die seltensten Tests zuerst aufgebaut.
+    """
+    itemsets = {}
+    _grow(list(transactions), min_count, 0, max_size, itemsets)
+    return itemsets
+
+
+def _bits(mask):
+    while mask:
+        lowest = mask & -mask
+        yield lowest
+        mask ^= lowest
+
+
+def _grow(transactions, min_count, suffix, size_left, itemsets):
+    support = {}
+    for mask, count in transactions:
+        for bit in _bits(mask):
+            support[bit] = support.get(bit, 0) + count
+    frequent = sorted((bit for bit, count in support.items() if count >= min_count), key=lambda bit: (-support[bit], bit))
+    if not frequent:
+        return
+    rank = {bit: index for index, bit in enumerate(frequent)}
+
+    # FP-Baum: Knoten [Bit, Anzahl, Elternknoten, Kinder]; Header: Bit -> Knoten
+    root = [0, 0, None, {}]
+    header = {bit: [] for bit in frequent}
+    for mask, count in transactions:
+        node = root
+        for bit in sorted((bit for bit in _bits(mask) if bit in rank), key=rank.__getitem__):
+            child = node[3].get(bit)
+            if child is None:
+                child = node[3][bit] = [bit, 0, node, {}]
+                header[bit].append(child)
+            child[1] += count
+            node = child
+
+    for bit in reversed(frequent):
+        itemset = suffix | bit
+        itemsets[itemset] = support[bit]
+        if size_left <= 1:
+            continue
+        # Bedingte Musterbasis: Pfade von den Knoten des Bits zur Wurzel (nur häufigere Tests)
+        base = {}
+        for node in header[bit]:
+            path, parent = 0, node[2]
+            while parent is not root:
+                path |= parent[0]
+                parent = parent[2]
+            if path:
+                base[path] = base.get(path, 0) + node[1]
+        if base:
+            _grow(list(base.items()), min_count, itemset, size_left - 1, itemsets)
+
+
+# --- Regelvorschläge ---
+def _support(masks, itemset):
+    return sum(count for mask, count in masks.items() if mask & itemset == itemset)
+
+
+def propose(masks, min_support=MIN_SUPPORT, mandatory_support=MANDATORY_SUPPORT,
+            recommended_support=RECOMMENDED_SUPPORT, optional_support=OPTIONAL_SUPPORT, max_size=MAX_ITEMSET_SIZE):
+    """Regelvorschlag für eine (Diagnose, MTS-Kategorie) aus ihren Transaktionen {Bitmaske: Anzahl}.
+
+    Liefert Bitmasken für Pflicht-, empfohlene und optionale Tests, den Support je Test und der
+    empfohlenen Kombination sowie die Konfidenz der Regel "Pflicht-Tests ⇒ übrige empfohlene Tests".
+    """
+    n_cases = sum(masks.values())
+    itemsets = fp_growth(masks.items(), max(1, math.ceil(min_support * n_cases)), max_size)
+    singles = {itemset: count for itemset, count in itemsets.items() if itemset & (itemset - 1) == 0}
+    mandatory = 0
+    for bit, count in singles.items():
+        if count >= mandatory_support * n_cases:
+            mandatory |= bit
+    mandatory_count = _support(masks, mandatory) if mandatory else n_cases
+
+    # Größte ausreichend häufige Kombination, die alle Pflicht-Tests enthält
+    recommended, recommended_count = mandatory, mandatory_count
+    for itemset, count in itemsets.items():
+        if itemset & mandatory != mandatory or count < recommended_support * n_cases:
+            continue
+        if (itemset.bit_count(), count, -itemset) > (recommended.bit_count(), recommended_count, -recommended):
+            recommended, recommended_count = itemset, count
+    optional = 0
+    for bit, count in singles.items():
+        if not bit & recommended and count >= optional_support * n_cases:
+            optional |= bit
+
+    combinations = sorted(((itemset, count) for itemset, count in itemsets.items() if itemset.bit_count() > 1),
+                          key=lambda item: (-item[1], -item[0].bit_count(), item[0]))
+    return {
+        "cases": n_cases,
+        "mandatory": mandatory,
+        "recommended": recommended,
+        "optional": optional,
+        "test_support": {bit: count / n_cases for bit, count in singles.items()},
+        "recommended_support": recommended_count / n_cases,
+        "confidence": recommended_count / mandatory_count if mandatory_count else 0.0,
+        "itemsets": [(itemset, count / n_cases) for itemset, count in combinations[:TOP_ITEMSETS]],
+        "frequent_itemsets": len(itemsets),
+    }
+
+
+def mine(transactions, min_cases=MIN_CASES, workers=1, **thresholds):
+    """Regelvorschläge für alle (Diagnose, MTS-Kategorie) mit mindestens ``min_cases`` Fällen.
+
+    Die Schlüssel werden (mit ``workers`` > 1) auf Prozesse verteilt. Ergebnis: Liste von Dicts
+    im Format der Empfehlungen (``diagnosis_name``, ``mts_category``, Testlisten) plus Kennzahlen,
+    sortiert nach Diagnose und MTS-Kategorie.
+    """
+    keys = [key for key, masks in transactions.groups.items() if sum(masks.values()) >= min_cases]
+    tasks = [transactions.groups[key] for key in keys]
+    results = _map(partial(propose, **thresholds), tasks, workers, chunksize=max(1, len(tasks) // 64))
+    codes = transactions.codes
+    proposals = []
+    for key, result in zip(keys, results):
+        proposals.append({
+            "diagnosis_name": transactions.display_name(key),
+            "mts_category": key[1],
+            "recommended_tests": codes(result['recommended']),
+            "mandatory_tests": codes(result['mandatory']),
+            "optional_tests": codes(result['optional']),
+            "cases": result['cases'],
+            "recommended_support": result['recommended_support'],
+            "confidence": result['confidence'],
+            "test_support": {codes(bit)[0]: share for bit, share in sorted(result['test_support'].items(), key=lambda item: -item[1])},
+            "itemsets": [(codes(itemset), share) for itemset, share in result['itemsets']],
+            "frequent_itemsets": result['frequent_itemsets'],
+        })
+    mts_rank = {category: rank for rank, category in enumerate(MTS_CATEGORIES)}
+    proposals.sort(key=lambda proposal: (normalize_diagnosis(proposal['diagnosis_name']), mts_rank.get(proposal['mts_category'], len(mts_rank))))
+    return proposals
+
+
+def compare(proposal, recommendation):
+    """Abgleich eines Vorschlags mit der bestehenden Regel: 'neu', 'gleich' oder 'abweichend: <Listen>'."""
+    if recommendation is None:
+        return "neu"
+    changed = [label for field, label in LIST_LABELS.items() if set(proposal[field]) != set(recommendation.get(field) or [])]
+    return f"abweichend: {', '.join(changed)}" if changed else "gleich"
+
+
+# --- Kommandozeile ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Leitet Empfehlungsregeln aus den Fällen einer SQLite-Datenbank ab (FP-Growth, mehrere Prozesse).")
+    parser.add_argument("--db", required=True, help="Pfad zur SQLite-Datenbank (wie LABASSIST_DB_PATH)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Prozesse für Einlesen und Auswertung")
+    parser.add_argument("--min-cases", type=int, default=MIN_CASES, help="Mindestanzahl Fälle je Diagnose und MTS-Kategorie")
+    parser.add_argument("--min-support", type=float, default=MIN_SUPPORT, help="Mindestanteil häufiger Kombinationen")
+    parser.add_argument("--mandatory-support", type=float, default=MANDATORY_SUPPORT, help="Anteil für Pflicht-Tests")
+    parser.add_argument("--recommended-support", type=float, default=RECOMMENDED_SUPPORT, help="Anteil für die empfohlene Kombination")
+    parser.add_argument("--optional-support", type=float, default=OPTIONAL_SUPPORT, help="Anteil für optionale Tests")
+    parser.add_argument("--output", help="Vorschläge als JSON in diese Datei schreiben")
+    args = parser.parse_args(argv)
+
+    from storage import SQLiteStorage  # erst hier: der Rest des Moduls kommt ohne Storage aus
+
+    started = time.perf_counter()
+    catalog = SQLiteStorage(args.db).load_catalog()
+    index = {}
+    for rec in catalog['recommendations']:
+        index.setdefault(recommendation_key(rec['diagnosis_name'], rec['mts_category']), rec)
+
+    def progress(done, total):
+        print(f"\r{done}/{total} Bereiche gelesen", end="", file=sys.stderr, flush=True)
+
+    transactions = scan_sqlite(args.db, [test['test_code'] for test in catalog['lab_tests']], args.workers, on_progress=progress)
+    print(file=sys.stderr)
+    scanned = time.perf_counter()
+    proposals = mine(transactions, args.min_cases, args.workers, min_support=args.min_support,
+                     mandatory_support=args.mandatory_support, recommended_support=args.recommended_support,
+                     optional_support=args.optional_support)
+    finished = time.perf_counter()
+
+    for proposal in proposals:
+        proposal['status'] = compare(proposal, index.get(recommendation_key(proposal['diagnosis_name'], proposal['mts_category'])))
+        print(f"{proposal['diagnosis_name'][:32]:<32} {proposal['mts_category']:<7} {proposal['cases']:>9} Fälle  "
+              f"Pflicht {','.join(proposal['mandatory_tests']) or '-':<20} Empfohlen {','.join(proposal['recommended_tests']) or '-':<28} "
+              f"({proposal['recommended_support']:.0%}, Konfidenz {proposal['confidence']:.0%})  {proposal['status']}")
+    print(f"{len(transactions)} Fälle, {sum(map(len, transactions.groups.values()))} verschiedene Testlisten, "
+          f"{len(proposals)} Vorschläge; Einlesen {scanned - started:.1f} s, Auswertung {finished - scanned:.1f} s")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(proposals, handle, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
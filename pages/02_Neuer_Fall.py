@@ -1,17 +1,15 @@
 # pages/02_Neuer_Fall.py
 
 import streamlit as st
-from utils import init_state, custom_css, MTS_CATEGORIES, MTS_COLOR_MAP, create_case
-import time
+from utils import init_state, finish_rerun, custom_css, MTS_CATEGORIES, MTS_COLOR_MAP, create_case, get_recommendation_provider, evaluate_quality, expected_tat, suggest_panel, lab_test_options
+from instrumentation import section
 
 # Setup
 st.set_page_config(layout="wide", page_title="Neuer Fall | Erfassung")
-init_state() 
+init_state("Neuer Fall")
 custom_css()
 
 # --- Datenabruf (aus Session State) ---
-_lab_tests = st.session_state.lab_tests
-_recommendations = st.session_state.recommendations
 _diagnoses = st.session_state.diagnoses
 
 
@@ -32,13 +30,9 @@ def handle_analyze():
     diag = st.session_state.new_case_data.get('suspected_diagnosis')
     
     st.session_state.is_analyzing = True
-    time.sleep(0.8) # Simulate network delay
     
-    matching_rec = next((
-        r for r in _recommendations
-        if r['diagnosis_name'].lower() == diag.lower() and 
-           r['mts_category'] == mts
-    ), None)
+    # Lokales Regelwerk oder externer Dienst (mit Timeout und Fallback), siehe utils.get_recommendation_provider
+    matching_rec = get_recommendation_provider().recommend(diag, mts, st.session_state.new_case_data)
 
     if matching_rec:
         st.session_state.current_recommendation = matching_rec
@@ -54,6 +48,11 @@ def handle_analyze():
     st.session_state.is_analyzing = False
     next_step() # Geht zu Schritt 6 (Testauswahl)
 
+def apply_panel(tests):
+    """Übernimmt den Sparvorschlag als Testauswahl; das Multiselect startet danach mit der neuen Vorauswahl."""
+    st.session_state.selected_tests = list(tests)
+    st.session_state.pop('final_test_selection_multiselect', None)
+
 
 def handle_submit():
     """Speichert den Fall im letzten Schritt."""
@@ -64,24 +63,13 @@ def handle_submit():
         st.error("Bitte wählen Sie mindestens einen Test aus.")
         return
 
-    # Analyse der Qualität
-    mandatory_tests = rec.get('mandatory_tests', []) if rec else []
-    recommended_set = set(rec.get('recommended_tests', [])) if rec else set()
-    optional_test_codes = set(rec.get('optional_tests', [])) if rec else set()
-
-    missing_tests = [t for t in mandatory_tests if t not in selected_tests]
-    unnecessary_tests = [t for t in selected_tests if t not in recommended_set and t not in optional_test_codes]
-    
-    max_duration = max([t['estimated_duration_minutes'] for t in _lab_tests if t['test_code'] in selected_tests], default=0)
-
-    # Datenstruktur erstellen
+    # Datenstruktur erstellen (inkl. Analyse der Qualität)
     case_data = {
         **st.session_state.new_case_data, 
         "ordered_tests": selected_tests,
         "recommended_tests": rec['recommended_tests'] if rec else [],
-        "missing_tests": missing_tests,
-        "unnecessary_tests": unnecessary_tests,
-        "estimated_total_duration": max_duration,
+        **evaluate_quality(selected_tests, rec),
+        "expected_tat": expected_tat(selected_tests, st.session_state.new_case_data.get('mts_category'))['tat'],
     }
 
     create_case(case_data)
@@ -96,6 +84,7 @@ def handle_submit():
 
 
 # --- UI Layout ---
+section("Header")
 st.markdown('<div class="max-w-4xl mx-auto py-6">', unsafe_allow_html=True)
 
 st.page_link("app.py", label="Zurück zum Dashboard", icon="arrow-left") # Korrektur: Lucide Icon Name
@@ -109,6 +98,8 @@ MAX_STEPS = 6
 st.progress((st.session_state.step + 1) / MAX_STEPS, text=f"**Schritt {st.session_state.step+1}/{MAX_STEPS}** abgeschlossen")
 st.markdown("<br>", unsafe_allow_html=True)
 
+section(f"Schritt {st.session_state.step}") # je Rerun wird genau ein Schritt gerendert
+
 # ----------------- STEP 0: Identifikation -----------------
 if st.session_state.step == 0:
     with st.form(key="step_0_id_form", clear_on_submit=False):
@@ -251,19 +242,16 @@ elif st.session_state.step == 5:
             if recommendation.get('rationale'):
                 st.markdown(f'<div class="alert-blue"><p style="margin: 0; font-size: 0.95rem;">{recommendation["rationale"]}</p></div>', unsafe_allow_html=True)
             
-            recommended_test_codes = set(recommendation.get('recommended_tests', []))
-            mandatory_test_codes = set(recommendation.get('mandatory_tests', []))
-            
             # --- Testauswahl (Multiselect für bessere Usability) ---
-            all_lab_test_codes = [t['test_code'] for t in _lab_tests]
-            
-            # Gruppierung der empfohlenen Tests
-            default_selection = [t for t in all_lab_test_codes if t in st.session_state.selected_tests]
+            # Statt des ganzen Katalogs: gewählte und empfohlene Tests plus Treffer der Testsuche
+            test_query = st.text_input("Labortest suchen", key="test_search_query",
+                                       placeholder="Code, Name oder Kategorie, z.B. 'trop' oder 'gerinnung'")
+            test_options = lab_test_options(test_query, keep=[*st.session_state.selected_tests, *recommendation.get('recommended_tests', []), *recommendation.get('mandatory_tests', [])])
             
             selected_tests_multiselect = st.multiselect(
                 "Wählen Sie die Labortests aus, die angefordert werden sollen (KI-Vorauswahl)",
-                options=all_lab_test_codes,
-                default=default_selection,
+                options=test_options,
+                default=st.session_state.selected_tests,
                 help="Die KI-Empfehlungen sind bereits vorausgewählt. Passen Sie die Auswahl manuell an.",
                 key="final_test_selection_multiselect"
             )
@@ -275,12 +263,9 @@ elif st.session_state.step == 5:
                 st.markdown("---")
                 st.markdown("#### **Qualitätsprüfung** (Live-Analyse)")
                 
-                selected_tests = st.session_state.selected_tests
-                
-                missing_tests = [t for t in mandatory_test_codes if t not in selected_tests]
-                recommended_set = set(recommendation.get('recommended_tests', []))
-                optional_test_codes = set(recommendation.get('optional_tests', []))
-                unnecessary_tests = [t for t in selected_tests if t not in recommended_set and t not in optional_test_codes]
+                quality = evaluate_quality(st.session_state.selected_tests, recommendation)
+                missing_tests = quality['missing_tests']
+                unnecessary_tests = quality['unnecessary_tests']
                 
                 if missing_tests:
                     st.markdown(f"""<div class="alert-red"><p style="margin:0;"><span style="font-weight: 600;">Fehlende Pflicht-Tests:</span> {', '.join(missing_tests)}</p></div>""", unsafe_allow_html=True)
@@ -288,6 +273,22 @@ elif st.session_state.step == 5:
                     st.markdown(f"""<div class="alert-amber"><p style="margin:0;"><span style="font-weight: 600;">Möglicherweise überflüssig:</span> {', '.join(unnecessary_tests)}</p></div>""", unsafe_allow_html=True)
                 if not missing_tests and not unnecessary_tests:
                     st.markdown("""<div class="alert-green"><p style="margin:0;"><span style="font-weight: 600;">Alle Empfehlungen befolgt</span></p></div>""", unsafe_allow_html=True)
+
+                # --- Erwartete Durchlaufzeit (Warteschlangen der Analysegeräte, siehe tat.py) ---
+                tat_estimate = expected_tat(st.session_state.selected_tests, st.session_state.new_case_data.get('mts_category'))
+                last_test = max(tat_estimate['tests'], key=tat_estimate['tests'].get, default=None)
+                last_test_note = f", zuletzt fertig: {last_test}" if last_test else ""
+                st.markdown(f"""<div class="alert-blue" style="margin-top: 0.5rem;"><p style="margin:0;"><span style="font-weight: 600;">Erwartete Durchlaufzeit: {tat_estimate['tat']} min</span> bei aktueller Laborauslastung (reine Messdauer {tat_estimate['processing']} min{last_test_note})</p></div>""", unsafe_allow_html=True)
+
+                # --- Sparvorschlag (günstigstes Panel innerhalb der Zielzeit, siehe panel.py) ---
+                mts_category = st.session_state.new_case_data.get('mts_category')
+                panel = suggest_panel(recommendation, mts_category, st.session_state.selected_tests)
+                if panel['over_target']:
+                    st.markdown(f"""<div class="alert-amber" style="margin-top: 0.5rem;"><p style="margin:0;"><span style="font-weight: 600;">Pflicht-Tests über der Zielzeit ({panel['target']} min, MTS {mts_category}):</span> {', '.join(panel['over_target'])}</p></div>""", unsafe_allow_html=True)
+                if set(panel['tests']) != set(st.session_state.selected_tests) and panel['cost'] < panel['selected_cost']:
+                    dropped_note = f"; nicht in der Zielzeit: {', '.join(panel['uncovered'])}" if panel['uncovered'] else ""
+                    st.markdown(f"""<div class="alert-green" style="margin-top: 0.5rem;"><p style="margin:0;"><span style="font-weight: 600;">Sparvorschlag: {', '.join(panel['tests'])}</span> für {panel['cost']:.2f} € statt {panel['selected_cost']:.2f} €, fertig in ca. {panel['duration']} min{dropped_note}</p></div>""", unsafe_allow_html=True)
+                    st.button("Vorschlag übernehmen", on_click=apply_panel, args=(panel['tests'],), key="apply_panel_suggestion")
             
         st.markdown('</div>', unsafe_allow_html=True) 
         st.markdown('</div>', unsafe_allow_html=True)
@@ -304,4 +305,6 @@ elif st.session_state.step == 5:
     else:
         st.warning("Keine Empfehlung verfügbar. Bitte zur Diagnoseeingabe zurückkehren und korrigieren.", icon="⚠️")
 
-st.markdown('</div>', unsafe_allow_html=True) # Main Container End
\ No newline at end of file
+st.markdown('</div>', unsafe_allow_html=True) # Main Container End
+
+finish_rerun()
@@ -1,19 +1,21 @@
 # pages/03_Laborparameter.py
 
 import streamlit as st
-from utils import init_state, custom_css, LABTEST_CATEGORIES, URGENCY_LEVELS, create_lab_test, delete_lab_test, LAB_CATEGORIES_BADGE_MAP
-import pandas as pd
+from utils import init_state, finish_rerun, custom_css, LABTEST_CATEGORIES, URGENCY_LEVELS, create_lab_test, delete_lab_test, lab_test_frame, LAB_CATEGORIES_BADGE_MAP
+from instrumentation import section
+from panel import test_cost
 import time
 
 # Setup
 st.set_page_config(layout="wide", page_title="LabAssist | Laborparameter verwalten")
-init_state() 
+init_state("Laborparameter")
 custom_css()
 
 # --- Datenabruf ---
 lab_tests = st.session_state.lab_tests
 
 # --- Header Section (Fixed, Bombastisch) ---
+section("Header")
 st.markdown(f"""
     <div class="main-header">
         <div style="display: flex; align-items: center; gap: 1rem;">
@@ -42,6 +44,7 @@ st.markdown('<div class="max-w-7xl mx-auto py-6">', unsafe_allow_html=True)
 st.markdown("---") 
 
 # --- Liste der Labortests (Dataframe oder individuelle Darstellung) ---
+section("Testliste")
 st.markdown('<div class="stCard-custom">', unsafe_allow_html=True)
 st.markdown('<div class="stCard-header">Aktuelle Laborparameter</div>', unsafe_allow_html=True)
 st.markdown('<div class="stCard-content">', unsafe_allow_html=True)
@@ -50,13 +53,8 @@ if not lab_tests:
     st.info("Es sind noch keine Laborparameter hinterlegt. Fügen Sie den ersten Test hinzu!", icon="ℹ️")
 else:
     # Optionale Anzeige als Tabelle für Übersichtlichkeit, aber detaillierte Ansicht auch möglich
-    df_lab_tests = pd.DataFrame(lab_tests)
-    df_lab_tests = df_lab_tests.drop(columns=['id']) # ID nicht anzeigen
-    
-    # Spalten umbenennen für bessere Lesbarkeit
-    df_lab_tests.columns = [
-        "Testname", "Testcode", "Kategorie", "Dauer (min)", "Dringlichkeit", "Einheit", "Normalbereich"
-    ]
+    # (gecacht je Katalogversion, ohne ID und mit lesbaren Spaltennamen)
+    df_lab_tests = lab_test_frame(st.session_state.catalog_version, lab_tests)
     
     st.dataframe(df_lab_tests, 
                  use_container_width=True, 
@@ -77,6 +75,12 @@ else:
                          help="Geschätzte Dauer bis Ergebnis (Minuten)",
                          format="%d",
                          width="small"
+                     ),
+                     "Kosten (€)": st.column_config.NumberColumn(
+                         "Kosten (€)",
+                         help="Kosten je Test; ohne Angabe Standardkosten der Kategorie",
+                         format="%.2f",
+                         width="small"
                      )
                  })
     
@@ -94,7 +98,7 @@ else:
                         <span class="badge-base bg-blue-100 text-blue-800">{test['urgency_level']}</span>
                     </div>
                 </div>
-                <p style="margin-bottom: 0.5rem; color: #475569;">Dauer: {test['estimated_duration_minutes']} min | Einheit: {test['unit']} | Normalbereich: {test['normal_range']}</p>
+                <p style="margin-bottom: 0.5rem; color: #475569;">Dauer: {test['estimated_duration_minutes']} min | Kosten: {test_cost(test):.2f} € | Einheit: {test['unit']} | Normalbereich: {test['normal_range']}</p>
                 
                 <div style="display: flex; gap: 0.5rem; margin-top: 1rem;">
                     <div class="red-button">
@@ -113,6 +117,7 @@ st.markdown('</div>', unsafe_allow_html=True) # Ende stCard-custom
 
 
 # --- Neuer Labortest Dialog (Modal-Simulation) ---
+section("Neuer-Test-Dialog")
 if st.session_state.get('new_test_dialog_open', False):
     with st.container(): # Simuliert ein Modal
         st.subheader("Neuen Labortest hinzufügen")
@@ -133,7 +138,12 @@ if st.session_state.get('new_test_dialog_open', False):
             with col_unit:
                 unit = st.text_input("Einheit", placeholder="z.B. ng/ml, mg/L")
             
-            normal_range = st.text_input("Normalbereich", placeholder="z.B. 0-14, <5")
+            col_range, col_cost = st.columns(2)
+            with col_range:
+                normal_range = st.text_input("Normalbereich", placeholder="z.B. 0-14, <5")
+            with col_cost:
+                cost = st.number_input("Kosten je Test (€)", min_value=0.0, value=None, step=0.5, format="%.2f",
+                                       help="Leer lassen für die Standardkosten der Kategorie")
             
             col_dialog_buttons_1, col_dialog_buttons_2 = st.columns(2)
             with col_dialog_buttons_1:
@@ -150,7 +160,8 @@ if st.session_state.get('new_test_dialog_open', False):
                                 "estimated_duration_minutes": estimated_duration_minutes,
                                 "urgency_level": urgency_level,
                                 "unit": unit,
-                                "normal_range": normal_range
+                                "normal_range": normal_range,
+                                "cost": cost
                             }
                             create_lab_test(new_test_data)
                             st.session_state.new_test_dialog_open = False
@@ -163,4 +174,6 @@ if st.session_state.get('new_test_dialog_open', False):
                     st.session_state.new_test_dialog_open = False
                     st.rerun()
 
-st.markdown('</div>', unsafe_allow_html=True) # Main Container End
\ No newline at end of file
+st.markdown('</div>', unsafe_allow_html=True) # Main Container End
+
+finish_rerun()
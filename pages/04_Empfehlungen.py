@@ -1,26 +1,27 @@
 # pages/04_Empfehlungen.py
 
 import streamlit as st
-from utils import init_state, custom_css, MTS_CATEGORIES, LABTEST_CATEGORIES, URGENCY_LEVELS, create_recommendation, delete_recommendation
+from utils import init_state, finish_rerun, custom_css, render_jobs, MTS_CATEGORIES, MTS_COLOR_MAP, LABTEST_CATEGORIES, URGENCY_LEVELS, create_recommendation, delete_recommendation, find_recommendation, lab_test_options, mine_recommendations, create_vital_rule, delete_vital_rule
+from instrumentation import section
+from mining import MIN_CASES, MANDATORY_SUPPORT, RECOMMENDED_SUPPORT, OPTIONAL_SUPPORT, compare
+from rules import RULE_FIELDS, OPERATORS, describe
 import pandas as pd
 import time
 
 # Setup
 st.set_page_config(layout="wide", page_title="LabAssist | Empfehlungen konfigurieren")
-init_state() 
+init_state("Empfehlungen")
 custom_css()
 
 # --- Datenabruf ---
 recommendations = st.session_state.recommendations
-lab_tests = st.session_state.lab_tests
 diagnoses = st.session_state.diagnoses
 
-# Alle verfügbaren Testcodes
-all_test_codes = sorted([t['test_code'] for t in lab_tests])
 all_diagnosis_names = sorted([d['diagnosis_name'] for d in diagnoses])
 
 
 # --- Header Section (Fixed, Bombastisch) ---
+section("Header")
 st.markdown(f"""
     <div class="main-header">
         <div style="display: flex; align-items: center; gap: 1rem;">
@@ -33,7 +34,7 @@ st.markdown(f"""
             </div>
         </div>
         <div class="green-button">
-            {st.button("Neue Empfehlung erstellen", key="add_new_recommendation", on_click=lambda: st.session_state.new_rec_dialog_open=True)}
+            {st.button("Neue Empfehlung erstellen", key="add_new_recommendation", on_click=lambda: st.session_state.update(new_rec_dialog_open=True))}
         </div>
     </div>
 """, unsafe_allow_html=True)
@@ -41,6 +42,9 @@ st.markdown(f"""
 # Platzhalter für den fixed Header
 st.markdown('<div class="header-spacer"></div>', unsafe_allow_html=True)
 
+# Laufende Hintergrundjobs dieser Session (z.B. Neubewertung nach Regeländerung)
+render_jobs()
+
 
 # --- Hauptbereich ---
 st.markdown('<div class="max-w-7xl mx-auto py-6">', unsafe_allow_html=True)
@@ -48,6 +52,7 @@ st.markdown('<div class="max-w-7xl mx-auto py-6">', unsafe_allow_html=True)
 st.markdown("---") 
 
 # --- Liste der Empfehlungen ---
+section("Empfehlungsliste")
 st.markdown('<div class="stCard-custom">', unsafe_allow_html=True)
 st.markdown('<div class="stCard-header">Aktuelle Empfehlungen</div>', unsafe_allow_html=True)
 st.markdown('<div class="stCard-content">', unsafe_allow_html=True)
@@ -94,20 +99,140 @@ else:
             </div>
         """, unsafe_allow_html=True)
         if st.session_state[f"delete_rec_{rec['id']}"]:
-            delete_recommendation(rec['id'])
-            st.toast(f"Empfehlung für '{rec['diagnosis_name']}' ({rec['mts_category']}) gelöscht.", icon="🗑️")
+            changed = delete_recommendation(rec['id'])
+            st.toast(f"Empfehlung für '{rec['diagnosis_name']}' ({rec['mts_category']}) gelöscht. "
+                     + ("Neubewertung der Fälle läuft im Hintergrund." if changed is None else f"{changed} Fälle neu bewertet."), icon="🗑️")
             st.rerun()
 
 st.markdown('</div>', unsafe_allow_html=True)
 st.markdown('</div>', unsafe_allow_html=True) # Ende stCard-custom
 
 
+# --- Regelvorschläge aus Falldaten (häufige Testkombinationen, siehe mining.py) ---
+section("Regelvorschläge")
+with st.expander("Regelvorschläge aus Falldaten ⛏️", expanded=bool(st.session_state.get('mined_recommendations'))):
+    st.caption("Sucht je Verdachtsdiagnose und MTS-Kategorie häufig gemeinsam angeforderte Tests (FP-Growth) "
+               "und leitet daraus Pflicht-, empfohlene und optionale Tests ab. Für große Datenbanken: `python mining.py --db ...`.")
+    col_cases, col_mandatory, col_recommended, col_optional = st.columns(4)
+    with col_cases:
+        mining_min_cases = st.number_input("Mindestanzahl Fälle", min_value=1, value=MIN_CASES, step=10, key="mining_min_cases")
+    with col_mandatory:
+        mining_mandatory = st.slider("Pflicht ab", 0.5, 1.0, MANDATORY_SUPPORT, 0.05, key="mining_mandatory_support")
+    with col_recommended:
+        mining_recommended = st.slider("Empfohlen ab", 0.2, 1.0, RECOMMENDED_SUPPORT, 0.05, key="mining_recommended_support")
+    with col_optional:
+        mining_optional = st.slider("Optional ab", 0.05, 1.0, OPTIONAL_SUPPORT, 0.05, key="mining_optional_support")
+    if st.button("Fälle auswerten", key="mining_run"):
+        st.session_state.mined_recommendations = mine_recommendations(
+            mining_min_cases, mandatory_support=mining_mandatory, recommended_support=mining_recommended,
+            optional_support=min(mining_optional, mining_recommended))
+
+    proposals = st.session_state.get('mined_recommendations')
+    if proposals is not None and not proposals:
+        st.info("Keine Diagnose/MTS-Kombination erreicht die Mindestanzahl Fälle.", icon="ℹ️")
+    elif proposals:
+        # Abgleich mit den Regeln bei jedem Rerun, damit übernommene Vorschläge sofort als "gleich" erscheinen
+        statuses = [compare(p, find_recommendation(p['diagnosis_name'], p['mts_category'])) for p in proposals]
+        st.dataframe([{
+            "Diagnose": p['diagnosis_name'], "MTS": p['mts_category'], "Fälle": p['cases'],
+            "Pflicht": ", ".join(p['mandatory_tests']), "Empfohlen": ", ".join(p['recommended_tests']),
+            "Optional": ", ".join(p['optional_tests']), "Support": p['recommended_support'] * 100,
+            "Konfidenz": p['confidence'] * 100, "Abgleich": status,
+        } for p, status in zip(proposals, statuses)], use_container_width=True, hide_index=True, column_config={
+            "Fälle": st.column_config.NumberColumn("Fälle", format="%d"),
+            "Support": st.column_config.NumberColumn("Support (%)", help="Anteil der Fälle mit allen empfohlenen Tests", format="%.0f"),
+            "Konfidenz": st.column_config.NumberColumn("Konfidenz (%)", help="Anteil der Fälle mit allen Pflicht-Tests, die auch die übrigen empfohlenen Tests enthalten", format="%.0f"),
+            "Abgleich": st.column_config.Column("Abgleich", help="'neu' = keine Regel vorhanden, sonst abweichende Listen der bestehenden Regel"),
+        })
+        new_proposals = [i for i, status in enumerate(statuses) if status == "neu" and proposals[i]['recommended_tests']]
+        if new_proposals:
+            col_choice, col_apply = st.columns([3, 1])
+            with col_choice:
+                choice = st.selectbox("Vorschlag ohne bestehende Regel", options=new_proposals, key="mining_choice",
+                                      format_func=lambda i: f"{proposals[i]['diagnosis_name']} ({proposals[i]['mts_category']})")
+            with col_apply:
+                if st.button("Als Empfehlung anlegen", key="mining_apply", use_container_width=True):
+                    proposal = proposals[choice]
+                    changed = create_recommendation({
+                        "diagnosis_name": proposal['diagnosis_name'],
+                        "mts_category": proposal['mts_category'],
+                        "recommended_tests": proposal['recommended_tests'],
+                        "mandatory_tests": proposal['mandatory_tests'],
+                        "optional_tests": proposal['optional_tests'],
+                        "rationale": f"Aus {proposal['cases']} Fällen abgeleitet: empfohlene Kombination in {proposal['recommended_support']:.0%} "
+                                     f"der Fälle, Konfidenz {proposal['confidence']:.0%}.",
+                    })
+                    st.toast(f"Empfehlung für '{proposal['diagnosis_name']}' aus Falldaten angelegt. "
+                             + ("Neubewertung der Fälle läuft im Hintergrund." if changed is None else f"{changed} Fälle neu bewertet."), icon="⛏️")
+                    st.rerun()
+
+
+# --- Vitalregeln (ergänzen die Empfehlung anhand von Alter und Vitalparametern, siehe rules.py) ---
+section("Vitalregeln")
+vital_rules = st.session_state.vital_rules
+with st.expander(f"Vitalregeln ({len(vital_rules)}) 🩺", expanded=False):
+    st.caption("Greift eine Regel bei der Analyse im Wizard, werden ihre Tests zur Empfehlung hinzugefügt "
+               "(bei Pflicht-Regeln auch als Pflicht-Tests), unabhängig von der Verdachtsdiagnose.")
+    for rule in vital_rules:
+        col_rule, col_delete = st.columns([5, 1])
+        with col_rule:
+            st.markdown(f"**{rule['name']}**{' · Pflicht' if rule.get('mandatory') else ''}: {describe(rule)} → {', '.join(rule['tests'])}"
+                        + (f"  \n<span style='color: #64748B;'>{rule['rationale']}</span>" if rule.get('rationale') else ""),
+                        unsafe_allow_html=True)
+        with col_delete:
+            if st.button("Löschen", key=f"delete_vital_rule_{rule['id']}", use_container_width=True):
+                delete_vital_rule(rule['id'])
+                st.toast(f"Vitalregel '{rule['name']}' gelöscht.", icon="🗑️")
+                st.rerun()
+
+    st.markdown("**Neue Vitalregel**")
+    rule_name = st.text_input("Name", key="new_vital_rule_name", placeholder="z.B. Hypoxämie")
+    # Bis zu zwei Bedingungen, die alle erfüllt sein müssen
+    conditions = []
+    for position in range(2):
+        col_field, col_op, col_value = st.columns([3, 1, 2])
+        with col_field:
+            field = st.selectbox(f"Bedingung {position + 1}", options=[None, *RULE_FIELDS], key=f"new_vital_rule_field_{position}",
+                                 format_func=lambda f: "–" if f is None else f"{RULE_FIELDS[f][0]} ({RULE_FIELDS[f][1]})")
+        with col_op:
+            op = st.selectbox("Vergleich", options=OPERATORS, key=f"new_vital_rule_op_{position}")
+        with col_value:
+            value = st.number_input("Schwelle", value=0.0, step=1.0, key=f"new_vital_rule_value_{position}")
+        if field is not None:
+            conditions.append({"field": field, "op": op, "value": value})
+    rule_test_query = st.text_input("Labortest suchen", key="new_vital_rule_test_search_query", placeholder="Code, Name oder Kategorie")
+    rule_tests = st.multiselect("Tests", options=lab_test_options(rule_test_query, keep=st.session_state.get('new_vital_rule_tests', [])),
+                                key="new_vital_rule_tests")
+    col_mandatory, col_mts = st.columns([1, 3])
+    with col_mandatory:
+        rule_mandatory = st.checkbox("Als Pflicht-Tests", key="new_vital_rule_mandatory")
+    with col_mts:
+        rule_mts = st.multiselect("Nur für MTS-Kategorien (leer = alle)", options=MTS_CATEGORIES, key="new_vital_rule_mts")
+    rule_rationale = st.text_input("Begründung", key="new_vital_rule_rationale")
+    if st.button("Vitalregel speichern", key="new_vital_rule_save", type="primary"):
+        if rule_name and conditions and rule_tests:
+            create_vital_rule({
+                "name": rule_name,
+                "conditions": conditions,
+                "tests": rule_tests,
+                "mandatory": rule_mandatory,
+                "mts_categories": rule_mts,
+                "rationale": rule_rationale,
+            })
+            st.toast(f"Vitalregel '{rule_name}' angelegt.", icon="🩺")
+            st.rerun()
+        else:
+            st.error("Bitte Name, mindestens eine Bedingung und mindestens einen Test angeben.")
+
+
 # --- Neue Empfehlung Dialog (Modal-Simulation) ---
+section("Neue-Empfehlung-Dialog")
 if st.session_state.get('new_rec_dialog_open', False):
     with st.container(): # Simuliert ein Modal
         st.subheader("Neue Empfehlung erstellen")
         
-        with st.form(key="new_recommendation_form", clear_on_submit=False):
+        # Kein st.form: Testsuche und Pflicht-Tests müssen sich ohne Absenden aktualisieren
+        with st.container(border=True, key="new_recommendation_form"):
             # Diagnose
             diagnosis_name = st.selectbox(
                 "Verdachtsdiagnose (Basis der Empfehlung)", 
@@ -124,10 +249,15 @@ if st.session_state.get('new_rec_dialog_open', False):
                 format_func=lambda x: f"● {x}"
             )
             
+            # Testsuche; bereits gewählte Tests bleiben in den Optionen
+            rec_test_query = st.text_input("Labortest suchen", key="new_rec_test_search_query",
+                                           placeholder="Code, Name oder Kategorie, z.B. 'trop' oder 'gerinnung'")
+            
             # Empfohlene Tests (können optional sein, aber oft die Basis)
             recommended_tests = st.multiselect(
                 "Empfohlene Labortests", 
-                options=all_test_codes, 
+                options=lab_test_options(rec_test_query, keep=st.session_state.get('new_rec_recommended_tests', [])),
+                key="new_rec_recommended_tests",
                 help="Alle Tests, die für diese Diagnose/MTS-Kategorie grundsätzlich empfohlen werden."
             )
             
@@ -141,7 +271,8 @@ if st.session_state.get('new_rec_dialog_open', False):
             # Optionale Tests (können angefordert werden, führen aber nicht zu "unnecessary")
             optional_tests = st.multiselect(
                 "Optionale Tests (keine Warnung bei Auswahl)",
-                options=[t for t in all_test_codes if t not in recommended_tests],
+                options=[t for t in lab_test_options(rec_test_query, keep=st.session_state.get('new_rec_optional_tests', [])) if t not in recommended_tests],
+                key="new_rec_optional_tests",
                 help="Zusätzliche Tests, die relevant sein können, aber nicht in der primären Empfehlung enthalten sind und auch keine Warnung bei Auswahl auslösen."
             )
             
@@ -150,10 +281,10 @@ if st.session_state.get('new_rec_dialog_open', False):
             
             col_dialog_buttons_1, col_dialog_buttons_2 = st.columns(2)
             with col_dialog_buttons_1:
-                if st.form_submit_button("Empfehlung speichern", type="primary"):
+                if st.button("Empfehlung speichern", key="new_rec_save", type="primary"):
                     if diagnosis_name and mts_category and recommended_tests and rationale:
                         # Prüfen, ob Kombination schon existiert
-                        if any(r['diagnosis_name'] == diagnosis_name and r['mts_category'] == mts_category for r in recommendations):
+                        if find_recommendation(diagnosis_name, mts_category):
                             st.error("Fehler: Eine Empfehlung für diese Diagnose und MTS-Kategorie existiert bereits.")
                         else:
                             new_rec_data = {
@@ -164,15 +295,18 @@ if st.session_state.get('new_rec_dialog_open', False):
                                 "optional_tests": optional_tests,
                                 "rationale": rationale
                             }
-                            create_recommendation(new_rec_data)
+                            changed = create_recommendation(new_rec_data)
                             st.session_state.new_rec_dialog_open = False
-                            st.toast(f"Empfehlung für '{diagnosis_name}' hinzugefügt.", icon="✨")
+                            st.toast(f"Empfehlung für '{diagnosis_name}' hinzugefügt. "
+                                     + ("Neubewertung der Fälle läuft im Hintergrund." if changed is None else f"{changed} Fälle neu bewertet."), icon="✨")
                             st.rerun()
                     else:
                         st.error("Bitte füllen Sie mindestens die Felder Diagnose, MTS-Kategorie, Empfohlene Tests und Begründung aus.")
             with col_dialog_buttons_2:
-                if st.form_submit_button("Abbrechen"):
+                if st.button("Abbrechen", key="new_rec_cancel"):
                     st.session_state.new_rec_dialog_open = False
                     st.rerun()
 
-st.markdown('</div>', unsafe_allow_html=True) # Main Container End
\ No newline at end of file
+st.markdown('</div>', unsafe_allow_html=True) # Main Container End
+
+finish_rerun()
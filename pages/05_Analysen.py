@@ -0,0 +1,118 @@
+# pages/05_Analysen.py
+
+import streamlit as st
+from utils import init_state, finish_rerun, custom_css, case_frame, MTS_CATEGORIES
+from instrumentation import section
+from analytics import filter_frame, summary, cohort_stats, duration_distribution, trend, TREND_FREQUENCIES
+
+# Setup
+st.set_page_config(layout="wide", page_title="LabAssist | Analysen")
+init_state("Analysen")
+custom_css()
+
+# --- Datenabruf (spaltenorientiert, gecacht je Datenstand) ---
+section("Datenabruf")
+df_cases = case_frame()
+
+COHORT_COLUMN_CONFIG = {
+    "cases": st.column_config.NumberColumn("Fälle", format="%d"),
+    "tests": st.column_config.NumberColumn("Tests", format="%d"),
+    "tests_per_case": st.column_config.NumberColumn("Ø Tests/Fall", format="%.1f"),
+    "compliance": st.column_config.ProgressColumn("Compliance", help="Anteil Fälle ohne fehlende Pflicht-Tests", format="percent", min_value=0.0, max_value=1.0),
+    "over_ordering": st.column_config.ProgressColumn("Überanforderung", help="Anteil Fälle mit nicht empfohlenen Tests", format="percent", min_value=0.0, max_value=1.0),
+    "missing_tests": st.column_config.NumberColumn("Fehlende Tests", format="%d"),
+    "unnecessary_tests": st.column_config.NumberColumn("Unnötige Tests", format="%d"),
+    "duration_mean": st.column_config.NumberColumn("Ø Durchlaufzeit (min)", help="Erwartete Durchlaufzeit bei Eingang; Fälle ohne diesen Wert mit ihrer reinen Messdauer", format="%.0f"),
+    "duration_p50": st.column_config.NumberColumn("Median (min)", format="%.0f"),
+    "duration_p90": st.column_config.NumberColumn("P90 (min)", format="%.0f"),
+}
+
+# --- Header Section (Fixed, Bombastisch) ---
+section("Header")
+st.markdown("""
+    <div class="main-header">
+        <div style="display: flex; align-items: center; gap: 1rem;">
+            <div style="width: 48px; height: 48px; background: linear-gradient(to bottom right, #8B5CF6, #7C3AED); border-radius: 12px; display: flex; align-items: center; justify-content: center; box-shadow: 0 4px 6px -1px rgba(124,58,237,0.3);">
+                <svg stroke="currentColor" fill="none" stroke-width="2" viewBox="0 0 24 24" stroke-linecap="round" stroke-linejoin="round" class="w-7 h-7 text-white" height="1em" width="1em" xmlns="http://www.w3.org/2000/svg"><line x1="18" y1="20" x2="18" y2="10"></line><line x1="12" y1="20" x2="12" y2="4"></line><line x1="6" y1="20" x2="6" y2="14"></line></svg>
+            </div>
+            <div>
+                <h1 style="font-size: 2.25rem; font-weight: 700; color: #0F172A; margin-bottom: 0.25rem; margin-top: 0;">Analysen</h1>
+                <p style="color: #64748B; font-size: 0.875rem; margin: 0;">Anforderungsverhalten, Leitlinientreue und Durchlaufzeit nach Diagnose, MTS-Kategorie und Zeitraum</p>
+            </div>
+        </div>
+    </div>
+""", unsafe_allow_html=True)
+
+# Platzhalter für den fixed Header
+st.markdown('<div class="header-spacer"></div>', unsafe_allow_html=True)
+
+st.markdown('<div class="max-w-7xl mx-auto py-6">', unsafe_allow_html=True)
+
+if df_cases.empty:
+    st.info("Noch keine Fälle vorhanden. Sobald Fälle erfasst sind, erscheinen hier die Auswertungen.", icon="ℹ️")
+    st.stop()
+
+# --- Filter ---
+section("Filter")
+first_day, last_day = df_cases['day'].min().date(), df_cases['day'].max().date()
+col_mts, col_diag, col_range, col_freq = st.columns([2, 3, 2, 1])
+with col_mts:
+    selected_mts = st.multiselect("MTS-Kategorie", options=MTS_CATEGORIES, key="analytics_mts", placeholder="Alle")
+with col_diag:
+    selected_diagnoses = st.multiselect("Diagnose", options=list(df_cases['diagnosis'].cat.categories), key="analytics_diagnoses", placeholder="Alle")
+with col_range:
+    date_range = st.date_input("Zeitraum", value=(first_day, last_day), min_value=first_day, max_value=last_day, key="analytics_range", format="DD.MM.YYYY")
+with col_freq:
+    frequency_label = st.selectbox("Trend je", options=list(TREND_FREQUENCIES), index=1, key="analytics_frequency")
+
+start, end = (date_range + (None, None))[:2] if isinstance(date_range, tuple) else (date_range, None)
+filtered = filter_frame(df_cases, selected_mts, selected_diagnoses, start, end)
+totals = summary(filtered)
+
+# --- Kennzahlen ---
+section("Kennzahlen")
+st.markdown("---")
+for col, (title, value) in zip(st.columns(4), [
+    ("Fälle", f"{totals['cases']:,}".replace(",", ".")),
+    ("Compliance", f"{totals['compliance']:.0%}"),
+    ("Überanforderung", f"{totals['overOrdering']:.0%}"),
+    ("Median Durchlaufzeit", f"{totals['medianDuration']:.0f} min"),
+]):
+    with col:
+        st.markdown(f"""
+        <div class="stat-card">
+            <p class="stat-title">{title}</p>
+            <p class="stat-value">{value}</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+if filtered.empty:
+    st.warning("Keine Fälle für die gewählten Filter.")
+    st.stop()
+
+# --- Kohorten ---
+section("Kohorten")
+st.markdown("## Kohorten 🧮")
+tab_diag, tab_mts = st.tabs(["Nach Diagnose", "Nach MTS-Kategorie"])
+with tab_diag:
+    st.dataframe(cohort_stats(filtered, 'diagnosis').sort_values('cases', ascending=False),
+                 use_container_width=True, column_config={"diagnosis": "Diagnose", **COHORT_COLUMN_CONFIG})
+with tab_mts:
+    st.dataframe(cohort_stats(filtered, 'mts_category'),
+                 use_container_width=True, column_config={"mts_category": "MTS-Kategorie", **COHORT_COLUMN_CONFIG})
+
+# --- Trends & Labordauer ---
+section("Trends")
+col_trend, col_duration = st.columns(2)
+with col_trend:
+    st.markdown(f"#### Trend je {frequency_label}")
+    df_trend = trend(filtered, TREND_FREQUENCIES[frequency_label])
+    st.line_chart(df_trend[['compliance', 'over_ordering']].rename(columns={"compliance": "Compliance", "over_ordering": "Überanforderung"}))
+    st.bar_chart(df_trend['cases'].rename("Fälle"))
+with col_duration:
+    st.markdown("#### Verteilung der Durchlaufzeit (min)")
+    st.bar_chart(duration_distribution(filtered, 'mts_category'))
+
+st.markdown('</div>', unsafe_allow_html=True)
+
+finish_rerun()
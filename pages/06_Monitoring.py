@@ -0,0 +1,158 @@
+# pages/06_Monitoring.py
+
+import os
+from datetime import datetime
+import streamlit as st
+from utils import init_state, finish_rerun, custom_css, admin_unlocked, WIDGET_ELEMENTS, ELEMENTS_COUNTED
+from instrumentation import section, metrics, profile_modes, PROFILE_ENV, METRICS_FILE_ENV, ELEMENT_COUNTER_ENV
+
+# Setup
+st.set_page_config(layout="wide", page_title="LabAssist | Monitoring")
+init_state("Monitoring")
+custom_css()
+
+TIMING_COLUMN_CONFIG = {
+    "count": st.column_config.NumberColumn("Anzahl", format="%d"),
+    "total_s": st.column_config.NumberColumn("Summe (s)", format="%.3f"),
+    "mean_ms": st.column_config.NumberColumn("Ø (ms)", format="%.2f"),
+    "p90_ms": st.column_config.NumberColumn("P90 (ms)", help="Obergrenze des Histogramm-Buckets", format="%.1f"),
+    "max_ms": st.column_config.NumberColumn("Max (ms)", format="%.2f"),
+}
+
+def _rerun_row(rerun):
+    elements = rerun['elements']
+    slowest = max(rerun['sections'], key=lambda item: item[1], default=None)
+    return {
+        "time": datetime.fromtimestamp(rerun['started']).strftime("%H:%M:%S"),
+        "page": rerun['page'],
+        "ms": rerun['seconds'] * 1000,
+        "elements": sum(elements.values()),
+        "markdown": elements.get('markdown', 0),
+        "widgets": sum(n for kind, n in elements.items() if kind in WIDGET_ELEMENTS),
+        "slowest": f"{slowest[0]} ({slowest[1] * 1000:.1f} ms)" if slowest else "",
+        "finished": rerun['finished'],
+    }
+
+# --- Header Section (Fixed, Bombastisch) ---
+section("Header")
+st.markdown("""
+    <div class="main-header">
+        <div style="display: flex; align-items: center; gap: 1rem;">
+            <div style="width: 48px; height: 48px; background: linear-gradient(to bottom right, #64748B, #334155); border-radius: 12px; display: flex; align-items: center; justify-content: center; box-shadow: 0 4px 6px -1px rgba(0,0,0,0.1);">
+                <svg stroke="currentColor" fill="none" stroke-width="2" viewBox="0 0 24 24" stroke-linecap="round" stroke-linejoin="round" class="w-7 h-7 text-white" height="1em" width="1em" xmlns="http://www.w3.org/2000/svg"><polyline points="22 12 18 12 15 21 9 3 6 12 2 12"></polyline></svg>
+            </div>
+            <div>
+                <h1 style="font-size: 2.25rem; font-weight: 700; color: #0F172A; margin-bottom: 0.25rem; margin-top: 0;">Monitoring</h1>
+                <p style="color: #64748B; font-size: 0.875rem; margin: 0;">Laufzeiten je Rerun, instrumentierte Abschnitte, ausgegebene Elemente und Profile</p>
+            </div>
+        </div>
+    </div>
+""", unsafe_allow_html=True)
+
+# Platzhalter für den fixed Header
+st.markdown('<div class="header-spacer"></div>', unsafe_allow_html=True)
+
+st.markdown('<div class="max-w-7xl mx-auto py-6">', unsafe_allow_html=True)
+
+# --- Zugang (Messwerte aller Sessions, Zurücksetzen) ---
+section("Zugang")
+if not admin_unlocked():
+    st.markdown('</div>', unsafe_allow_html=True)
+    finish_rerun()
+    st.stop()
+
+# --- Datenabruf (Kopie der prozessweiten Messwerte) ---
+section("Datenabruf")
+summary = metrics.summary()
+history = summary['history'][::-1] # neueste zuerst
+
+# --- Kennzahlen ---
+section("Kennzahlen")
+rows = [_rerun_row(rerun) for rerun in history]
+modes = profile_modes()
+for col, (title, value) in zip(st.columns(4), [
+    ("Reruns (Verlauf)", f"{len(rows)}"),
+    ("Ø Rerun", f"{sum(r['ms'] for r in rows) / len(rows):.0f} ms" if rows else "–"),
+    ("Ø Elemente/Rerun", f"{sum(r['elements'] for r in rows) / len(rows):.0f}" if rows and ELEMENTS_COUNTED else "–"),
+    ("Profiling", ", ".join(sorted(modes)) or "aus"),
+]):
+    with col:
+        st.markdown(f"""
+        <div class="stat-card">
+            <p class="stat-title">{title}</p>
+            <p class="stat-value">{value}</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+st.markdown("---")
+
+# --- Letzte Reruns ---
+section("Reruns")
+st.markdown("## Letzte Reruns ⏱️")
+if not ELEMENTS_COUNTED:
+    st.caption(f"Elementzählung ist aus. Mit `{ELEMENT_COUNTER_ENV}=1` werden ausgegebene Elemente je Rerun gezählt (nur bei geprüften Streamlit-Versionen).")
+if not rows:
+    st.info("Noch keine abgeschlossenen Reruns. Öffnen Sie eine andere Seite und kehren Sie zurück.", icon="ℹ️")
+else:
+    st.dataframe(rows, use_container_width=True, hide_index=True, column_config={
+        "time": "Zeit",
+        "page": "Seite",
+        "ms": st.column_config.NumberColumn("Dauer (ms)", format="%.1f"),
+        "elements": st.column_config.NumberColumn("Elemente", format="%d"),
+        "markdown": st.column_config.NumberColumn("Markdown", format="%d"),
+        "widgets": st.column_config.NumberColumn("Widgets", format="%d"),
+        "slowest": "Langsamster Abschnitt",
+        "finished": st.column_config.CheckboxColumn("Vollständig", help="Nein: per st.stop/st.rerun beendet, Dauer bis zur letzten Messung"),
+    })
+
+# --- Aggregate ---
+section("Aggregate")
+tab_spans, tab_pages, tab_counters = st.tabs(["Abschnitte & Spans", "Seiten", "Zähler"])
+with tab_spans:
+    st.dataframe(summary['spans'], use_container_width=True, hide_index=True, column_config={"span": "Span", **TIMING_COLUMN_CONFIG})
+with tab_pages:
+    st.dataframe(summary['reruns'], use_container_width=True, hide_index=True, column_config={"page": "Seite", **TIMING_COLUMN_CONFIG})
+with tab_counters:
+    st.dataframe(summary['counters'], use_container_width=True, hide_index=True)
+
+# --- Profile ---
+section("Profile")
+st.markdown("## Profile 🔬")
+profiled = [rerun for rerun in history if rerun['profile'] or rerun['allocations']]
+if not profiled:
+    st.caption(f"Profiling ist aus. Mit `{PROFILE_ENV}=cprofile`, `tracemalloc` oder `cprofile,tracemalloc` wird jeder Rerun profiliert (kostet deutlich Laufzeit).")
+else:
+    labels = [f"{datetime.fromtimestamp(r['started']):%H:%M:%S} – {r['page']} ({r['seconds'] * 1000:.0f} ms)" for r in profiled]
+    choice = st.selectbox("Rerun", options=range(len(profiled)), format_func=labels.__getitem__, key="monitoring_profile")
+    rerun = profiled[choice]
+    if rerun['profile']:
+        st.code(rerun['profile'], language="text")
+    if rerun['allocations']:
+        st.markdown(f"**Speicher-Spitze:** {rerun['memory_peak'] / 1024 ** 2:.1f} MiB (prozessweit)")
+        st.code("\n".join(rerun['allocations']), language="text")
+
+# --- Prometheus ---
+section("Prometheus")
+st.markdown("## Prometheus-Export 📤")
+text = metrics.prometheus_text()
+metrics_file = os.environ.get(METRICS_FILE_ENV)
+col_download, col_file, col_reset = st.columns(3)
+with col_download:
+    st.download_button("metrics.prom herunterladen", data=text, file_name="labassist-metrics.prom", mime="text/plain")
+with col_file:
+    if metrics_file:
+        if st.button(f"Nach {metrics_file} schreiben", key="monitoring_write_file"):
+            metrics.write_prometheus(metrics_file, force=True)
+            st.toast("Metrikdatei geschrieben.", icon="✅")
+    else:
+        st.caption(f"Mit `{METRICS_FILE_ENV}` wird die Datei nach jedem Rerun (höchstens alle paar Sekunden) aktualisiert.")
+with col_reset:
+    if st.button("Messwerte zurücksetzen", key="monitoring_reset"):
+        metrics.reset()
+        st.rerun()
+with st.expander("Textformat anzeigen"):
+    st.code(text, language="text")
+
+st.markdown('</div>', unsafe_allow_html=True)
+
+finish_rerun()
@@ -0,0 +1,206 @@
+# panel.py
+
+import time
+
+# --- Kosten & Zielzeiten ---
+CATEGORY_COST = {'Hämatologie': 4.5, 'Klinische Chemie': 5.0, 'Gerinnung': 9.0, 'Immunologie': 20.0, 'Mikrobiologie': 25.0} # € je Test ohne eigene Kostenangabe
+DEFAULT_COST = 10.0 # Kategorien ohne Eintrag
+PANEL_TAT_TARGET_MINUTES = {'Rot': 60, 'Orange': 60, 'Gelb': 90, 'Grün': 120, 'Blau': 180} # Ziel-Durchlaufzeit je MTS-Kategorie
+SOLVER_TIME_LIMIT = 0.04 # Sekunden für die Suche (Rest bis 50 ms für Vor- und Nachbereitung); danach gilt die beste bisher gefundene Lösung
+
+
+def test_cost(test):
+    """Kosten eines Labortests in €: eigene Angabe ``cost``, sonst Standardkosten der Kategorie."""
+    cost = test.get('cost')
+    if cost is None:
+        return CATEGORY_COST.get(test.get('category'), DEFAULT_COST)
+    return float(cost)
+
+
+def panel_attributes(lab_tests):
+    """Testcode -> Kosten und Testcode -> Messdauer (Minuten) aus dem Laborkatalog, einmal je Katalogstand."""
+    costs = {test['test_code']: test_cost(test) for test in lab_tests}
+    durations = {test['test_code']: int(test['estimated_duration_minutes']) for test in lab_tests}
+    return costs, durations
+
+
+# --- Solver ---
+def solve_panel(costs, durations, required=(), groups=None, max_duration=None, budget=None, time_limit=SOLVER_TIME_LIMIT):
+    """Günstigstes Testpanel, das die Pflichttests und möglichst viele Anforderungen abdeckt.
+
+    ``groups`` ordnet jeder Anforderung (z.B. einem empfohlenen Test) die Tests zu, die sie
+    abdecken, optional mit Gewicht: ``{name: codes}`` oder ``{name: (codes, gewicht)}``.
+    Gewählt werden nur Tests mit Dauer ≤ ``max_duration``; die Summe der Kosten bleibt
+    ≤ ``budget``. Ziel ist lexikographisch: erst abgedecktes Gewicht maximieren, dann Kosten
+    minimieren (ohne Budget also eine gewichtete Mengenüberdeckung zu minimalen Kosten).
+
+    Branch-and-Bound über die offenen Anforderungen (jeweils die mit den wenigsten Kandidaten
+    zuerst), Startlösung greedy, Schranken aus erreichbarem Gewicht und anteiligen Mindestkosten.
+    Tests ohne Bezug zu einer Anforderung und dominierte Tests fallen vorab heraus, daher
+    hängt die Laufzeit kaum von der Kataloggröße ab. Nach ``time_limit`` Sekunden wird die
+    beste bisherige Lösung geliefert (``optimal`` = False).
+    """
+    started = time.perf_counter()
+    required = [code for code in dict.fromkeys(required) if code in costs]
+    over_target = [code for code in required if max_duration is not None and durations.get(code, 0) > max_duration]
+    base = sum(_cents(costs[code]) for code in required)
+    limit = None if budget is None else _cents(budget) - base
+
+    # Offene Anforderungen und ihre zulässigen Kandidaten
+    chosen = set(required)
+    names, weights, options, unreachable = [], [], [], []
+    for name, group in (groups or {}).items():
+        codes, weight = group if isinstance(group, tuple) and len(group) == 2 and not isinstance(group[1], str) else (group, 1.0)
+        codes = [code for code in dict.fromkeys(codes) if code in costs]
+        if chosen.intersection(codes):
+            continue
+        eligible = [code for code in codes if max_duration is None or durations.get(code, 0) <= max_duration]
+        eligible = [code for code in eligible if limit is None or _cents(costs[code]) <= limit]
+        if not eligible or weight <= 0:
+            unreachable.append(name)
+            continue
+        names.append(name)
+        weights.append(weight)
+        options.append(eligible)
+
+    # Kandidaten als Bitmasken der abgedeckten Anforderungen; dominierte Tests verwerfen
+    masks = {}
+    for index, eligible in enumerate(options):
+        for code in eligible:
+            masks[code] = masks.get(code, 0) | (1 << index)
+    # (ein dominierender Test deckt auch das niedrigste Bit ab, daher nur diese Vergleiche)
+    candidates = sorted(masks, key=lambda code: (_cents(costs[code]), -masks[code].bit_count(), code))
+    kept, kept_by_bit = [], {}
+    for code in candidates:
+        mask = masks[code]
+        lowest = mask & -mask
+        if not any(mask & ~masks[other] == 0 for other in kept_by_bit.get(lowest, ())):
+            kept.append(code)
+            bit = 1
+            while bit <= mask:
+                if mask & bit:
+                    kept_by_bit.setdefault(bit, []).append(code)
+                bit <<= 1
+    price = {code: _cents(costs[code]) for code in kept}
+    covers = [[code for code in kept if masks[code] >> index & 1] for index in range(len(names))]
+
+    search = _PanelSearch(kept, masks, price, covers, weights, limit, started + time_limit)
+    search.run()
+    selected = set(search.best)
+    covered = [name for index, name in enumerate(names) if any(masks[code] >> index & 1 for code in selected)]
+    uncovered = [name for name in names if name not in covered] + unreachable
+    tests = required + sorted(selected, key=lambda code: (price[code], code))
+    return {
+        "tests": tests,
+        "cost": sum(_cents(costs[code]) for code in tests) / 100,
+        "duration": max((durations.get(code, 0) for code in tests), default=0),
+        "covered": covered,
+        "uncovered": uncovered,
+        "over_target": over_target,
+        "optimal": not search.timed_out,
+        "nodes": search.nodes,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _cents(cost):
+    """Kosten als ganze Cent, damit Vergleiche im Suchbaum exakt sind."""
+    return round(cost * 100)
+
+
+class _PanelSearch:
+    """Tiefensuche mit Schranken für ``solve_panel`` (Anforderungen als Bits einer Maske)."""
+
+    def __init__(self, candidates, masks, price, covers, weights, limit, deadline):
+        self.masks = masks
+        self.bit = {code: 1 << position for position, code in enumerate(candidates)} # für die Maske ausgeschlossener Tests
+        self.price = price
+        self.covers = covers # Anforderung -> Kandidaten, billigste zuerst
+        self.weights = weights
+        self.uniform = weights[0] if weights and len(set(weights)) == 1 else None
+        self.limit = limit
+        self.deadline = deadline
+        self.nodes = 0
+        self.timed_out = False
+        self.best, self.best_value, self.best_cost = [], 0.0, 0
+        self._greedy(candidates)
+
+    def _greedy(self, candidates):
+        """Startlösung: wiederholt den Test mit dem besten Verhältnis neu abgedecktes Gewicht / Kosten."""
+        covered, cost, picked = 0, 0, []
+        while True:
+            best, best_ratio = None, 0.0
+            for code in candidates:
+                gain = self._weight(self.masks[code] & ~covered)
+                if gain <= 0 or (self.limit is not None and cost + self.price[code] > self.limit):
+                    continue
+                ratio = gain / max(self.price[code], 1)
+                if ratio > best_ratio:
+                    best, best_ratio = code, ratio
+            if best is None:
+                break
+            picked.append(best)
+            covered |= self.masks[best]
+            cost += self.price[best]
+        self._offer(picked, self._weight(covered), cost)
+
+    def _weight(self, mask):
+        if self.uniform is not None:
+            return mask.bit_count() * self.uniform
+        total = 0.0
+        while mask:
+            lowest = mask & -mask
+            total += self.weights[lowest.bit_length() - 1]
+            mask ^= lowest
+        return total
+
+    def _offer(self, picked, value, cost):
+        if value > self.best_value + 1e-9 or (abs(value - self.best_value) <= 1e-9 and cost < self.best_cost):
+            self.best, self.best_value, self.best_cost = list(picked), value, cost
+
+    def run(self):
+        self._branch(0, 0, 0, 0.0, 0, [])
+
+    def _branch(self, covered, skipped, banned, value, cost, picked):
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            self.timed_out = True
+        if self.timed_out:
+            return
+        budget_left = None if self.limit is None else self.limit - cost
+
+        # Offene, noch erreichbare Anforderungen und Schranken
+        open_reqs, bound_value, shares, hardest = [], value, 0.0, 0
+        for index, cover in enumerate(self.covers):
+            bit = 1 << index
+            if (covered | skipped) & bit:
+                continue
+            affordable = [code for code in cover if not banned & self.bit[code] and (budget_left is None or self.price[code] <= budget_left)]
+            if not affordable:
+                continue
+            open_reqs.append((len(affordable), index, affordable))
+            bound_value += self.weights[index]
+            # Jede Anforderung trägt mindestens ihren Anteil am günstigsten abdeckenden Test
+            open_mask = ~(covered | skipped)
+            shares += min(self.price[code] / (self.masks[code] & open_mask).bit_count() for code in affordable)
+            hardest = max(hardest, self.price[affordable[0]])
+        if bound_value < self.best_value - 1e-9:
+            return
+        if not open_reqs:
+            self._offer(picked, value, cost)
+            return
+        if abs(bound_value - self.best_value) <= 1e-9 and cost + max(shares, hardest) >= self.best_cost:
+            return
+
+        # Verzweigen über die Anforderung mit den wenigsten Kandidaten; bessere Verhältnisse zuerst.
+        # Spätere Zweige schließen die früher probierten Tests aus, sonst käme jedes Panel mehrfach vor.
+        _, index, affordable = min(open_reqs)
+        open_mask = ~(covered | skipped)
+        affordable.sort(key=lambda code: self.price[code] / self._weight(self.masks[code] & open_mask))
+        for code in affordable:
+            gained = self.masks[code] & ~covered
+            picked.append(code)
+            self._branch(covered | gained, skipped, banned, value + self._weight(gained & ~skipped), cost + self.price[code], picked)
+            picked.pop()
+            banned |= self.bit[code]
+        self._branch(covered, skipped | (1 << index), banned, value, cost, picked)
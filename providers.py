@@ -0,0 +1,171 @@
+# providers.py
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+REMOTE_EXCLUDED_FIELDS = {'patient_number'} # Für die Empfehlung nicht nötig, verlässt daher nicht das Haus
+RECOMMENDATION_LIST_FIELDS = ('recommended_tests', 'mandatory_tests', 'optional_tests') # Pflichtfelder einer Dienstantwort
+
+
+class RecommendationProvider:
+    """Schnittstelle für Quellen von Laborempfehlungen.
+
+    ``recommend`` liefert ein Empfehlungs-dict (Felder wie in ``recommendations``) oder None.
+    """
+
+    def recommend(self, diagnosis_name, mts_category, case_data=None):
+        raise NotImplementedError
+
+    async def recommend_async(self, diagnosis_name, mts_category, case_data=None):
+        return self.recommend(diagnosis_name, mts_category, case_data)
+
+
+class LocalRuleProvider(RecommendationProvider):
+    """Regelbasierte Empfehlung aus dem lokalen Regelwerk (z.B. ``utils.find_recommendation``)."""
+
+    def __init__(self, lookup):
+        self.lookup = lookup
+
+    def recommend(self, diagnosis_name, mts_category, case_data=None):
+        return self.lookup(diagnosis_name, mts_category)
+
+
+class VitalRuleProvider(RecommendationProvider):
+    """Ergänzt die Empfehlung eines anderen Providers um die Tests zutreffender Vitalregeln.
+
+    ``engine`` liefert die aktuelle ``rules.VitalRuleEngine`` (je Aufruf, damit neue
+    Katalogstände sofort gelten). Ohne ``case_data`` bleibt die Empfehlung unverändert.
+    """
+
+    def __init__(self, inner, engine):
+        self.inner = inner
+        self.engine = engine
+
+    def recommend(self, diagnosis_name, mts_category, case_data=None):
+        recommendation = self.inner.recommend(diagnosis_name, mts_category, case_data)
+        if not case_data:
+            return recommendation
+        return self.engine().apply(recommendation, case_data, diagnosis_name, mts_category)
+
+
+class RemoteRecommendationProvider(RecommendationProvider):
+    """Externer Scoring-Dienst, per HTTP/JSON angebunden.
+
+    Die Anfragen laufen auf einer eigenen asyncio-Schleife in einem Hintergrund-Thread:
+    - gleichzeitige Anfragen mit gleichem Schlüssel teilen sich einen Aufruf (Coalescing),
+    - Ergebnisse werden ``cache_ttl`` Sekunden zwischengespeichert,
+    - nach ``timeout`` Sekunden (oder bei Fehlern) greift ``fallback``, damit ein langsamer
+      Dienst den Streamlit-Thread nicht blockiert.
+
+    Der Dienst erhält ``{"diagnosis_name", "mts_category", "case"}`` per POST (ohne
+    ``REMOTE_EXCLUDED_FIELDS``) und antwortet mit einem Empfehlungs-dict oder ``null``. Bei
+    ``null`` und bei Antworten ohne Listen ``RECOMMENDATION_LIST_FIELDS`` entscheidet ebenfalls ``fallback``.
+    Da die Antwort von den Falldaten abhängen kann, gehört ein Digest von ``case`` zum
+    Schlüssel: Cache und Coalescing greifen nur bei identischen Anfragen. Der Cache hält
+    höchstens ``MAX_CACHE_ENTRIES`` Einträge und verdrängt zuerst abgelaufene, dann die ältesten.
+    """
+
+    MAX_CACHE_ENTRIES = 1024
+
+    def __init__(self, url, timeout=2.0, cache_ttl=300.0, fallback=None):
+        self.url = url
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.fallback = fallback
+        self._cache = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._loop = None
+
+    @staticmethod
+    def _outgoing(case_data):
+        return {field: value for field, value in (case_data or {}).items() if field not in REMOTE_EXCLUDED_FIELDS}
+
+    @staticmethod
+    def _validated(answer):
+        """Dienstantwort -> Empfehlung oder None; ungültige Form löst ValueError aus (wie Netzwerkfehler: Fallback)."""
+        if answer is None:
+            return None
+        if not isinstance(answer, dict) or not all(
+                isinstance(answer.get(field), list) and all(isinstance(code, str) for code in answer[field])
+                for field in RECOMMENDATION_LIST_FIELDS):
+            raise ValueError(f"Ungültige Antwort des Empfehlungsdienstes: {str(answer)[:200]}")
+        return answer
+
+    @classmethod
+    def _key(cls, diagnosis_name, mts_category, case_data=None):
+        digest = None
+        case_data = cls._outgoing(case_data)
+        if case_data:
+            encoded = json.dumps(case_data, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+            digest = hashlib.blake2b(encoded, digest_size=16).hexdigest()
+        return (" ".join((diagnosis_name or "").split()).casefold(), mts_category, digest)
+
+    def _forget(self, key, task):
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Fehler nach Timeout abholen, sonst warnt asyncio
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="recommendation-provider", daemon=True).start()
+            return self._loop
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return True, entry[1]
+        return False, None
+
+    def _fetch(self, diagnosis_name, mts_category, case_data):
+        payload = json.dumps({"diagnosis_name": diagnosis_name, "mts_category": mts_category, "case": self._outgoing(case_data)},
+                             ensure_ascii=False, default=str).encode("utf-8")
+        request = urllib.request.Request(self.url, data=payload, headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return self._validated(json.loads(response.read().decode("utf-8")))
+
+    async def recommend_async(self, diagnosis_name, mts_category, case_data=None):
+        """Muss auf der Schleife des Providers laufen (siehe ``recommend``)."""
+        key = self._key(diagnosis_name, mts_category, case_data)
+        hit, result = self._cached(key)
+        if hit:
+            return result
+        task = self._in_flight.get(key)
+        if task is None:
+            loop = asyncio.get_running_loop()
+            task = loop.run_in_executor(None, self._fetch, diagnosis_name, mts_category, case_data)
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        result = await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        self._store(key, result)
+        return result
+
+    def _store(self, key, result):
+        # Nur auf der Schleife des Providers; andere Threads lesen lediglich per ``get``
+        now = time.monotonic()
+        self._cache.pop(key, None)  # neu einfügen, damit die Einfügereihenfolge dem Alter entspricht
+        if len(self._cache) >= self.MAX_CACHE_ENTRIES:
+            self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+            for oldest in list(self._cache)[:len(self._cache) - self.MAX_CACHE_ENTRIES + 1]:
+                del self._cache[oldest]
+        self._cache[key] = (now + self.cache_ttl, result)
+
+    def recommend(self, diagnosis_name, mts_category, case_data=None):
+        hit, result = self._cached(self._key(diagnosis_name, mts_category, case_data))
+        if not hit:
+            future = asyncio.run_coroutine_threadsafe(self.recommend_async(diagnosis_name, mts_category, case_data), self._event_loop())
+            try:
+                result = future.result(self.timeout)
+            except (FutureTimeoutError, asyncio.TimeoutError, OSError, ValueError):
+                future.cancel()
+                result = None
+        if result is None and self.fallback is not None:
+            return self.fallback.recommend(diagnosis_name, mts_category, case_data)
+        return result
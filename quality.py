@@ -0,0 +1,138 @@
+# quality.py
+
+import itertools
+
+# --- Qualitätsprüfung ---
+def build_test_catalog(lab_tests):
+    """Berechnet die Lookup-Strukturen der Qualitätsprüfung vor.
+
+    - ``durations``: Testcode -> geschätzte Dauer in Minuten
+    - ``bits``: Testcode -> Bit, damit Test-Sets als Integer-Bitmasken verglichen werden können
+    """
+    catalog = {"durations": {}, "bits": {}, "next_bit": itertools.count()}
+    for test in lab_tests:
+        add_to_test_catalog(catalog, test)
+    return catalog
+
+def add_to_test_catalog(catalog, test):
+    catalog['durations'][test['test_code']] = int(test['estimated_duration_minutes'])
+    _test_bit(catalog, test['test_code'])
+
+def _test_bit(catalog, test_code):
+    # Unbekannte Codes (z.B. gelöschte Tests in Altfällen) bekommen ebenfalls ein Bit.
+    # next() und setdefault sind atomar, daher auch bei parallelen Sessions eindeutig.
+    bits = catalog['bits']
+    bit = bits.get(test_code)
+    if bit is None:
+        bit = bits.setdefault(test_code, 1 << next(catalog['next_bit']))
+    return bit
+
+def _test_mask(catalog, test_codes):
+    mask = 0
+    for code in test_codes:
+        mask |= _test_bit(catalog, code)
+    return mask
+
+def _recommendation_masks(catalog, recommendation):
+    """Liefert (Pflicht-Maske, erlaubte Maske) einer Empfehlung; ohne Empfehlung (0, None)."""
+    if recommendation is None:
+        return 0, None
+    allowed = _test_mask(catalog, recommendation.get('recommended_tests', [])) | _test_mask(catalog, recommendation.get('optional_tests', []))
+    return _test_mask(catalog, recommendation.get('mandatory_tests', [])), allowed
+
+def _recommendation_cache_key(recommendation):
+    """Schlüssel für den Maskencache: Diagnose/MTS plus Testlisten (nicht ``id()``, das nach GC wiederverwendet wird)."""
+    if recommendation is None:
+        return None
+    return (recommendation_key(recommendation.get('diagnosis_name'), recommendation.get('mts_category')),
+            *(tuple(recommendation.get(field, ())) for field in ('mandatory_tests', 'recommended_tests', 'optional_tests')))
+
+def _evaluate(catalog, ordered_tests, recommendation, masks):
+    mandatory_mask, allowed_mask = masks
+    if not ordered_tests:
+        # Ohne angeforderte Tests keine Hinweise (wie im ursprünglichen Bearbeiten-Dialog)
+        return {"missing_tests": [], "unnecessary_tests": [], "estimated_total_duration": 0}
+    bits = [_test_bit(catalog, code) for code in ordered_tests]
+    ordered_mask = 0
+    for bit in bits:
+        ordered_mask |= bit
+
+    missing = []
+    if mandatory_mask & ~ordered_mask:
+        missing = [t for t in recommendation.get('mandatory_tests', []) if not catalog['bits'][t] & ordered_mask]
+    unnecessary = []
+    if allowed_mask is not None and ordered_mask & ~allowed_mask:
+        unnecessary = [t for t, bit in zip(ordered_tests, bits) if not bit & allowed_mask]
+
+    durations = catalog['durations']
+    return {
+        "missing_tests": missing,
+        "unnecessary_tests": unnecessary,
+        "estimated_total_duration": max((durations.get(t, 0) for t in ordered_tests), default=0),
+    }
+
+def evaluate_quality(ordered_tests, recommendation, catalog):
+    """Prüft angeforderte Tests gegen eine Empfehlung.
+
+    Liefert ``missing_tests`` (fehlende Pflicht-Tests), ``unnecessary_tests`` (weder empfohlen
+    noch optional) und ``estimated_total_duration`` (längste Testdauer). Ohne Empfehlung
+    gibt es keine Hinweise, nur die Dauer; ohne angeforderte Tests auch keine fehlenden Pflicht-Tests.
+    """
+    return _evaluate(catalog, ordered_tests, recommendation, _recommendation_masks(catalog, recommendation))
+
+def evaluate_quality_batch(items, catalog):
+    """Prüft viele (ordered_tests, recommendation)-Paare; Masken werden pro Empfehlung nur einmal berechnet.
+
+    Der Cache gilt nur für diesen Aufruf und damit für genau einen Katalogstand; Bits im
+    Katalog kommen nur hinzu, berechnete Masken bleiben also gültig.
+    """
+    mask_cache = {}
+    results = []
+    for ordered_tests, recommendation in items:
+        key = _recommendation_cache_key(recommendation)
+        masks = mask_cache.get(key)
+        if masks is None:
+            masks = mask_cache[key] = _recommendation_masks(catalog, recommendation)
+        results.append(_evaluate(catalog, ordered_tests, recommendation, masks))
+    return results
+
+def reevaluate_cases(cases, recommendation, catalog):
+    """Prüft Fälle gegen eine geänderte Empfehlung neu (z.B. nach Anlegen/Löschen einer Regel).
+
+    Alle Fälle teilen sich dieselbe Empfehlung, die Masken werden also nur einmal gebildet.
+    Liefert nur die Fälle, deren Qualitätsfelder oder ``recommended_tests`` sich ändern, als
+    neue dicts; die übergebenen Fälle bleiben unverändert (auch in einem Worker-Thread nutzbar).
+    """
+    cases = list(cases)
+    recommended = list(recommendation.get('recommended_tests', [])) if recommendation else []
+    results = evaluate_quality_batch(((case.get('ordered_tests', []), recommendation) for case in cases), catalog)
+    changed = []
+    for case, result in zip(cases, results):
+        if case.get('recommended_tests') != recommended or any(case.get(field) != value for field, value in result.items()):
+            changed.append({**case, **result, "recommended_tests": recommended})
+    return changed
+
+
+# --- Empfehlungsindex ---
+def normalize_diagnosis(name):
+    """Normalisiert einen Diagnosenamen für den Indexschlüssel (Groß-/Kleinschreibung, Leerzeichen)."""
+    return " ".join((name or "").split()).casefold()
+
+def recommendation_key(diagnosis_name, mts_category):
+    return (normalize_diagnosis(diagnosis_name), mts_category)
+
+def build_recommendation_index(recommendations):
+    """Baut den Index (Diagnose, MTS-Kategorie) -> Empfehlungen auf.
+
+    Pro Schlüssel wird eine Liste gehalten, damit bei doppelten Regeln die zuerst
+    angelegte greift und nach dem Löschen die nächste nachrückt.
+    """
+    index = {}
+    for rec in recommendations:
+        index.setdefault(recommendation_key(rec['diagnosis_name'], rec['mts_category']), []).append(rec)
+    return index
+
+def lookup_recommendation(index, diagnosis_name, mts_category):
+    """Liefert die erste Empfehlung des Index für Diagnose und MTS-Kategorie oder None."""
+    matches = index.get(recommendation_key(diagnosis_name, mts_category))
+    return matches[0] if matches else None
@@ -0,0 +1,202 @@
+# rules.py
+
+import math
+from bisect import bisect_left
+from itertools import compress
+from constants import MTS_CATEGORIES, BLOOD_PRESSURE_PATTERN
+from quality import normalize_diagnosis
+
+# --- Bedingungen ---
+RULE_FIELDS = {
+    'age': ("Alter", "Jahre"),
+    'heart_rate': ("Herzfrequenz", "bpm"),
+    'systolic': ("RR systolisch", "mmHg"),
+    'diastolic': ("RR diastolisch", "mmHg"),
+    'temperature': ("Temperatur", "°C"),
+    'respiratory_rate': ("Atemfrequenz", "/min"),
+    'oxygen_saturation': ("SpO2", "%"),
+    'blood_sugar': ("Blutzucker", "mg/dl"),
+} # Feld -> (Anzeigename, Einheit)
+OPERATORS = ['<', '<=', '>', '>=', '='] # Vergleich "Messwert <op> Schwelle"
+_BIT_BYTES = bytes.maketrans(b'01', b'\x00\x01') # Binärdarstellung -> Bytes 0/1 als Auswahl für compress
+
+
+def case_values(case):
+    """Messwerte eines Falls (bzw. der Wizard-Daten) für die Regelauswertung; fehlende Werte fehlen im Dict."""
+    vitals = case.get('vitals') or {}
+    values = {}
+    if case.get('age') is not None:
+        values['age'] = case['age']
+    for field in ('heart_rate', 'temperature', 'respiratory_rate', 'oxygen_saturation', 'blood_sugar'):
+        if vitals.get(field) is not None:
+            values[field] = vitals[field]
+    match = BLOOD_PRESSURE_PATTERN.match(vitals.get('blood_pressure') or "")
+    if match:
+        values['systolic'], values['diastolic'] = int(match.group(1)), int(match.group(2))
+    return values
+
+
+def describe(rule):
+    """Bedingungen als Text, z.B. ``SpO2 < 92 % und Herzfrequenz > 120 bpm``."""
+    parts = [f"{RULE_FIELDS[c['field']][0]} {c['op']} {c['value']:g} {RULE_FIELDS[c['field']][1]}" for c in rule['conditions']]
+    if rule.get('mts_categories'):
+        parts.append(f"MTS {'/'.join(rule['mts_categories'])}")
+    if rule.get('diagnosis_name'):
+        parts.append(f"Diagnose {rule['diagnosis_name']}")
+    return " und ".join(parts)
+
+
+def _interval(conditions):
+    """Schnittmenge aller Bedingungen eines Feldes als ((untere Schranke, inklusiv), (obere, inklusiv))."""
+    lower, upper = (-math.inf, False), (math.inf, False)
+    for condition in conditions:
+        value, op = float(condition['value']), condition['op']
+        if op in ('>', '>=', '='):
+            bound = (value, op != '>')
+            if bound[0] > lower[0] or (bound[0] == lower[0] and not bound[1]):
+                lower = bound
+        if op in ('<', '<=', '='):
+            bound = (value, op != '<')
+            if bound[0] < upper[0] or (bound[0] == upper[0] and not bound[1]):
+                upper = bound
+    return lower, upper
+
+
+class _FieldTable:
+    """Entscheidungstabelle eines Feldes: Schwellen teilen die Achse in Abschnitte mit je einer Regelmaske.
+
+    Bei k Schwellen gibt es 2k+1 Abschnitte: offene Intervalle (gerade Nummern) und die Schwellen
+    selbst (ungerade), damit ``<`` und ``<=`` ohne Sonderfälle auseinanderfallen.
+    """
+
+    __slots__ = ('thresholds', 'masks', 'missing')
+
+    def __init__(self, intervals, unconstrained):
+        self.thresholds = sorted({bound[0] for lower, upper in intervals.values() for bound in (lower, upper) if math.isfinite(bound[0])})
+        self.missing = unconstrained # Ohne Messwert greifen nur Regeln ohne Bedingung auf diesem Feld
+        regions = 2 * len(self.thresholds) + 1
+        starts, ends = [0] * (regions + 1), [0] * (regions + 1)
+        for bit, (lower, upper) in intervals.items():
+            first = 0 if lower[0] == -math.inf else self._position(lower[0]) + (0 if lower[1] else 1)
+            last = regions - 1 if upper[0] == math.inf else self._position(upper[0]) - (0 if upper[1] else 1)
+            if first <= last:
+                starts[first] |= bit
+                ends[last + 1] |= bit
+        # Einmal über die Abschnitte laufen statt jede Regel je Abschnitt zu prüfen
+        self.masks, active = [], 0
+        for region in range(regions):
+            active = (active | starts[region]) & ~ends[region]
+            self.masks.append(active | unconstrained)
+
+    def _position(self, value):
+        """Abschnittsnummer eines Wertes (ungerade = genau auf einer Schwelle)."""
+        index = bisect_left(self.thresholds, value)
+        if index < len(self.thresholds) and self.thresholds[index] == value:
+            return 2 * index + 1
+        return 2 * index
+
+    def mask(self, value):
+        if value is None:
+            return self.missing
+        return self.masks[self._position(value)]
+
+
+class VitalRuleEngine:
+    """Vitalparameter-Regeln, einmal je Katalogstand in Entscheidungstabellen übersetzt.
+
+    Jede Regel ist ein Bit. Je Feld liegt eine ``_FieldTable``; für MTS-Kategorie und Diagnose
+    je ein Dict Wert -> Maske. Die Auswertung eines Falls ist ein Binärsuchschritt je Feld und
+    ein paar Und-Verknüpfungen großer Ganzzahlen, unabhängig davon, wie viele Regeln es gibt.
+    Mehrere Bedingungen auf demselben Feld werden beim Übersetzen zu einem Intervall geschnitten.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        everything = (1 << len(self.rules)) - 1
+        by_field = {field: {} for field in RULE_FIELDS}
+        mts_scoped, self._mts = 0, {category: 0 for category in MTS_CATEGORIES}
+        diagnosis_scoped, self._diagnoses = 0, {}
+        for position, rule in enumerate(self.rules):
+            bit = 1 << position
+            conditions = {}
+            for condition in rule.get('conditions', ()):
+                if condition['field'] not in RULE_FIELDS or condition['op'] not in OPERATORS:
+                    raise ValueError(f"Ungültige Bedingung in Regel '{rule.get('name')}': {condition}")
+                conditions.setdefault(condition['field'], []).append(condition)
+            for field, field_conditions in conditions.items():
+                by_field[field][bit] = _interval(field_conditions)
+            if rule.get('mts_categories'):
+                mts_scoped |= bit
+                for category in rule['mts_categories']:
+                    self._mts[category] = self._mts.get(category, 0) | bit
+            if rule.get('diagnosis_name'):
+                diagnosis_scoped |= bit
+                key = normalize_diagnosis(rule['diagnosis_name'])
+                self._diagnoses[key] = self._diagnoses.get(key, 0) | bit
+        self._any_mts = everything & ~mts_scoped
+        self._mts = {category: mask | self._any_mts for category, mask in self._mts.items()}
+        self._any_diagnosis = everything & ~diagnosis_scoped
+        self._diagnoses = {key: mask | self._any_diagnosis for key, mask in self._diagnoses.items()}
+        # Nur Felder mit Bedingungen kosten bei der Auswertung Zeit
+        self._tables = []
+        for field, intervals in by_field.items():
+            if intervals:
+                constrained = 0
+                for bit in intervals:
+                    constrained |= bit
+                self._tables.append((field, _FieldTable(intervals, everything & ~constrained)))
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match_mask(self, values, mts_category=None, diagnosis_name=None):
+        """Bitmaske der Regeln, deren Bedingungen alle erfüllt sind (ohne Diagnose keine diagnosegebundenen Regeln)."""
+        mask = self._mts.get(mts_category, self._any_mts)
+        if diagnosis_name is None:
+            mask &= self._any_diagnosis
+        elif mask:
+            mask &= self._diagnoses.get(normalize_diagnosis(diagnosis_name), self._any_diagnosis)
+        for field, table in self._tables:
+            if not mask:
+                break
+            mask &= table.mask(values.get(field))
+        return mask
+
+    def match(self, case, mts_category=None, diagnosis_name=None):
+        """Zutreffende Regeln für einen Fall (bzw. die Wizard-Daten), in Regelreihenfolge."""
+        mask = self.match_mask(case_values(case), mts_category or case.get('mts_category'),
+                               diagnosis_name or case.get('suspected_diagnosis'))
+        # Auswahl über die Binärdarstellung (niedrigstes Bit zuerst): ganz in C, auch bei vielen Treffern
+        return list(compress(self.rules, bin(mask)[:1:-1].encode().translate(_BIT_BYTES)))
+
+    def apply(self, recommendation, case, diagnosis_name=None, mts_category=None):
+        """Empfehlung um die Tests zutreffender Regeln ergänzt (neues Dict); ohne Treffer unverändert.
+
+        Ohne Basis-Empfehlung entsteht eine Empfehlung nur aus den Regeln. Pflicht-Regeln
+        ergänzen auch ``mandatory_tests``; die Begründung nennt jede angewandte Regel.
+        """
+        diagnosis_name = diagnosis_name or case.get('suspected_diagnosis')
+        mts_category = mts_category or case.get('mts_category')
+        matched = self.match(case, mts_category, diagnosis_name)
+        if not matched:
+            return recommendation
+        base = recommendation or {
+            "diagnosis_name": diagnosis_name, "mts_category": mts_category, "recommended_tests": [],
+            "mandatory_tests": [], "optional_tests": [], "rationale": "Keine diagnosespezifische Empfehlung.",
+        }
+        recommended = list(base.get('recommended_tests', []))
+        mandatory = list(base.get('mandatory_tests', []))
+        notes = []
+        for rule in matched:
+            recommended.extend(code for code in rule['tests'] if code not in recommended)
+            if rule.get('mandatory'):
+                mandatory.extend(code for code in rule['tests'] if code not in mandatory)
+            notes.append(f"{rule['name']} ({describe(rule)}) → {', '.join(rule['tests'])}")
+        return {
+            **base,
+            "recommended_tests": recommended,
+            "mandatory_tests": mandatory,
+            "optional_tests": [code for code in base.get('optional_tests', []) if code not in recommended],
+            "rationale": f"{base.get('rationale') or ''} Vitalregeln: {'; '.join(notes)}.".strip(),
+            "vital_rules": [rule['id'] for rule in matched if 'id' in rule],
+        }
@@ -0,0 +1,101 @@
+# search.py
+
+import difflib
+import heapq
+import re
+
+# Gewichte der Trefferarten (höher = weiter oben)
+SCORE_EXACT_CODE = 100
+SCORE_CODE_PREFIX = 60
+SCORE_NAME_PREFIX = 40
+SCORE_CATEGORY_PREFIX = 20
+SCORE_FUZZY = 15
+FUZZY_CUTOFF = 0.75
+
+_TOKEN_SPLIT = re.compile(r"[\s\-/(),.]+")
+
+
+def _tokens(text):
+    return [t for t in _TOKEN_SPLIT.split((text or "").casefold()) if t]
+
+
+class _TrieNode:
+    __slots__ = ('children', 'hits')
+
+    def __init__(self):
+        self.children = {}
+        self.hits = {}  # Test-Position -> bester Score für Tokens unter diesem Knoten
+
+
+class LabTestSearchIndex:
+    """Suchindex über Testcode, Testname und Kategorie des Laborkatalogs.
+
+    Präfixe werden über einen Trie beantwortet (jeder Knoten kennt die Tests darunter),
+    Tippfehler über einen Fuzzy-Abgleich gegen das Token-Vokabular. Mehrere Suchbegriffe
+    müssen alle passen; das Ergebnis ist nach Score sortiert.
+    """
+
+    def __init__(self, lab_tests):
+        self.tests = list(lab_tests)
+        self._root = _TrieNode()
+        self._vocabulary = {}  # Token -> {Test-Position: Score}
+        self._exact_codes = {}
+        for pos, test in enumerate(self.tests):
+            code = (test.get('test_code') or "").casefold()
+            self._exact_codes.setdefault(code, []).append(pos)
+            self._insert(code, pos, SCORE_CODE_PREFIX)
+            for token in _tokens(test.get('test_name')):
+                self._insert(token, pos, SCORE_NAME_PREFIX)
+            for token in _tokens(test.get('category')):
+                self._insert(token, pos, SCORE_CATEGORY_PREFIX)
+        self._vocabulary_list = list(self._vocabulary)
+
+    def _insert(self, token, pos, score):
+        if not token:
+            return
+        postings = self._vocabulary.setdefault(token, {})
+        postings[pos] = max(postings.get(pos, 0), score)
+        node = self._root
+        for char in token:
+            node = node.children.setdefault(char, _TrieNode())
+            node.hits[pos] = max(node.hits.get(pos, 0), score)
+
+    def _prefix_hits(self, term):
+        node = self._root
+        for char in term:
+            node = node.children.get(char)
+            if node is None:
+                return {}
+        return node.hits
+
+    def _term_scores(self, term, limit):
+        scores = dict(self._prefix_hits(term))
+        for pos in self._exact_codes.get(term, ()):
+            scores[pos] = SCORE_EXACT_CODE
+        # Fuzzy-Abgleich nur, wenn die Präfixsuche nicht genug Treffer liefert
+        if len(term) >= 3 and len(scores) < limit:
+            for token in difflib.get_close_matches(term, self._vocabulary_list, n=10, cutoff=FUZZY_CUTOFF):
+                ratio = difflib.SequenceMatcher(None, term, token).ratio()
+                for pos in self._vocabulary[token]:
+                    scores[pos] = max(scores.get(pos, 0), SCORE_FUZZY * ratio)
+        return scores
+
+    def search(self, query, limit=20):
+        """Liefert bis zu ``limit`` Tests, bestes Ergebnis zuerst; leere Suche = Katalogreihenfolge."""
+        terms = _tokens(query)
+        if not terms:
+            return self.tests[:limit]
+        total = None
+        for term in terms:
+            scores = self._term_scores(term, limit)
+            if total is None:
+                total = scores
+            else:
+                total = {pos: total[pos] + score for pos, score in scores.items() if pos in total}
+            if not total:
+                return []
+        ranked = heapq.nsmallest(limit, total, key=lambda pos: (-total[pos], self.tests[pos].get('test_code', '')))
+        return [self.tests[pos] for pos in ranked]
+
+    def search_codes(self, query, limit=20):
+        return [t['test_code'] for t in self.search(query, limit)]
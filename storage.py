@@ -0,0 +1,317 @@
+# storage.py
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Spalten, die neben dem JSON-Dokument eines Falls als indizierte Spalten gehalten werden
+CASE_COLUMNS = ['id', 'case_number', 'created_date', 'suspected_diagnosis', 'mts_category', 'patient_number']
+LAB_TEST_COLUMNS = ['id', 'test_name', 'test_code', 'category', 'estimated_duration_minutes', 'urgency_level', 'unit', 'normal_range', 'cost']
+RECOMMENDATION_LIST_COLUMNS = ['recommended_tests', 'mandatory_tests', 'optional_tests']
+# Ein Encoder für alle Zeilen (json.dumps mit Optionen baut sonst je Aufruf einen neuen)
+_encode_json = json.JSONEncoder(ensure_ascii=False).encode
+
+
+class SessionStorage:
+    """Standard-Backend ohne Persistenz: Die Daten leben nur im Session State.
+
+    Alle Schreibmethoden sind No-ops; ``load_catalog`` und ``iter_cases`` liefern None, damit
+    ``init_state`` auf die generierten Demodaten zurückfällt. Andere Backends überschreiben die Methoden.
+    """
+
+    def load_catalog(self):
+        """Lädt Labortests, Empfehlungen und Diagnosen (ohne Fälle)."""
+        return None
+
+    def iter_cases(self, batch_size=1000):
+        """Liefert alle Fälle nacheinander, ohne sie gemeinsam zu laden; None = keine Persistenz."""
+        return None
+
+    def seed(self, data):
+        pass
+
+    @contextmanager
+    def transaction(self):
+        """Bündelt Schreibzugriffe (ohne Persistenz nichts zu tun)."""
+        yield None
+
+    def next_case_counter(self, prefix):
+        """Vergibt die nächste Fallnummer backend-weit; None = Zähler aus dem Session State verwenden."""
+        return None
+
+    def reserve_case_counters(self, prefix, count):
+        """Reserviert ``count`` fortlaufende Fallnummern und liefert die erste; None wie bei ``next_case_counter``."""
+        return None
+
+    def insert_cases(self, cases):
+        pass
+
+    def update_case(self, case):
+        pass
+
+    def update_cases(self, cases):
+        pass
+
+    def delete_case(self, case_id):
+        pass
+
+    def insert_lab_test(self, test):
+        pass
+
+    def delete_lab_test(self, test_id):
+        pass
+
+    def insert_recommendation(self, rec):
+        pass
+
+    def delete_recommendation(self, rec_id):
+        pass
+
+    def insert_vital_rule(self, rule):
+        pass
+
+    def delete_vital_rule(self, rule_id):
+        pass
+
+
+class SQLiteStorage(SessionStorage):
+    """Gemeinsamer, persistenter Speicher für mehrere Arbeitsplätze (SQLite im WAL-Modus).
+
+    Jeder Thread (Streamlit-Session) erhält eine eigene Verbindung; WAL erlaubt parallele
+    Leser neben einem Schreiber. Alle SQL-Texte sind Konstanten, damit sqlite3 die
+    vorbereiteten Statements aus seinem Cache wiederverwendet.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS lab_tests (
+        id TEXT PRIMARY KEY,
+        test_name TEXT NOT NULL,
+        test_code TEXT NOT NULL UNIQUE,
+        category TEXT,
+        estimated_duration_minutes INTEGER NOT NULL,
+        urgency_level TEXT,
+        unit TEXT,
+        normal_range TEXT,
+        cost REAL
+    );
+    CREATE TABLE IF NOT EXISTS recommendations (
+        id TEXT PRIMARY KEY,
+        diagnosis_name TEXT NOT NULL,
+        mts_category TEXT NOT NULL,
+        recommended_tests TEXT NOT NULL,
+        mandatory_tests TEXT NOT NULL,
+        optional_tests TEXT NOT NULL,
+        rationale TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_recommendations_key ON recommendations (diagnosis_name COLLATE NOCASE, mts_category);
+    CREATE TABLE IF NOT EXISTS diagnoses (
+        id TEXT PRIMARY KEY,
+        diagnosis_name TEXT NOT NULL,
+        category TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_diagnoses_name ON diagnoses (diagnosis_name COLLATE NOCASE);
+    CREATE TABLE IF NOT EXISTS patient_cases (
+        id TEXT PRIMARY KEY,
+        case_number TEXT NOT NULL UNIQUE,
+        created_date TEXT NOT NULL,
+        suspected_diagnosis TEXT,
+        mts_category TEXT,
+        patient_number TEXT,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_cases_created ON patient_cases (created_date);
+    CREATE TABLE IF NOT EXISTS vital_rules (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS case_counters (
+        prefix TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    """
+
+    INSERT_CASE = "INSERT INTO patient_cases (id, case_number, created_date, suspected_diagnosis, mts_category, patient_number, data) VALUES (?, ?, ?, ?, ?, ?, ?)"
+    UPDATE_CASE = "UPDATE patient_cases SET case_number = ?, created_date = ?, suspected_diagnosis = ?, mts_category = ?, patient_number = ?, data = ? WHERE id = ?"
+    INSERT_LAB_TEST = f"INSERT INTO lab_tests ({', '.join(LAB_TEST_COLUMNS)}) VALUES ({', '.join('?' * len(LAB_TEST_COLUMNS))})"
+    INSERT_RECOMMENDATION = "INSERT INTO recommendations (id, diagnosis_name, mts_category, recommended_tests, mandatory_tests, optional_tests, rationale) VALUES (?, ?, ?, ?, ?, ?, ?)"
+    INSERT_DIAGNOSIS = "INSERT INTO diagnoses (id, diagnosis_name, category) VALUES (?, ?, ?)"
+    INSERT_VITAL_RULE = "INSERT INTO vital_rules (id, name, data) VALUES (?, ?, ?)"
+    NEXT_COUNTER = "UPDATE case_counters SET value = value + ? WHERE prefix = ? RETURNING value"
+    # Nachträglich ergänzte Spalten (Tabelle, Spalte, Typ): ältere Datenbanken werden beim Öffnen erweitert
+    ADDED_COLUMNS = [('lab_tests', 'cost', 'REAL')]
+    # Nicht mehr genutzte Indizes, die ältere Datenbanken noch haben (kosten nur Schreibzeit)
+    DROPPED_INDEXES = ['idx_cases_key']
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        conn = self._connection()
+        for table, column, kind in self.ADDED_COLUMNS:
+            if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+        for index in self.DROPPED_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+    # --- Verbindung & Transaktionen ---
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Bündelt mehrere Schreibzugriffe in einem Commit (BEGIN IMMEDIATE verhindert Lock-Upgrades).
+
+        Verschachtelte Aufrufe im selben Thread laufen in der äußeren Transaktion mit, z.B.
+        ``reserve_case_counters`` und ``insert_cases`` innerhalb eines Import-Blocks.
+        """
+        conn = self._connection()
+        if getattr(self._local, 'in_transaction', False):
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.in_transaction = True
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.in_transaction = False
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --- Lesen ---
+    def load_catalog(self):
+        conn = self._connection()
+        if conn.execute("SELECT 1 FROM lab_tests LIMIT 1").fetchone() is None:
+            return None
+        return {
+            "lab_tests": [dict(zip(LAB_TEST_COLUMNS, row)) for row in conn.execute(f"SELECT {', '.join(LAB_TEST_COLUMNS)} FROM lab_tests ORDER BY rowid")],
+            "recommendations": [self._recommendation_from_row(row) for row in conn.execute(
+                "SELECT id, diagnosis_name, mts_category, recommended_tests, mandatory_tests, optional_tests, rationale FROM recommendations ORDER BY rowid")],
+            "diagnoses": [dict(zip(['id', 'diagnosis_name', 'category'], row)) for row in conn.execute("SELECT id, diagnosis_name, category FROM diagnoses ORDER BY rowid")],
+            "vital_rules": [json.loads(row[0]) for row in conn.execute("SELECT data FROM vital_rules ORDER BY rowid")],
+        }
+
+    def iter_cases(self, batch_size=1000):
+        # Eigene Verbindung: der Generator kann in einem anderen Thread weiterlaufen als er erzeugt wurde
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        try:
+            cursor = conn.execute("SELECT data FROM patient_cases ORDER BY rowid")
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield json.loads(row[0])
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _recommendation_from_row(row):
+        rec = dict(zip(['id', 'diagnosis_name', 'mts_category'], row[:3]))
+        for column, value in zip(RECOMMENDATION_LIST_COLUMNS, row[3:6]):
+            rec[column] = json.loads(value)
+        rec['rationale'] = row[6]
+        return rec
+
+    # --- Schreiben ---
+    def seed(self, data):
+        """Schreibt Initialdaten in einer Transaktion, falls der Speicher noch leer ist."""
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM lab_tests LIMIT 1").fetchone() is not None:
+                return
+            conn.executemany(self.INSERT_LAB_TEST, [self._lab_test_params(t) for t in data['lab_tests']])
+            conn.executemany(self.INSERT_RECOMMENDATION, [self._recommendation_params(r) for r in data['recommendations']])
+            conn.executemany(self.INSERT_DIAGNOSIS, [(d['id'], d['diagnosis_name'], d.get('category')) for d in data['diagnoses']])
+            conn.executemany(self.INSERT_VITAL_RULE, [self._vital_rule_params(r) for r in data.get('vital_rules', [])])
+            conn.executemany(self.INSERT_CASE, [self._case_params(c) for c in data['patient_cases']])
+
+    def next_case_counter(self, prefix):
+        return self.reserve_case_counters(prefix, 1)
+
+    def reserve_case_counters(self, prefix, count):
+        with self.transaction() as conn:
+            if conn.execute("SELECT 1 FROM case_counters WHERE prefix = ?", (prefix,)).fetchone() is None:
+                # Zähler beim ersten Aufruf aus den vorhandenen Fallnummern ableiten
+                start = conn.execute(
+                    "SELECT COALESCE(MAX(CAST(substr(case_number, ?) AS INTEGER)), 0) FROM patient_cases WHERE case_number LIKE ?",
+                    (len(prefix) + 2, f"{prefix}-%")).fetchone()[0]
+                conn.execute("INSERT INTO case_counters (prefix, value) VALUES (?, ?)", (prefix, start))
+            return conn.execute(self.NEXT_COUNTER, (count, prefix)).fetchone()[0] - count + 1
+
+    def insert_cases(self, cases):
+        with self.transaction() as conn:
+            conn.executemany(self.INSERT_CASE, [self._case_params(c) for c in cases])
+
+    def update_case(self, case):
+        self.update_cases([case])
+
+    def update_cases(self, cases):
+        with self.transaction() as conn:
+            conn.executemany(self.UPDATE_CASE, [self._case_params(c)[1:] + (c['id'],) for c in cases])
+
+    def delete_case(self, case_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM patient_cases WHERE id = ?", (case_id,))
+
+    def insert_lab_test(self, test):
+        with self.transaction() as conn:
+            conn.execute(self.INSERT_LAB_TEST, self._lab_test_params(test))
+
+    def delete_lab_test(self, test_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM lab_tests WHERE id = ?", (test_id,))
+
+    def insert_recommendation(self, rec):
+        with self.transaction() as conn:
+            conn.execute(self.INSERT_RECOMMENDATION, self._recommendation_params(rec))
+
+    def delete_recommendation(self, rec_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM recommendations WHERE id = ?", (rec_id,))
+
+    def insert_vital_rule(self, rule):
+        with self.transaction() as conn:
+            conn.execute(self.INSERT_VITAL_RULE, self._vital_rule_params(rule))
+
+    def delete_vital_rule(self, rule_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM vital_rules WHERE id = ?", (rule_id,))
+
+    # --- Parameter-Mapping ---
+    @staticmethod
+    def _case_params(case):
+        return tuple(case.get(column) for column in CASE_COLUMNS) + (_encode_json(dict(case)),)
+
+    @staticmethod
+    def _lab_test_params(test):
+        return tuple(test.get(column) for column in LAB_TEST_COLUMNS)
+
+    @staticmethod
+    def _recommendation_params(rec):
+        return (rec['id'], rec['diagnosis_name'], rec['mts_category'],
+                *(_encode_json(rec.get(column, [])) for column in RECOMMENDATION_LIST_COLUMNS),
+                rec.get('rationale'))
+
+    @staticmethod
+    def _vital_rule_params(rule):
+        return (rule['id'], rule['name'], _encode_json(rule))
@@ -0,0 +1,329 @@
+# synthetic.py
+
+import argparse
+import gc
+import itertools
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+from constants import MTS_CATEGORIES, LABTEST_CATEGORIES, URGENCY_LEVELS, GENDER_OPTIONS, FALLNUMMER_PRÄFIX
+from importer import VITAL_RANGES, AGE_RANGE
+from quality import build_test_catalog, evaluate_quality_batch
+from storage import SQLiteStorage
+
+# --- Basisdaten (fachlich gepflegt, immer enthalten) ---
+BASE_LAB_TESTS = [
+    {"test_name": "Troponin T", "test_code": "TROP", "category": "Klinische Chemie", "estimated_duration_minutes": 30, "urgency_level": "Notfall", "unit": "ng/ml", "normal_range": "0-14", "cost": 18.5},
+    {"test_name": "C-reaktives Protein", "test_code": "CRP", "category": "Klinische Chemie", "estimated_duration_minutes": 45, "urgency_level": "Dringend", "unit": "mg/L", "normal_range": "<5", "cost": 5.0},
+    {"test_name": "Kreatinkinase", "test_code": "CK", "category": "Klinische Chemie", "estimated_duration_minutes": 20, "urgency_level": "Dringend", "unit": "U/L", "normal_range": "30-200", "cost": 3.0},
+    {"test_name": "Großes Blutbild", "test_code": "BB", "category": "Hämatologie", "estimated_duration_minutes": 60, "urgency_level": "Standard", "unit": "N/A", "normal_range": "N/A", "cost": 4.5},
+    {"test_name": "D-Dimere", "test_code": "DD", "category": "Gerinnung", "estimated_duration_minutes": 35, "urgency_level": "Notfall", "unit": "ng/ml", "normal_range": "<500", "cost": 14.0},
+    {"test_name": "Blutgasanalyse", "test_code": "BGA", "category": "Klinische Chemie", "estimated_duration_minutes": 15, "urgency_level": "Notfall", "unit": "N/A", "normal_range": "N/A", "cost": 11.0},
+    {"test_name": "Laktat", "test_code": "LAKT", "category": "Klinische Chemie", "estimated_duration_minutes": 15, "urgency_level": "Notfall", "unit": "mmol/L", "normal_range": "<2.0", "cost": 6.0},
+    {"test_name": "Nierenwerte", "test_code": "NIERE", "category": "Klinische Chemie", "estimated_duration_minutes": 30, "urgency_level": "Dringend", "unit": "N/A", "normal_range": "N/A", "cost": 4.0},
+]
+
+BASE_RECOMMENDATIONS = [
+    {"diagnosis_name": "Akutes Koronarsyndrom", "mts_category": "Rot", "recommended_tests": ["TROP", "CK", "BGA"], "mandatory_tests": ["TROP", "CK"], "optional_tests": ["CRP"], "rationale": "Typisches Set für ACS im Notfall. Schnelle Herzmarker-Bestimmung."},
+    {"diagnosis_name": "Pneumonie", "mts_category": "Gelb", "recommended_tests": ["BB", "CRP", "BGA"], "mandatory_tests": ["BB", "CRP"], "optional_tests": ["LAKT"], "rationale": "Entzündungsparameter und respiratorischer Status bei Verdacht auf Lungenentzündung."},
+    {"diagnosis_name": "Lungenembolie", "mts_category": "Orange", "recommended_tests": ["DD", "BGA"], "mandatory_tests": ["DD"], "optional_tests": ["BB"], "rationale": "D-Dimere zum Ausschluss, Atemanalyse aufgrund der Dringlichkeit."},
+    {"diagnosis_name": "Sepsis", "mts_category": "Rot", "recommended_tests": ["BB", "CRP", "LAKT", "NIERE"], "mandatory_tests": ["BB", "CRP", "LAKT"], "optional_tests": [], "rationale": "Umfassende Abklärung bei Verdacht auf schwere systemische Infektion."},
+]
+
+BASE_DIAGNOSES = [
+    {"diagnosis_name": "Akutes Koronarsyndrom", "category": "Kardiovaskulär"},
+    {"diagnosis_name": "Lungenembolie", "category": "Respiratorisch"},
+    {"diagnosis_name": "Pneumonie", "category": "Respiratorisch"},
+    {"diagnosis_name": "Sepsis", "category": "Infektiös"},
+    {"diagnosis_name": "Akutes Nierenversagen", "category": "Nephrologie"},
+]
+
+BASE_VITAL_RULES = [
+    {"name": "Hypoxämie", "conditions": [{"field": "oxygen_saturation", "op": "<", "value": 92}], "tests": ["BGA"], "mandatory": True, "rationale": "Sauerstoffsättigung unter 92 % erfordert eine Blutgasanalyse."},
+    {"name": "Fieber", "conditions": [{"field": "temperature", "op": ">=", "value": 38.5}], "tests": ["CRP", "BB"], "mandatory": False, "rationale": "Entzündungsparameter bei hohem Fieber."},
+    {"name": "Schockverdacht", "conditions": [{"field": "heart_rate", "op": ">", "value": 120}, {"field": "systolic", "op": "<", "value": 90}], "tests": ["LAKT", "BGA"], "mandatory": True, "rationale": "Tachykardie mit Hypotonie: Laktat und Säure-Basen-Status."},
+    {"name": "Tachypnoe", "conditions": [{"field": "respiratory_rate", "op": ">", "value": 24}], "tests": ["BGA"], "mandatory": False, "rationale": "Erhöhte Atemfrequenz: respiratorischen Status prüfen."},
+    {"name": "Ältere Patienten", "conditions": [{"field": "age", "op": ">=", "value": 70}], "tests": ["NIERE"], "mandatory": False, "rationale": "Nierenfunktion vor Kontrastmittel und Medikation."},
+]
+
+DIAGNOSIS_CATEGORIES = sorted({d['category'] for d in BASE_DIAGNOSES})
+SYMPTOMS = {
+    "Kardiovaskulär": "Brustschmerz, Kurzatmigkeit",
+    "Respiratorisch": "Husten, Fieber, Atemnot",
+    "Infektiös": "Fieber, Schüttelfrost, Verwirrtheit",
+    "Nephrologie": "Verminderte Urinmenge, Ödeme",
+}
+DEFAULT_SYMPTOMS = "Unspezifische Beschwerden"
+DEFAULT_CHUNK_SIZE = 50_000
+CASE_DAYS = 7 # Fälle verteilen sich über die letzten n Tage
+OMIT_PROBABILITY = 0.2 # Anteil Fälle, bei denen ein empfohlener Test fehlt
+EXTRA_PROBABILITY = 0.2 # Anteil Fälle mit einem zusätzlichen, nicht empfohlenen Test
+POPULARITY_SKEW = 1.1 # Zipf-Exponent: wenige Diagnosen machen die meisten Fälle aus
+GENDER_WEIGHTS = [0.49, 0.49, 0.02]
+# Vitalparameter je MTS-Kategorie (Rot ... Blau): Mittelwerte und Streuung; Grenzen aus VITAL_RANGES
+VITAL_PROFILES = {
+    "heart_rate": ([118, 106, 96, 86, 78], 14),
+    "respiratory_rate": ([26, 22, 19, 16, 14], 3),
+    "oxygen_saturation": ([89, 92, 95, 97, 98], 2.5),
+    "temperature": ([38.4, 38.0, 37.6, 37.1, 36.9], 0.6),
+    "blood_sugar": ([150, 135, 120, 105, 100], 30),
+}
+SYSTOLIC_PROFILE = ([100, 140, 135, 130, 126], 20)
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def generate_catalog(n_tests=len(BASE_LAB_TESTS), n_diagnoses=len(BASE_DIAGNOSES), seed=None):
+    """Katalog aus Basisdaten plus synthetischen Tests, Diagnosen und je einer Empfehlung pro Diagnose.
+
+    Liefert ``lab_tests``, ``recommendations``, ``diagnoses`` und ``vital_rules`` wie
+    ``_generate_initial_data``; mit ``seed`` reproduzierbar (inklusive Ids).
+    """
+    rng = random.Random(seed)
+    lab_tests = [{"id": _uuid(rng), **test} for test in BASE_LAB_TESTS]
+    for i in range(len(lab_tests), n_tests):
+        test = {
+            "id": _uuid(rng),
+            "test_name": f"Synthetischer Test {i + 1}",
+            "test_code": f"T{i + 1:04}",
+            "category": rng.choice(LABTEST_CATEGORIES),
+            "estimated_duration_minutes": rng.randrange(10, 125, 5),
+            "urgency_level": rng.choice(URGENCY_LEVELS),
+            "unit": "N/A",
+            "normal_range": "N/A",
+        }
+        # Kosten aus Dauer und Testnummer abgeleitet, damit der Zufallsstrom (und damit bestehende Seeds) unverändert bleibt
+        test["cost"] = round(2.0 + test["estimated_duration_minutes"] * 0.2 + i % 7, 2)
+        lab_tests.append(test)
+    codes = [test['test_code'] for test in lab_tests]
+
+    diagnoses = [{"id": _uuid(rng), **diagnosis} for diagnosis in BASE_DIAGNOSES]
+    recommendations = [{"id": _uuid(rng), **rec} for rec in BASE_RECOMMENDATIONS]
+    for i in range(len(diagnoses), n_diagnoses):
+        name = f"Synthetische Diagnose {i + 1}"
+        diagnoses.append({"id": _uuid(rng), "diagnosis_name": name, "category": rng.choice(DIAGNOSIS_CATEGORIES)})
+        panel = rng.sample(codes, k=min(len(codes), rng.randint(2, 6)))
+        mandatory = panel[:max(1, len(panel) // 2)]
+        recommendations.append({
+            "id": _uuid(rng),
+            "diagnosis_name": name,
+            "mts_category": rng.choice(MTS_CATEGORIES),
+            "recommended_tests": panel,
+            "mandatory_tests": mandatory,
+            "optional_tests": rng.sample(codes, k=min(len(codes), 2)),
+            "rationale": "Synthetische Empfehlung für Last- und Performancetests.",
+        })
+    # Ids der Vitalregeln zuletzt ziehen, damit die übrigen Ids bei gleichem Seed gleich bleiben
+    vital_rules = [{"id": _uuid(rng), **rule} for rule in BASE_VITAL_RULES]
+    return {"lab_tests": lab_tests, "recommendations": recommendations, "diagnoses": diagnoses, "vital_rules": vital_rules}
+
+def _case_plan(catalog):
+    # Einmal je Katalog: Panels, Häufigkeiten (Diagnosen und Zusatztests), Schweregrad, Symptome
+    recommendations = catalog['recommendations']
+    categories = {d['diagnosis_name']: d.get('category') for d in catalog.get('diagnoses', ())}
+    weights = 1.0 / np.arange(1, len(recommendations) + 1) ** POPULARITY_SKEW
+    test_weights = 1.0 / np.arange(1, len(catalog['lab_tests']) + 1) ** POPULARITY_SKEW
+    return {
+        "recommendations": recommendations,
+        "panels": [list(rec['recommended_tests']) for rec in recommendations],
+        "weights": weights / weights.sum(),
+        "severity": np.array([MTS_CATEGORIES.index(rec['mts_category']) if rec['mts_category'] in MTS_CATEGORIES else 2
+                              for rec in recommendations]),
+        "symptoms": [SYMPTOMS.get(categories.get(rec['diagnosis_name']), DEFAULT_SYMPTOMS) for rec in recommendations],
+        "codes": [test['test_code'] for test in catalog['lab_tests']],
+        "test_weights": test_weights / test_weights.sum(),
+        "test_catalog": build_test_catalog(catalog['lab_tests']),
+        "quality": {},
+    }
+
+@contextmanager
+def _gc_paused():
+    # Die erzeugten dicts/Listen sind zyklenfrei; die Generationen-GC würde sie nur wiederholt durchlaufen
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def _vital(rng, field, severity):
+    means, spread = VITAL_PROFILES[field]
+    low, high, kind = VITAL_RANGES[field]
+    values = np.clip(rng.normal(np.take(means, severity), spread), low, high)
+    return np.round(values, 1).tolist() if kind is float else np.rint(values).astype(np.int64).tolist()
+
+def _chunk(rng, plan, size, now, first_counter):
+    """Ein Block Fälle: alle Zufallsziehungen als Arrays, danach nur noch das Zusammensetzen der dicts."""
+    recommendations, panels, codes = plan['recommendations'], plan['panels'], plan['codes']
+    rec_index = rng.choice(len(recommendations), size=size, p=plan['weights'])
+    panel_length = np.fromiter((len(panels[i]) for i in rec_index), dtype=np.int64, count=size)
+    rotation = rng.integers(0, 1 << 30, size=size) % np.maximum(panel_length, 1)
+    omit = (rng.random(size) < OMIT_PROBABILITY) & (panel_length > 1)
+    extra = np.where(rng.random(size) < EXTRA_PROBABILITY, rng.choice(len(codes), size=size, p=plan['test_weights']), -1)
+    severity = plan['severity'][rec_index]
+
+    created = np.datetime64(now, 's') - rng.integers(0, (CASE_DAYS + 1) * 86400, size=size).astype('timedelta64[s]')
+    age = np.clip(np.rint(rng.normal(64 - 3 * severity, 18)), max(AGE_RANGE[0], 18), min(AGE_RANGE[1], 99)).astype(np.int64)
+    gender = rng.choice(len(GENDER_OPTIONS), size=size, p=GENDER_WEIGHTS)
+    systolic = np.clip(np.rint(rng.normal(np.take(SYSTOLIC_PROFILE[0], severity), SYSTOLIC_PROFILE[1])), 70, 230).astype(np.int64)
+    diastolic = np.clip(np.rint(systolic * 0.62 + rng.normal(0, 8, size=size)), 40, 140).astype(np.int64)
+    vitals = {field: _vital(rng, field, severity) for field in VITAL_PROFILES}
+    patient_number = rng.integers(100_000, 1_000_000, size=size)
+    # UUID4 aus Zufallsbytes: Versions- und Variantenbits gesetzt, danach nur noch Hex-Slices je Zeile
+    id_bytes = np.frombuffer(rng.bytes(16 * size), dtype=np.uint8).reshape(size, 16).copy()
+    id_bytes[:, 6] = id_bytes[:, 6] & 0x0F | 0x40
+    id_bytes[:, 8] = id_bytes[:, 8] & 0x3F | 0x80
+    id_hex = id_bytes.tobytes().hex()
+
+    # Angeforderte Tests je Fall; das Qualitätsergebnis hängt nur von Empfehlung, weggelassenem
+    # und zusätzlichem Test ab und wird je Kombination einmal (gesammelt pro Block) berechnet
+    quality_cache = plan['quality']
+    ordered_lists, keys, pending = [], [], {}
+    for r, k, omitted, e in zip(rec_index.tolist(), rotation.tolist(), omit.tolist(), extra.tolist()):
+        panel = panels[r]
+        ordered = panel[k:] + panel[:k]
+        if omitted:
+            ordered.pop()
+        if e >= 0 and codes[e] not in ordered:
+            ordered.append(codes[e])
+        else:
+            e = -1
+        key = (r, (k - 1) % len(panel) if omitted else -1, e)
+        if key not in quality_cache and key not in pending:
+            pending[key] = (ordered, recommendations[r])
+        ordered_lists.append(ordered)
+        keys.append(key)
+    quality_cache.update(zip(pending, evaluate_quality_batch(pending.values(), plan['test_catalog'])))
+
+    columns = zip(rec_index.tolist(), ordered_lists, keys, np.datetime_as_string(created).tolist(),
+                  age.tolist(), gender.tolist(), systolic.tolist(), diastolic.tolist(), patient_number.tolist(),
+                  *(vitals[field] for field in VITAL_PROFILES))
+    cases = []
+    for i, (r, ordered, key, created_date, a, g, sys_bp, dia_bp, pn, hr, rr, spo2, temp, sugar) in enumerate(columns):
+        panel = panels[r]
+        quality = quality_cache[key]
+        cases.append({
+            "id": f"{id_hex[32 * i:32 * i + 8]}-{id_hex[32 * i + 8:32 * i + 12]}-{id_hex[32 * i + 12:32 * i + 16]}-{id_hex[32 * i + 16:32 * i + 20]}-{id_hex[32 * i + 20:32 * i + 32]}",
+            "case_number": f"{FALLNUMMER_PRÄFIX}-{first_counter + i:02}",
+            "mts_category": recommendations[r]['mts_category'],
+            "suspected_diagnosis": recommendations[r]['diagnosis_name'],
+            "ordered_tests": ordered,
+            "recommended_tests": list(panel),
+            "missing_tests": list(quality['missing_tests']),
+            "unnecessary_tests": list(quality['unnecessary_tests']),
+            "estimated_total_duration": quality['estimated_total_duration'],
+            "created_date": created_date,
+            "patient_number": f"PN{pn}",
+            "age": a,
+            "gender": GENDER_OPTIONS[g],
+            "symptoms": plan['symptoms'][r],
+            "vitals": {
+                "blood_pressure": f"{sys_bp}/{dia_bp}",
+                "temperature": temp,
+                "heart_rate": hr,
+                "respiratory_rate": rr,
+                "oxygen_saturation": spo2,
+                "blood_sugar": sugar,
+            },
+        })
+    return cases
+
+def iter_case_chunks(n_cases, catalog, seed=None, now=None, start_counter=1, chunk_size=DEFAULT_CHUNK_SIZE, reserve_counters=None):
+    """Erzeugt ``n_cases`` qualitätsbewertete Fälle zum Katalog, blockweise (je höchstens ``chunk_size``).
+
+    Diagnosen folgen einer Zipf-Verteilung, Vitalparameter und Alter hängen von der MTS-Kategorie
+    ab. Angefordert wird meist das empfohlene Set; mit ``OMIT_PROBABILITY`` fehlt ein Test, mit
+    ``EXTRA_PROBABILITY`` kommt ein (meist gängiger) Test hinzu. Mit ``seed`` (und gleicher ``chunk_size``)
+    reproduzierbar. ``reserve_counters(count)`` kann je Block einen Fallnummernbereich liefern
+    (z.B. ``storage.reserve_case_counters``); None = fortlaufend ab ``start_counter``.
+    """
+    if not catalog['recommendations']:
+        raise ValueError("Der Katalog enthält keine Empfehlungen, zu denen Fälle erzeugt werden können.")
+    rng = np.random.default_rng(seed)
+    now = now or datetime.now()
+    plan = _case_plan(catalog)
+    next_counter = start_counter
+    for offset in range(0, n_cases, chunk_size):
+        size = min(chunk_size, n_cases - offset)
+        first = reserve_counters(size) if reserve_counters is not None else None
+        if first is None:
+            first = next_counter
+        next_counter = first + size
+        with _gc_paused():
+            chunk = _chunk(rng, plan, size, now, first)
+        yield chunk
+
+def generate_cases(n_cases, catalog, seed=None, now=None, start_counter=1):
+    """Wie ``iter_case_chunks``, aber als eine Liste."""
+    return list(itertools.chain.from_iterable(iter_case_chunks(n_cases, catalog, seed, now, start_counter)))
+
+def generate_dataset(n_cases=5, n_tests=len(BASE_LAB_TESTS), n_diagnoses=len(BASE_DIAGNOSES), seed=None, now=None):
+    """Vollständiger Datenbestand (Katalog + Fälle) im Format von ``Storage.seed``."""
+    catalog = generate_catalog(n_tests, n_diagnoses, seed)
+    case_seed = None if seed is None else seed + 1
+    return {**catalog, "patient_cases": generate_cases(n_cases, catalog, case_seed, now)}
+
+def scaled_dataset(size, seed=0, now=None):
+    """Datenbestand mit ``size`` Fällen; Testkatalog und Regelwerk wachsen mit (gedeckelt auf realistische Größen)."""
+    n_tests = min(max(len(BASE_LAB_TESTS), size // 100), 1000)
+    n_diagnoses = min(max(len(BASE_DIAGNOSES), size // 20), 50_000)
+    return generate_dataset(size, n_tests, n_diagnoses, seed, now)
+
+def stream_to_storage(storage, n_cases, catalog=None, seed=None, chunk_size=DEFAULT_CHUNK_SIZE, on_chunk=None):
+    """Schreibt ``n_cases`` synthetische Fälle blockweise in ``storage``; es liegt immer nur ein Block im Speicher.
+
+    Ein vorhandener Katalog im Storage hat Vorrang (die Fälle müssen zu ihm passen); sonst wird
+    ``catalog`` (Standard: Basiskatalog) geschrieben. Fallnummern kommen aus dem Zähler des
+    Backends. ``on_chunk(written, seconds)`` wird nach jedem Block aufgerufen. Liefert
+    (Anzahl, Sekunden).
+    """
+    started = time.perf_counter()
+    existing = storage.load_catalog()
+    if existing is None:
+        catalog = catalog or generate_catalog(seed=seed)
+        storage.seed({**catalog, "patient_cases": []})
+    else:
+        catalog = existing
+    written = 0
+    reserve = lambda count: storage.reserve_case_counters(FALLNUMMER_PRÄFIX, count)
+    for chunk in iter_case_chunks(n_cases, catalog, seed, chunk_size=chunk_size, reserve_counters=reserve):
+        storage.insert_cases(chunk)
+        written += len(chunk)
+        if on_chunk is not None:
+            on_chunk(written, time.perf_counter() - started)
+    return written, time.perf_counter() - started
+
+
+# --- Kommandozeile ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Erzeugt synthetische Kataloge und Fälle und schreibt sie blockweise in die SQLite-Datenbank.")
+    parser.add_argument("--db", required=True, help="Pfad zur SQLite-Datenbank (wie LABASSIST_DB_PATH)")
+    parser.add_argument("--cases", type=int, default=100_000, help="Anzahl Fälle")
+    parser.add_argument("--tests", type=int, default=len(BASE_LAB_TESTS), help="Laborkatalog-Größe (nur für eine leere Datenbank)")
+    parser.add_argument("--diagnoses", type=int, default=len(BASE_DIAGNOSES), help="Diagnosen/Empfehlungen (nur für eine leere Datenbank)")
+    parser.add_argument("--seed", type=int, help="Zufallsstartwert für reproduzierbare Daten")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Fälle pro Transaktion")
+    args = parser.parse_args(argv)
+
+    storage = SQLiteStorage(args.db)
+
+    def progress(written, seconds):
+        print(f"\r{written}/{args.cases} Fälle ({written / seconds if seconds else 0:,.0f} Fälle/s)", end="", file=sys.stderr, flush=True)
+
+    written, seconds = stream_to_storage(storage, args.cases, generate_catalog(args.tests, args.diagnoses, args.seed),
+                                         seed=args.seed, chunk_size=args.chunk_size, on_chunk=progress)
+    print(file=sys.stderr)
+    print(f"{written} Fälle erzeugt in {seconds:.2f} s ({written / seconds if seconds else 0:,.0f} Fälle/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
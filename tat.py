@@ -0,0 +1,169 @@
+# tat.py
+
+import heapq
+import itertools
+from datetime import datetime
+from casestore import local_naive
+from constants import MTS_CATEGORIES, URGENCY_LEVELS
+
+# --- Laborkapazität ---
+ANALYZER_CAPACITY = {'Hämatologie': 2, 'Klinische Chemie': 3, 'Gerinnung': 1, 'Immunologie': 1, 'Mikrobiologie': 1} # Parallele Messplätze je Testkategorie
+DEFAULT_CAPACITY = 1 # Kategorien ohne Eintrag
+IN_FLIGHT_WINDOW_MINUTES = 240 # Ältere Fälle gelten als abgearbeitet
+URGENCY_RANK = {level: rank for rank, level in enumerate(reversed(URGENCY_LEVELS))} # Notfall 0, Dringend 1, Standard 2
+# Die MTS-Kategorie des Falls hebt alle seine Tests mindestens auf diese Dringlichkeit
+MTS_URGENCY = {'Rot': 0, 'Orange': 0, 'Gelb': 1, 'Grün': 2, 'Blau': 2}
+MTS_RANK = {category: rank for rank, category in enumerate(MTS_CATEGORIES)}
+
+_FINISH, _ARRIVAL = 0, 1 # Bei gleicher Zeit zuerst Messplätze freigeben, dann neue Tests einreihen
+
+
+class LabModel:
+    """Statische Labordaten für die Simulation: Testcode -> (Kategorie, Dauer, Dringlichkeitsrang), Messplätze je Kategorie.
+
+    Aus dem Laborkatalog einmal je Katalogstand aufgebaut; unbekannte Testcodes (z.B. gelöschte
+    Tests in Altfällen) belegen keinen Messplatz.
+    """
+
+    def __init__(self, lab_tests, capacity=None):
+        self.tests = {
+            test['test_code']: (test['category'], int(test['estimated_duration_minutes']),
+                                URGENCY_RANK.get(test.get('urgency_level'), len(URGENCY_LEVELS)))
+            for test in lab_tests
+        }
+        self.capacity = {**ANALYZER_CAPACITY, **(capacity or {})}
+
+    def priority(self, test_code, mts_category):
+        """Sortierschlüssel der Warteschlange: effektive Dringlichkeit, dann MTS-Kategorie (kleiner = früher)."""
+        urgency = self.tests[test_code][2]
+        mts_rank = MTS_RANK.get(mts_category, len(MTS_CATEGORIES))
+        return min(urgency, MTS_URGENCY.get(mts_category, urgency)), mts_rank
+
+
+class LabState:
+    """Ereignisgesteuerte Simulation der Analysegeräte mit Prioritätswarteschlangen je Kategorie.
+
+    Zeiten sind Minuten relativ zu einem frei gewählten Nullpunkt (üblicherweise "jetzt").
+    Ereignisse (Ankunft eines Tests, Ende einer Messung) liegen in einem Heap; wartende Tests
+    je Kategorie in einem Heap nach (Priorität, Ankunft). Messungen werden nicht unterbrochen.
+    Ein Lauf kostet O(T log T) für T Tests, auch bei Hunderten gleichzeitiger Aufträge.
+    """
+
+    def __init__(self, model, start=0.0):
+        self.model = model
+        self.time = start
+        self._events = [] # (Zeit, Art, laufende Nr., Auftrag, Testcode, MTS-Kategorie)
+        self._waiting = {} # Kategorie -> Heap (Priorität, Ankunft, laufende Nr., Auftrag, Testcode, MTS-Kategorie)
+        self._busy = {} # Kategorie -> belegte Messplätze
+        self._open = {} # Auftrag -> noch nicht fertige Tests
+        self.finished = {} # Auftrag -> {Testcode: Ende}
+        self._seq = itertools.count()
+
+    def submit(self, order_id, submitted, mts_category, test_codes):
+        """Reiht einen Auftrag ein; liefert die Anzahl simulierter (bekannter) Tests."""
+        known = [code for code in dict.fromkeys(test_codes) if code in self.model.tests]
+        self._open[order_id] = len(known)
+        self.finished[order_id] = {}
+        for code in known:
+            heapq.heappush(self._events, (max(submitted, self.time), _ARRIVAL, next(self._seq), order_id, code, mts_category))
+        return len(known)
+
+    def advance(self, until=None, order_id=None):
+        """Verarbeitet Ereignisse bis ``until`` (inklusive) bzw. bis ``order_id`` fertig ist; ohne beides bis zum Ende."""
+        events = self._events
+        while events and (until is None or events[0][0] <= until):
+            if order_id is not None and not self._open.get(order_id):
+                return
+            time, kind, _, job_order, code, mts_category = heapq.heappop(events)
+            self.time = time
+            category = self.model.tests[code][0]
+            if kind == _FINISH:
+                self._busy[category] -= 1
+                self.finished[job_order][code] = time
+                self._open[job_order] -= 1
+                waiting = self._waiting.get(category)
+                if waiting:
+                    _, _, _, next_order, next_code, next_mts = heapq.heappop(waiting)
+                    self._start(category, next_order, next_code, next_mts)
+            elif self._busy.get(category, 0) < self.model.capacity.get(category, DEFAULT_CAPACITY):
+                self._start(category, job_order, code, mts_category)
+            else:
+                heapq.heappush(self._waiting.setdefault(category, []),
+                               (self.model.priority(code, mts_category), time, next(self._seq), job_order, code, mts_category))
+        if until is not None:
+            self.time = max(self.time, until)
+
+    def _start(self, category, order_id, code, mts_category):
+        self._busy[category] = self._busy.get(category, 0) + 1
+        duration = self.model.tests[code][1]
+        heapq.heappush(self._events, (self.time + duration, _FINISH, next(self._seq), order_id, code, mts_category))
+
+    def copy(self):
+        """Unabhängige Kopie für Was-wäre-wenn-Abfragen (Heaps und Zähler flach kopiert)."""
+        clone = LabState.__new__(LabState)
+        clone.model = self.model
+        clone.time = self.time
+        clone._events = list(self._events)
+        clone._waiting = {category: list(waiting) for category, waiting in self._waiting.items()}
+        clone._busy = dict(self._busy)
+        clone._open = dict(self._open)
+        clone.finished = {order_id: dict(done) for order_id, done in self.finished.items()}
+        clone._seq = itertools.count(next(self._seq))
+        return clone
+
+    def load(self):
+        """Wartende Tests je Kategorie und belegte Messplätze zum aktuellen Zeitpunkt."""
+        return {category: {"waiting": len(self._waiting.get(category, ())), "busy": self._busy.get(category, 0),
+                           "capacity": self.model.capacity.get(category, DEFAULT_CAPACITY)}
+                for category in sorted(set(self._busy) | set(self._waiting))}
+
+    def expected_tat(self, test_codes, mts_category, order_id="__new__"):
+        """Erwartete Durchlaufzeit (Minuten ab ``time``) eines jetzt eingehenden Auftrags.
+
+        Der Zustand selbst bleibt unverändert; simuliert wird auf einer Kopie und nur so weit,
+        bis der neue Auftrag fertig ist. Liefert ``tat`` (Ende des letzten Tests), ``tests``
+        (Ende je Test) und ``processing`` (längste reine Messdauer, das bisherige Schätzmaß).
+        """
+        state = self.copy()
+        now = state.time
+        if not state.submit(order_id, now, mts_category, test_codes):
+            return {"tat": 0.0, "tests": {}, "processing": 0}
+        state.advance(order_id=order_id)
+        done = state.finished[order_id]
+        return {
+            "tat": max(done.values()) - now,
+            "tests": {code: end - now for code, end in done.items()},
+            "processing": max(self.model.tests[code][1] for code in done),
+        }
+
+
+def simulate(model, orders, now=0.0):
+    """Spielt laufende Aufträge ``(id, Eingang, MTS-Kategorie, Testcodes)`` bis ``now`` ab.
+
+    Eingänge liegen in Minuten relativ zu ``now`` (also meist negativ). Das Ergebnis ist der
+    Laborzustand zum Zeitpunkt ``now``, auf dem beliebig viele ``expected_tat``-Abfragen laufen können.
+    """
+    orders = sorted(orders, key=lambda order: order[1])
+    state = LabState(model, start=orders[0][1] if orders else now)
+    for order_id, submitted, mts_category, test_codes in orders:
+        state.submit(order_id, submitted, mts_category, test_codes)
+    state.advance(until=now)
+    return state
+
+
+def case_orders(cases, now):
+    """Fälle -> Aufträge für ``simulate``, Eingang in Minuten relativ zu ``now`` (datetime).
+
+    Zeitpunkte mit Zeitzone (Import, Fremdsysteme) werden wie im Fallspeicher in Ortszeit umgerechnet.
+    """
+    now = local_naive(now)
+    orders = []
+    for case in cases:
+        created = getattr(case, 'created', None) # CaseView: ohne String-Parsing
+        if created is None:
+            try:
+                created = datetime.fromisoformat(case.get('created_date'))
+            except (TypeError, ValueError):
+                continue
+        orders.append((case['id'], (local_naive(created) - now).total_seconds() / 60, case.get('mts_category'), case.get('ordered_tests') or []))
+    return orders
@@ -0,0 +1,70 @@
+# tests/test_analytics.py
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import build_case_frame, cohort_stats, duration_distribution
+from casestore import CompactCaseStore
+from synthetic import generate_dataset
+
+
+def _with_tat(cases, seed):
+    # Ein Teil der Fälle trägt eine erwartete Durchlaufzeit, der Rest nur die Messdauer
+    rng = random.Random(seed)
+    return [dict(case, expected_tat=rng.randint(20, 240)) if rng.random() < 0.5 else case for case in cases]
+
+
+def _reference_duration(case):
+    tat = case.get('expected_tat')
+    return tat if tat is not None else (case.get('estimated_total_duration') or 0)
+
+
+@pytest.mark.parametrize("by, field", [("diagnosis", "suspected_diagnosis"), ("mts_category", "mts_category")])
+def test_cohort_quantiles_match_direct_computation(by, field):
+    cases = _with_tat(generate_dataset(n_cases=400, seed=3)['patient_cases'], seed=3)
+    stats = cohort_stats(build_case_frame(cases), by)
+    durations = {}
+    for case in cases:
+        if case.get(field):
+            durations.setdefault(case[field], []).append(_reference_duration(case))
+    assert set(stats.index) == set(durations)
+    for group, values in durations.items():
+        values = np.sort(values)
+        for q in (0.5, 0.9):
+            # Rangwert: kleinster Wert, bis zu dem mindestens q aller Fälle reichen
+            expected = values[max(int(np.ceil(q * len(values))), 1) - 1]
+            assert stats.loc[group, f"duration_p{int(q * 100)}"] == expected, (group, q)
+        assert stats.loc[group, "duration_mean"] == pytest.approx(values.mean())
+
+
+def test_column_store_uses_expected_tat_with_fallback():
+    cases = _with_tat(generate_dataset(n_cases=200, seed=5)['patient_cases'], seed=5)
+    from_store = build_case_frame(CompactCaseStore(cases))
+    from_dicts = build_case_frame(cases)
+    assert from_store['duration'].tolist() == from_dicts['duration'].tolist()
+    assert from_dicts['duration'].tolist() == [_reference_duration(case) for case in cases]
+
+
+def test_duration_distribution_counts_only_used_values():
+    cases = _with_tat(generate_dataset(n_cases=300, seed=9)['patient_cases'], seed=9)
+    table = duration_distribution(build_case_frame(cases), 'mts_category')
+    reference = pd.crosstab(pd.Series([_reference_duration(c) for c in cases], name="duration"),
+                            pd.Series([c['mts_category'] for c in cases]))
+    assert table.to_numpy().sum() == len(cases)
+    assert list(table.index) == list(reference.index)
+    for group in table.columns:
+        assert table[group].tolist() == reference[group].tolist()
+
+
+def test_quantiles_of_sparse_long_durations():
+    # Einzelne sehr lange Dauern erzeugen kein dichtes Gruppen × Minuten-Raster
+    cases = [{"id": str(i), "suspected_diagnosis": f"D{i % 50_000}", "mts_category": "Gelb",
+              "created_date": "2024-01-01T10:00:00", "expected_tat": 30000 if i == 0 else 10}
+             for i in range(50_000)]
+    stats = cohort_stats(build_case_frame(cases), 'diagnosis')
+    assert len(stats) == 50_000
+    assert stats.loc["D0", "duration_p50"] == 30000
+    assert (stats["duration_p90"].drop("D0") == 10).all()
@@ -0,0 +1,36 @@
+# tests/test_case_stats.py
+
+import random
+
+import quality
+from domain import CaseService, CaseStats
+from storage import SessionStorage
+from synthetic import generate_dataset
+
+
+def test_incremental_stats_match_full_recount():
+    data = generate_dataset(n_cases=50, seed=7)
+    service = CaseService(SessionStorage(), data['patient_cases'], compact_min_garbage=10)
+    catalog = quality.build_test_catalog(data['lab_tests'])
+    rng = random.Random(7)
+    codes = [test['test_code'] for test in data['lab_tests']]
+    for step in range(300):
+        ids = [case['id'] for case in service.cases]
+        action = rng.random()
+        if action < 0.3 or not ids:
+            template = dict(rng.choice(data['patient_cases']))
+            service.create({k: v for k, v in template.items() if k not in ('id', 'case_number', 'created_date')})
+        elif action < 0.6:
+            tests = rng.sample(codes, rng.randint(0, 4))
+            service.update(rng.choice(ids), {"ordered_tests": tests, **quality.evaluate_quality(tests, rng.choice(data['recommendations']), catalog)})
+        elif action < 0.8:
+            service.delete(rng.choice(ids))
+        else:
+            rec = rng.choice(data['recommendations'])
+            service.reevaluate(list(service.cases)[:10], rec, catalog)
+        assert service.stats.matches(service.cases), step
+    assert service.stats.as_dict() == CaseStats(service.cases).as_dict()
+
+
+def test_stats_of_empty_store():
+    assert CaseStats().as_dict() == {"totalCases": 0, "averageTests": 0, "casesWithWarnings": 0, "avgDuration": 0}
@@ -0,0 +1,116 @@
+# tests/test_casestore.py
+
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+import casestore
+from casestore import CompactCaseStore
+from synthetic import generate_dataset
+
+
+@pytest.fixture
+def berlin_time(monkeypatch):
+    # Naive Zeitstempel gelten als Ortszeit; eine feste Zone macht die Umrechnung prüfbar
+    monkeypatch.setenv("TZ", "Europe/Berlin")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _case(case_id, created_date):
+    return {"id": case_id, "suspected_diagnosis": "Sepsis", "mts_category": "Gelb", "created_date": created_date}
+
+
+def test_copy_keeps_cases_order_and_groups(monkeypatch):
+    cases = generate_dataset(n_cases=200, seed=4)['patient_cases']
+    store = CompactCaseStore(cases, group_key=lambda case: case.get('suspected_diagnosis'))
+    for case in cases[:50]:
+        store.replace(dict(case, ordered_tests=["CRP"]))
+    for case in cases[50:80]:
+        store.remove(case['id'])
+
+    def insort_per_row(*args):
+        raise AssertionError("copy soll einmal sortieren statt je Zeile einzufügen")
+    monkeypatch.setattr(CompactCaseStore, '_index', insort_per_row)
+    clone = store.copy()
+
+    assert clone.garbage == 0 and store.garbage == 80
+    assert clone.version == store.version
+    assert [dict(case) for case in clone] == [dict(case) for case in store]
+    assert [dict(case) for case in clone.page(0, 500)] == [dict(case) for case in store.page(0, 500)]
+    for diagnosis in {case['suspected_diagnosis'] for case in cases}:
+        assert sorted(c['id'] for c in clone.group(diagnosis)) == sorted(c['id'] for c in store.group(diagnosis))
+
+
+def test_label_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(casestore, 'LABEL_CACHE_SIZE', 10)
+    store = CompactCaseStore(_case(str(i), f"2024-01-01T10:{i % 60:02}:00") for i in range(100))
+    labels = [case.created_label for case in store]
+    assert len(store._labels) == 10
+    assert labels[7] == "01.01.2024, 10:07"
+    assert store.get("7").created_label == labels[7]
+
+
+def test_mixed_timezones_sort_as_local_time(berlin_time):
+    store = CompactCaseStore([
+        _case("naive-1030", "2024-01-01T10:30:00"),  # Ortszeit = 09:30 UTC
+        _case("utc-0945", "2024-01-01T09:45:00+00:00"),  # = 10:45 Ortszeit
+        _case("utc-0915", "2024-01-01T09:15:00Z"),  # = 10:15 Ortszeit
+    ])
+    assert [case['id'] for case in store.page(0, 10, descending=False)] == ["utc-0915", "naive-1030", "utc-0945"]
+    assert [case['id'] for case in store.since(datetime(2024, 1, 1, 10, 20))] == ["naive-1030", "utc-0945"]
+    aware = datetime(2024, 1, 1, 9, 20, tzinfo=timezone.utc)
+    assert [case['id'] for case in store.since(aware)] == ["naive-1030", "utc-0945"]
+    # Der Originalwert mit Zeitzone bleibt unverändert lesbar
+    assert store.get("utc-0915")['created_date'] == "2024-01-01T09:15:00Z"
+
+
+def test_readers_tolerate_a_concurrent_writer(monkeypatch):
+    # Im SQLite-Betrieb teilen sich Sessions den Speicher: Leser laufen ohne Sperre neben dem Schreiber
+    cases = generate_dataset(n_cases=2000, seed=8)['patient_cases']
+    store = CompactCaseStore(cases, group_key=lambda case: case.get('suspected_diagnosis'))
+    diagnosis = cases[0]['suspected_diagnosis']
+    stop, errors = threading.Event(), []
+
+    def write():
+        i = 0
+        try:
+            while not stop.is_set():
+                case = cases[i % len(cases)]
+                store.remove(case['id'])
+                store.add(dict(case, ordered_tests=[f"X{i}"], created_date=f"2024-02-01T10:{i % 60:02}:00"))
+                i += 1
+        except Exception as exc:  # noqa: BLE001 - z. B. BufferError beim Anhängen an eine exportierte Spalte
+            errors.append(exc)
+
+    def read(fn):
+        try:
+            for _ in range(150):
+                fn()
+        except Exception as exc:  # noqa: BLE001 - jede Ausnahme ist hier ein Befund
+            errors.append(exc)
+
+    readers = [store.column_arrays, store.list_counts, lambda: store.group(diagnosis),
+               lambda: [case.created_label for case in store.page(0, 50)]]
+    writer = threading.Thread(target=write)
+    threads = [threading.Thread(target=read, args=(fn,)) for fn in readers]
+    monkeypatch.setattr(casestore, 'LABEL_CACHE_SIZE', 20)
+    # Häufige Threadwechsel machen Überschneidungen mit dem Schreiber wahrscheinlich
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        writer.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop.set()
+        writer.join()
+        sys.setswitchinterval(switch_interval)
+    assert not errors, errors[:3]
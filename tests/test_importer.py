@@ -0,0 +1,106 @@
+# tests/test_importer.py
+
+import json
+
+import pytest
+
+from importer import RecordError, import_cases, read_records, validate_record
+from storage import SQLiteStorage
+from synthetic import generate_dataset
+
+KNOWN_TESTS = {"TROP", "CK", "BB"}
+
+
+def _raw(**changes):
+    raw = {"patient_number": "P-1", "age": "64", "gender": "Weiblich", "mts_category": "Rot",
+           "suspected_diagnosis": "Akutes  Koronarsyndrom", "created_date": "2025-03-01T08:15:00",
+           "ordered_tests": "TROP;CK", "vitals.heart_rate": "96", "vitals.blood_pressure": "130 / 85"}
+    raw.update(changes)
+    return raw
+
+
+def test_valid_csv_row():
+    case = validate_record(_raw(), KNOWN_TESTS)
+    assert case["age"] == 64
+    assert case["suspected_diagnosis"] == "Akutes Koronarsyndrom"
+    assert case["ordered_tests"] == ["TROP", "CK"]
+    assert case["vitals"] == {"heart_rate": 96, "blood_pressure": "130/85"}
+
+
+@pytest.mark.parametrize("changes", [
+    {"age": "inf"}, {"age": "-inf"}, {"age": "nan"}, {"age": "1e400"}, {"age": "121"}, {"age": "alt"},
+    {"vitals.temperature": "nan"}, {"vitals.temperature": "inf"}, {"vitals.heart_rate": "1e999"},
+    {"vitals.blood_pressure": "hoch"}, {"mts_category": "Lila"}, {"ordered_tests": "XYZ"}, {"ordered_tests": ""},
+    {"created_date": "gestern"}, {"gender": None},
+    {"age": "64.5"}, {"vitals.heart_rate": "96.7"}, {"vitals.oxygen_saturation": True}, {"ordered_tests": 5},
+    {"ordered_tests": ["TROP", 5]}, {"vitals.blood_pressure": 130}, {"symptoms": ["Fieber"]},
+])
+def test_invalid_values_become_record_errors(changes):
+    with pytest.raises(RecordError):
+        validate_record(_raw(**changes), KNOWN_TESTS)
+
+
+@pytest.mark.parametrize("vitals", ["120/80", [96, 98], 42])
+def test_non_object_vitals_in_jsonl(vitals):
+    line = json.dumps({**_raw(), "ordered_tests": ["TROP"], "vitals": vitals})
+    with pytest.raises(RecordError, match="vitals"):
+        validate_record(line, KNOWN_TESTS)
+
+
+def test_whole_number_strings_are_accepted():
+    case = validate_record(_raw(age="64.0", **{"vitals.temperature": "38.5"}), KNOWN_TESTS)
+    assert (case["age"], case["vitals"]["temperature"]) == (64, 38.5)
+
+
+def test_csv_row_with_extra_fields_is_rejected(tmp_path, storage):
+    path = tmp_path / "faelle.csv"
+    header = "patient_number,age,gender,mts_category,suspected_diagnosis,created_date,ordered_tests,vitals.heart_rate"
+    path.write_text("\n".join([
+        header,
+        "P-1,64,Weiblich,Rot,Sepsis,2025-03-01T08:15:00,BB,96",
+        "P-2,64,Weiblich,Rot,Sepsis, Schock,2025-03-01T08:15:00,BB,96",  # Komma ohne Anführungszeichen
+        "P-3,70,Männlich,Gelb,Pneumonie,2025-03-01T09:00:00,BB,",
+    ]) + "\n", encoding="utf-8")
+    report = import_cases(read_records(path), storage, storage.load_catalog(), prefix="IMP")
+    assert (report.imported, report.rejected) == (2, 1)
+    assert report.errors[0][0] == 3 and "Kopfzeile" in report.errors[0][1]
+
+
+def test_invalid_json_line():
+    with pytest.raises(RecordError):
+        validate_record("{kein json", KNOWN_TESTS)
+    with pytest.raises(RecordError):
+        validate_record("[1, 2]", KNOWN_TESTS)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "import.db"))
+    storage.seed(generate_dataset(n_cases=0, seed=5))
+    return storage
+
+
+def test_bad_rows_are_rejected_without_aborting_import(storage):
+    rows = [(1, _raw()), (2, _raw(age="inf")), (3, json.dumps({**_raw(), "vitals": "x"})), (4, _raw(patient_number="P-2"))]
+    report = import_cases(rows, storage, storage.load_catalog(), prefix="IMP", chunk_size=2)
+    assert (report.rows, report.imported, report.rejected) == (4, 2, 2)
+    assert [line for line, _ in report.errors] == [2, 3]
+    assert sorted(c["case_number"] for c in list(storage.iter_cases())) == ["IMP-01", "IMP-02"]
+
+
+def test_failed_chunk_does_not_consume_case_numbers(storage):
+    class FailingStorage(SQLiteStorage):
+        fail = True
+
+        def insert_cases(self, cases):
+            super().insert_cases(cases)
+            if self.fail:
+                raise RuntimeError("Platte voll")
+
+    failing = FailingStorage(storage.path)
+    with pytest.raises(RuntimeError):
+        import_cases([(1, _raw())], failing, storage.load_catalog(), prefix="IMP")
+    assert list(storage.iter_cases()) == []
+    failing.fail = False
+    import_cases([(1, _raw())], failing, storage.load_catalog(), prefix="IMP")
+    assert [c["case_number"] for c in list(storage.iter_cases())] == ["IMP-01"]
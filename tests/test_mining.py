@@ -0,0 +1,86 @@
+# tests/test_mining.py
+
+import random
+from itertools import combinations
+
+import pytest
+
+import mining
+from casestore import CompactCaseStore
+from storage import SQLiteStorage
+from synthetic import generate_dataset
+
+
+def _brute_force_itemsets(transactions, min_count, max_size):
+    items = sorted({bit for mask, _ in transactions for bit in mining._bits(mask)})
+    result = {}
+    for size in range(1, max_size + 1):
+        for combo in combinations(items, size):
+            itemset = sum(combo)
+            count = sum(count for mask, count in transactions if mask & itemset == itemset)
+            if count >= min_count:
+                result[itemset] = count
+    return result
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_fp_growth_matches_brute_force(seed):
+    rng = random.Random(seed)
+    n_items = rng.randint(1, 9)
+    transactions = [(rng.getrandbits(n_items), rng.randint(1, 5)) for _ in range(rng.randint(1, 40))]
+    min_count = rng.randint(1, 15)
+    max_size = rng.choice([2, 3, mining.MAX_ITEMSET_SIZE])
+    assert mining.fp_growth(transactions, min_count, max_size) == _brute_force_itemsets(transactions, min_count, max_size)
+
+
+def test_propose_thresholds():
+    A, B, C, D, E = (1 << i for i in range(5))
+    # 100 Fälle: A+B fast immer (Pflicht), C in 60 davon (empfohlen), D in 25 (optional), E selten
+    masks = {A | B | C: 55, A | B | C | E: 5, A | B | D: 25, A: 10, B | D: 5}
+    result = mining.propose(masks)
+    assert result["cases"] == 100
+    assert result["mandatory"] == A | B
+    assert result["recommended"] == A | B | C
+    assert result["optional"] == D
+    assert result["recommended_support"] == pytest.approx(0.6)
+    assert result["confidence"] == pytest.approx(60 / 85)
+    assert E not in result["test_support"]  # unter MIN_SUPPORT
+    assert result["itemsets"][0] == (A | B, pytest.approx(0.85))
+
+
+def test_propose_without_mandatory_tests():
+    A, B = 1, 2
+    result = mining.propose({A: 50, B: 50})
+    assert result["mandatory"] == 0
+    assert result["recommended"] == A  # Gleichstand: kleinere Maske
+    assert result["confidence"] == pytest.approx(0.5)
+
+
+def test_mine_groups_normalised_diagnoses():
+    transactions = mining.CaseTransactions(["BB", "CRP", "TROP"])
+    transactions.add("Sepsis", "Rot", transactions.mask(["BB", "CRP"]), 30)
+    transactions.add("sepsis ", "Rot", transactions.mask(["BB"]), 10)
+    transactions.add("Sepsis", "Gelb", transactions.mask(["TROP"]), 5)  # unter MIN_CASES
+    proposals = mining.mine(transactions)
+    assert len(proposals) == 1
+    proposal = proposals[0]
+    assert (proposal["diagnosis_name"], proposal["mts_category"], proposal["cases"]) == ("Sepsis", "Rot", 40)
+    assert proposal["mandatory_tests"] == ["BB"]
+    assert proposal["recommended_tests"] == ["BB", "CRP"]
+    assert mining.compare(proposal, {"recommended_tests": ["CRP", "BB"], "mandatory_tests": ["BB"], "optional_tests": []}) == "gleich"
+    assert mining.compare(proposal, {"recommended_tests": ["BB"], "mandatory_tests": ["BB"]}) == "abweichend: Empfohlen"
+    assert mining.compare(proposal, None) == "neu"
+
+
+def test_transaction_sources_agree(tmp_path):
+    data = generate_dataset(n_cases=300, seed=11)
+    codes = [test['test_code'] for test in data['lab_tests']]
+    storage = SQLiteStorage(str(tmp_path / "lab.db"))
+    storage.seed(data)
+    from_dicts = mining.from_cases(data['patient_cases'], codes)
+    from_store = mining.from_cases(CompactCaseStore(data['patient_cases']), codes)
+    # Mehrere Rowid-Bereiche, zusammengeführt per merge (ein Worker: kein fork im Testprozess mit Threads)
+    from_sqlite = mining.scan_sqlite(str(tmp_path / "lab.db"), codes, workers=1, rows_per_task=70)
+    assert from_dicts.groups == from_store.groups == from_sqlite.groups
+    assert len(from_sqlite) == 300
+    assert mining.mine(from_sqlite, min_cases=5) == mining.mine(from_dicts, min_cases=5)
@@ -0,0 +1,36 @@
+# tests/test_monitoring.py
+
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+from instrumentation import metrics
+from utils import ADMIN_TOKEN_ENV
+
+PAGE = str(Path(__file__).resolve().parent.parent / "pages" / "06_Monitoring.py")
+
+
+def _page():
+    return AppTest.from_file(PAGE, default_timeout=60).run()
+
+
+def test_page_locked_without_token(monkeypatch):
+    monkeypatch.delenv(ADMIN_TOKEN_ENV, raising=False)
+    at = _page()
+    assert not at.exception
+    assert ADMIN_TOKEN_ENV in at.warning[0].value
+    assert not [b for b in at.button if b.key == "monitoring_reset"]
+
+
+def test_reset_only_after_correct_token(monkeypatch):
+    monkeypatch.setenv(ADMIN_TOKEN_ENV, "geheim")
+    at = _page()
+    assert not [b for b in at.button if b.key == "monitoring_reset"]
+    at.text_input(key="admin_token").set_value("falsch").run()
+    assert at.error and not [b for b in at.button if b.key == "monitoring_reset"]
+    at.text_input(key="admin_token").set_value("geheim").run()
+    assert not at.exception
+    before = len(metrics.summary()['history'])
+    at.button(key="monitoring_reset").click().run()
+    assert not at.exception
+    assert len(metrics.summary()['history']) < before
@@ -0,0 +1,86 @@
+# tests/test_panel.py
+
+import random
+from itertools import combinations
+
+import pytest
+
+import panel
+from panel import solve_panel
+
+
+def _instance(rng):
+    codes = [f"T{i}" for i in range(rng.randint(3, 10))]
+    costs = {code: rng.choice([4.5, 5.0, 9.0, 12.5, 20.0, 25.0]) for code in codes}
+    durations = {code: rng.choice([15, 30, 45, 60, 90, 120]) for code in codes}
+    groups = {}
+    for g in range(rng.randint(1, 6)):
+        members = rng.sample(codes, rng.randint(1, min(4, len(codes))))
+        groups[f"G{g}"] = (members, rng.choice([1.0, 1.0, 2.0, 0.5])) if rng.random() < 0.5 else members
+    required = rng.sample(codes, rng.randint(0, 2))
+    max_duration = rng.choice([None, 60, 90])
+    budget = rng.choice([None, None, 30.0, 50.0])
+    return costs, durations, required, groups, max_duration, budget
+
+
+def _brute_force(costs, durations, required, groups, max_duration, budget):
+    """Bestes (Gewicht, -Kosten) über alle Teilmengen zulässiger Tests zusätzlich zu den Pflichttests (diese immer, auch über Budget)."""
+    base = round(sum(costs[code] for code in set(required)) * 100)
+    eligible = [code for code in costs if code not in required and (max_duration is None or durations[code] <= max_duration)]
+    best = None
+    for size in range(len(eligible) + 1):
+        for extra in combinations(eligible, size):
+            chosen = set(required) | set(extra)
+            cost = base + round(sum(costs[code] for code in extra) * 100)
+            if extra and budget is not None and cost > round(budget * 100):
+                continue
+            value = sum(group[1] if isinstance(group, tuple) else 1.0
+                        for group in groups.values()
+                        if chosen.intersection(group[0] if isinstance(group, tuple) else group)
+                        and not set(required).intersection(group[0] if isinstance(group, tuple) else group))
+            if best is None or (value, -cost) > best:
+                best = (value, -cost)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(150))
+def test_solver_matches_brute_force(seed):
+    costs, durations, required, groups, max_duration, budget = _instance(random.Random(seed))
+    solution = solve_panel(costs, durations, required=required, groups=groups, max_duration=max_duration, budget=budget, time_limit=10)
+    assert solution["optimal"]
+    tests = solution["tests"]
+    assert tests[:len(set(required))] == list(dict.fromkeys(required))
+    assert all(max_duration is None or durations[code] <= max_duration for code in tests if code not in required)
+    if budget is not None and sum(costs[code] for code in required) <= budget:
+        assert solution["cost"] <= budget + 1e-9
+    value, cost = _brute_force(costs, durations, required, groups, max_duration, budget)
+    assert solution["cost"] == pytest.approx(-cost / 100)
+    covered_value = sum(groups[name][1] if isinstance(groups[name], tuple) else 1.0 for name in solution["covered"])
+    assert covered_value == pytest.approx(value)
+    assert set(solution["covered"]).isdisjoint(solution["uncovered"])
+
+
+def test_required_tests_over_target_are_reported():
+    costs = {"A": 5.0, "B": 9.0, "C": 4.5}
+    durations = {"A": 120, "B": 30, "C": 30}
+    solution = solve_panel(costs, durations, required=["A"], groups={"x": ["B", "C"]}, max_duration=60)
+    assert solution["tests"] == ["A", "C"]
+    assert solution["over_target"] == ["A"]
+    assert solution["duration"] == 120
+
+
+def test_time_limit_returns_greedy_solution():
+    rng = random.Random(1)
+    codes = [f"T{i}" for i in range(60)]
+    costs = {code: rng.uniform(1, 30) for code in codes}
+    durations = dict.fromkeys(codes, 30)
+    groups = {f"G{g}": rng.sample(codes, 5) for g in range(40)}
+    solution = solve_panel(costs, durations, groups=groups, time_limit=0)
+    assert not solution["optimal"]
+    assert not solution["uncovered"]  # Startlösung deckt bereits alles ab
+
+
+def test_cost_falls_back_to_category():
+    assert panel.test_cost({"category": "Gerinnung"}) == 9.0
+    assert panel.test_cost({"category": "Unbekannt"}) == 10.0
+    assert panel.test_cost({"category": "Gerinnung", "cost": "3.5"}) == 3.5
@@ -0,0 +1,137 @@
+# tests/test_providers.py
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from providers import LocalRuleProvider, RemoteRecommendationProvider
+
+FALLBACK = {"diagnosis_name": "lokal", "recommended_tests": ["BB"]}
+DEFAULT_ANSWER = object()
+
+
+class _Service:
+    """Stub-Scoring-Dienst: zählt Anfragen, antwortet nach ``delay`` Sekunden mit den Falldaten."""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.answer = DEFAULT_ANSWER  # sonst diese feste Antwort statt der Empfehlung
+        self.requests = []
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                service.requests.append(body)
+                time.sleep(service.delay)
+                answer = json.dumps({"diagnosis_name": body["diagnosis_name"], "recommended_tests": ["CRP"],
+                                     "mandatory_tests": [], "optional_tests": [], "age": body["case"].get("age")}
+                                    if service.answer is DEFAULT_ANSWER else service.answer).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(answer)))
+                self.end_headers()
+                self.wfile.write(answer)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def service():
+    stub = _Service()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+def _provider(service, **kwargs):
+    return RemoteRecommendationProvider(service.url, fallback=LocalRuleProvider(lambda d, m: FALLBACK), **kwargs)
+
+
+def test_concurrent_identical_requests_are_coalesced(service):
+    service.delay = 0.3
+    provider = _provider(service, timeout=2.0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(provider.recommend("Sepsis", "Rot", {"age": 70})))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(service.requests) == 1
+    assert all(result["age"] == 70 for result in results) and len(results) == 5
+
+
+def test_answers_are_not_shared_between_patients(service):
+    provider = _provider(service)
+    first = provider.recommend("Sepsis", "Rot", {"age": 70})
+    second = provider.recommend("sepsis ", "Rot", {"age": 30})
+    again = provider.recommend("Sepsis", "Rot", {"age": 70})
+    assert (first["age"], second["age"], again["age"]) == (70, 30, 70)
+    assert len(service.requests) == 2  # die Wiederholung kommt aus dem Cache
+
+
+def test_cache_expires_after_ttl(service):
+    provider = _provider(service, cache_ttl=0.2)
+    provider.recommend("Sepsis", "Rot", {"age": 70})
+    provider.recommend("Sepsis", "Rot", {"age": 70})
+    assert len(service.requests) == 1
+    time.sleep(0.3)
+    provider.recommend("Sepsis", "Rot", {"age": 70})
+    assert len(service.requests) == 2
+
+
+def test_slow_service_falls_back_after_timeout(service):
+    service.delay = 1.0
+    provider = _provider(service, timeout=0.2)
+    started = time.monotonic()
+    assert provider.recommend("Sepsis", "Rot", {"age": 70}) == FALLBACK
+    assert time.monotonic() - started < 0.8
+
+
+def test_unreachable_service_falls_back():
+    provider = RemoteRecommendationProvider("http://127.0.0.1:9/", timeout=0.5, fallback=LocalRuleProvider(lambda d, m: FALLBACK))
+    assert provider.recommend("Sepsis", "Rot", {"age": 70}) == FALLBACK
+
+
+def test_cache_is_bounded_and_evicts_oldest(service):
+    provider = _provider(service)
+    provider.MAX_CACHE_ENTRIES = 3
+    for age in range(5):
+        provider.recommend("Sepsis", "Rot", {"age": age})
+    assert len(provider._cache) == 3
+    provider.recommend("Sepsis", "Rot", {"age": 4})
+    provider.recommend("Sepsis", "Rot", {"age": 0})
+    assert len(service.requests) == 6  # Alter 4 noch im Cache, Alter 0 verdrängt
+
+
+@pytest.mark.parametrize("answer", [[], 5, "CRP", {"recommended_tests": ["CRP"]},
+                                    {"recommended_tests": "CRP", "mandatory_tests": [], "optional_tests": []},
+                                    {"recommended_tests": [5], "mandatory_tests": [], "optional_tests": []}])
+def test_malformed_answers_fall_back(service, answer):
+    service.answer = answer
+    provider = _provider(service)
+    assert provider.recommend("Sepsis", "Rot", {"age": 70}) == FALLBACK
+    assert not provider._cache
+
+
+def test_null_answer_falls_back(service):
+    service.answer = None  # JSON null
+    provider = _provider(service)
+    assert provider.recommend("Sepsis", "Rot", {"age": 70}) == FALLBACK
+
+
+def test_patient_number_is_not_sent(service):
+    provider = _provider(service)
+    provider.recommend("Sepsis", "Rot", {"age": 70, "patient_number": "PN-4711"})
+    provider.recommend("Sepsis", "Rot", {"age": 70, "patient_number": "PN-0815"})
+    assert service.requests[0]["case"] == {"age": 70}
+    assert len(service.requests) == 1  # ohne Patientennummer identische Anfrage
@@ -0,0 +1,42 @@
+# tests/test_quality.py
+
+from quality import build_test_catalog, evaluate_quality, evaluate_quality_batch
+
+LAB_TESTS = [
+    {"test_code": "TROP", "estimated_duration_minutes": 30},
+    {"test_code": "CK", "estimated_duration_minutes": 20},
+    {"test_code": "BB", "estimated_duration_minutes": 60},
+]
+
+
+def _rec(mandatory, recommended, optional=()):
+    return {"diagnosis_name": "ACS", "mts_category": "Rot", "mandatory_tests": list(mandatory),
+            "recommended_tests": list(recommended), "optional_tests": list(optional)}
+
+
+def test_missing_and_unnecessary():
+    catalog = build_test_catalog(LAB_TESTS)
+    result = evaluate_quality(["CK", "BB"], _rec(["TROP", "CK"], ["TROP", "CK"]), catalog)
+    assert result == {"missing_tests": ["TROP"], "unnecessary_tests": ["BB"], "estimated_total_duration": 60}
+
+
+def test_empty_order_has_no_hints():
+    catalog = build_test_catalog(LAB_TESTS)
+    assert evaluate_quality([], _rec(["TROP"], ["TROP"]), catalog) == {
+        "missing_tests": [], "unnecessary_tests": [], "estimated_total_duration": 0}
+
+
+def test_batch_does_not_confuse_recommendations_with_same_id():
+    # Ein wiederverwendetes dict hat dieselbe id() wie ein nach GC freigegebenes: Masken dürfen nicht daran hängen
+    catalog = build_test_catalog(LAB_TESTS)
+    variants = [_rec(["TROP"], ["TROP"]), _rec(["BB"], ["BB", "CK"]), _rec([], ["CK"], ["BB"])]
+    buffer = {}
+
+    def items():
+        for i in range(9):
+            buffer.clear()
+            buffer.update(variants[i % 3])
+            yield ["TROP", "CK"], buffer
+
+    expected = [evaluate_quality(["TROP", "CK"], variants[i % 3], catalog) for i in range(9)]
+    assert evaluate_quality_batch(items(), catalog) == expected
@@ -0,0 +1,80 @@
+# tests/test_reevaluation.py
+
+import threading
+import time
+
+import quality
+from domain import CaseService, reevaluation_job
+from jobs import CANCELLED, DONE, JobRunner
+from storage import SQLiteStorage
+from synthetic import generate_dataset
+
+
+def _setup(tmp_path):
+    data = generate_dataset(n_cases=120, seed=21)
+    storage = SQLiteStorage(str(tmp_path / "lab.db"))
+    storage.seed(data)
+    service = CaseService(storage, storage.iter_cases())
+    case = next(iter(service.cases))
+    affected = service.affected(case['suspected_diagnosis'], case['mts_category'])
+    recommendation = {"diagnosis_name": case['suspected_diagnosis'], "mts_category": case['mts_category'],
+                      "recommended_tests": ["BB"], "mandatory_tests": ["BB"], "optional_tests": []}
+    return storage, service, affected, recommendation, quality.build_test_catalog(data['lab_tests'])
+
+
+def _wait(runner, job_id, timeout=30):
+    job = runner.get(job_id)
+    deadline = time.monotonic() + timeout
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_job_applies_updates_without_a_session(tmp_path):
+    storage, service, affected, recommendation, catalog = _setup(tmp_path)
+    runner = JobRunner(max_workers=1)
+    # Kein Session State und niemand, der das Ergebnis abholt
+    job = _wait(runner, runner.submit(reevaluation_job, service, affected, recommendation, catalog, chunk_size=1))
+    assert job.status == DONE
+    assert job.result == {"checked": len(affected), "applied": len(affected)}
+    stored = {case['id']: case for case in storage.iter_cases()}
+    for case in affected:
+        assert service.cases.get(case['id'])['recommended_tests'] == ["BB"]
+        assert stored[case['id']]['recommended_tests'] == ["BB"]
+    assert service.stats.matches(service.cases)
+
+
+def test_cases_changed_meanwhile_are_skipped(tmp_path):
+    _, service, affected, recommendation, catalog = _setup(tmp_path)
+    edited = affected[0]
+    service.update(edited['id'], {"symptoms": "inzwischen bearbeitet"})
+    runner = JobRunner(max_workers=1)
+    job = _wait(runner, runner.submit(reevaluation_job, service, affected, recommendation, catalog))
+    assert job.result['applied'] == len(affected) - 1
+    assert service.cases.get(edited['id'])['symptoms'] == "inzwischen bearbeitet"
+
+
+def test_cancel_keeps_applied_chunks(tmp_path):
+    _, service, affected, recommendation, catalog = _setup(tmp_path)
+    started, release = threading.Event(), threading.Event()
+
+    class Pausing:
+        """Hält den Job nach dem ersten Block an, bis der Abbruch angefordert ist."""
+        def __getattr__(self, name):
+            return getattr(service, name)
+
+        def apply_updates(self, updated, originals=None):
+            applied = service.apply_updates(updated, originals)
+            started.set()
+            release.wait(10)
+            return applied
+
+    runner = JobRunner(max_workers=1)
+    job_id = runner.submit(reevaluation_job, Pausing(), affected, recommendation, catalog, chunk_size=1)
+    started.wait(10)
+    runner.cancel(job_id)
+    release.set()
+    job = _wait(runner, job_id)
+    assert job.status == CANCELLED
+    assert "1 neu bewertet" in job.message
+    assert sum(service.cases.get(case['id'])['recommended_tests'] == ["BB"] for case in affected) == 1
@@ -0,0 +1,93 @@
+# tests/test_rules.py
+
+import operator
+import random
+
+import pytest
+
+from casestore import CompactCaseStore
+from constants import MTS_CATEGORIES
+from quality import normalize_diagnosis
+from rules import OPERATORS, RULE_FIELDS, VitalRuleEngine, case_values
+
+COMPARE = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '=': operator.eq}
+DIAGNOSES = ["Sepsis", "Pneumonie", "Akutes Koronarsyndrom"]
+
+
+def _random_rules(rng, count):
+    # Ganzzahlige Schwellen aus kleinen Bereichen, damit Gleichheit und Schwellenwerte oft getroffen werden
+    return [{
+        "id": str(i),
+        "name": f"Regel {i}",
+        "conditions": [{"field": rng.choice(list(RULE_FIELDS)), "op": rng.choice(OPERATORS), "value": rng.randint(0, 6)}
+                       for _ in range(rng.randint(0, 3))],
+        "tests": ["BB"],
+        "mts_categories": rng.sample(MTS_CATEGORIES, 2) if rng.random() < 0.3 else [],
+        "diagnosis_name": rng.choice(DIAGNOSES).upper() if rng.random() < 0.3 else None,
+    } for i in range(count)]
+
+
+def _reference(rules, values, mts_category, diagnosis_name):
+    """Jede Regel einzeln prüfen."""
+    hits = []
+    for rule in rules:
+        if rule['mts_categories'] and mts_category not in rule['mts_categories']:
+            continue
+        if rule['diagnosis_name'] and (diagnosis_name is None or normalize_diagnosis(diagnosis_name) != normalize_diagnosis(rule['diagnosis_name'])):
+            continue
+        if all(c['field'] in values and COMPARE[c['op']](values[c['field']], c['value']) for c in rule['conditions']):
+            hits.append(rule)
+    return hits
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_engine_matches_direct_evaluation(seed):
+    rng = random.Random(seed)
+    rules = _random_rules(rng, rng.randint(1, 60))
+    engine = VitalRuleEngine(rules)
+    for _ in range(200):
+        values = {field: rng.choice([0, 1, 2.5, 3, 4, 6, 7]) for field in RULE_FIELDS if rng.random() < 0.8}
+        mts_category = rng.choice([*MTS_CATEGORIES, None])
+        diagnosis_name = rng.choice([*DIAGNOSES, "Unbekannt", None])
+        mask = engine.match_mask(values, mts_category, diagnosis_name)
+        hits = [rule for position, rule in enumerate(rules) if mask >> position & 1]
+        assert hits == _reference(rules, values, mts_category, diagnosis_name), (values, mts_category, diagnosis_name)
+
+
+def test_missing_diagnosis_skips_diagnosis_rules():
+    engine = VitalRuleEngine([
+        {"id": "1", "name": "Sepsis-Lactat", "conditions": [{"field": "heart_rate", "op": ">", "value": 100}], "tests": ["LAKT"], "diagnosis_name": "Sepsis"},
+        {"id": "2", "name": "Tachykardie", "conditions": [{"field": "heart_rate", "op": ">", "value": 100}], "tests": ["TROP"]},
+    ])
+    case = {"vitals": {"heart_rate": 130}, "mts_category": "Gelb"}
+    assert [rule['id'] for rule in engine.match(case)] == ["2"]
+    assert [rule['id'] for rule in engine.match({**case, "suspected_diagnosis": " sepsis"})] == ["1", "2"]
+
+
+def test_apply_extends_recommendation():
+    engine = VitalRuleEngine([
+        {"id": "1", "name": "Hypoxie", "conditions": [{"field": "oxygen_saturation", "op": "<", "value": 92}], "tests": ["BGA", "LAKT"], "mandatory": True},
+    ])
+    base = {"diagnosis_name": "Pneumonie", "mts_category": "Gelb", "recommended_tests": ["BB", "LAKT"],
+            "mandatory_tests": ["BB"], "optional_tests": ["BGA", "PCT"], "rationale": "Basis."}
+    case = {"vitals": {"oxygen_saturation": 88}, "mts_category": "Gelb", "suspected_diagnosis": "Pneumonie"}
+    result = engine.apply(base, case)
+    assert result["recommended_tests"] == ["BB", "LAKT", "BGA"]
+    assert result["mandatory_tests"] == ["BB", "BGA", "LAKT"]
+    assert result["optional_tests"] == ["PCT"]
+    assert result["vital_rules"] == ["1"]
+    assert engine.apply(base, {**case, "vitals": {"oxygen_saturation": 97}}) is base
+
+
+@pytest.mark.parametrize("written, expected", [
+    ("130/85", (130, 85)),
+    (" 130 / 85 ", (130, 85)),
+    ("130-85", None),
+    ("7/5", None),
+])
+def test_blood_pressure_parsing(written, expected):
+    values = case_values({"vitals": {"blood_pressure": written}})
+    assert (values.get('systolic'), values.get('diastolic')) == (expected or (None, None))
+    # Der Fallspeicher gibt jede Schreibweise unverändert zurück
+    store = CompactCaseStore([{"id": "1", "vitals": {"blood_pressure": written}}])
+    assert store.get("1")['vitals']['blood_pressure'] == written
@@ -0,0 +1,52 @@
+# tests/test_storage.py
+
+import sqlite3
+import threading
+
+from domain import CaseService
+from storage import SQLiteStorage
+from synthetic import generate_dataset
+
+
+def _storage(tmp_path, n_cases=20):
+    storage = SQLiteStorage(str(tmp_path / "lab.db"))
+    storage.seed(generate_dataset(n_cases=n_cases, seed=3))
+    return storage
+
+
+def test_shared_case_service_with_concurrent_writers(tmp_path):
+    storage = _storage(tmp_path)
+    service = CaseService(storage, storage.iter_cases())
+    template = dict(next(iter(service.cases)))
+
+    def work(worker):
+        for i in range(25):
+            case = service.create({k: v for k, v in template.items() if k not in ('id', 'case_number', 'created_date')})
+            service.update(case['id'], {"age": worker * 100 + i})
+            if i % 5 == 0:
+                service.delete(case['id'])
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stored = list(storage.iter_cases())
+    assert len(service.cases) == len(stored) == 20 + 4 * 20
+    assert sorted(c['id'] for c in service.cases) == sorted(c['id'] for c in stored)
+    assert len({c['case_number'] for c in stored}) == len(stored)
+    assert service.stats.matches(service.cases)
+
+
+def test_unused_case_key_index_is_dropped(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE patient_cases (id TEXT PRIMARY KEY, case_number TEXT NOT NULL UNIQUE, created_date TEXT NOT NULL, "
+                 "suspected_diagnosis TEXT, mts_category TEXT, patient_number TEXT, data TEXT NOT NULL)")
+    conn.execute("CREATE INDEX idx_cases_key ON patient_cases (suspected_diagnosis COLLATE NOCASE, mts_category)")
+    conn.commit()
+    conn.close()
+    SQLiteStorage(path)
+    names = {row[0] for row in sqlite3.connect(path).execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert "idx_cases_key" not in names
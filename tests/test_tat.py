@@ -0,0 +1,75 @@
+# tests/test_tat.py
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from casestore import CompactCaseStore
+from tat import LabModel, case_orders, simulate
+
+LAB_TESTS = [
+    {"test_code": "BB", "category": "Hämatologie", "estimated_duration_minutes": 30, "urgency_level": "Standard"},
+    {"test_code": "GER", "category": "Gerinnung", "estimated_duration_minutes": 60, "urgency_level": "Standard"},
+    {"test_code": "TROP", "category": "Gerinnung", "estimated_duration_minutes": 20, "urgency_level": "Notfall"},
+]
+
+
+@pytest.fixture
+def berlin_time(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Berlin")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def model():
+    return LabModel(LAB_TESTS, capacity={'Gerinnung': 1, 'Hämatologie': 1})
+
+
+def test_idle_lab_tat_is_longest_test(model):
+    result = simulate(model, []).expected_tat(["BB", "GER"], "Grün")
+    assert result == {"tat": 60, "tests": {"BB": 30, "GER": 60}, "processing": 60}
+
+
+def test_unknown_tests_take_no_analyzer(model):
+    assert simulate(model, []).expected_tat(["XYZ"], "Rot")["tat"] == 0.0
+    assert simulate(model, []).expected_tat(["XYZ", "BB"], "Rot")["tests"] == {"BB": 30}
+
+
+def test_queue_and_priority(model):
+    # Ein Gerinnungsplatz, belegt seit 10 min (noch 50 min), ein Standardauftrag wartet
+    state = simulate(model, [("a", -10, "Grün", ["GER"]), ("b", -5, "Grün", ["GER"])])
+    assert state.load()["Gerinnung"] == {"waiting": 1, "busy": 1, "capacity": 1}
+    # Notfalltest überholt den wartenden Standardauftrag: 50 + 20
+    assert state.expected_tat(["TROP"], "Grün")["tat"] == 70
+    # Standard hinter beiden: 50 + 60 + 60
+    assert state.expected_tat(["GER"], "Grün")["tat"] == 170
+    # Rote MTS-Kategorie hebt auch Standardtests an: 50 + 60
+    assert state.expected_tat(["GER"], "Rot")["tat"] == 110
+
+
+def test_expected_tat_leaves_state_unchanged(model):
+    state = simulate(model, [("a", -10, "Grün", ["GER", "BB"])])
+    before = state.load(), state.time
+    first = state.expected_tat(["GER"], "Gelb")
+    assert (state.load(), state.time) == before
+    assert state.expected_tat(["GER"], "Gelb") == first
+
+
+def test_case_orders_with_time_zones(berlin_time, model):
+    # Regression: Fälle mit Zeitzone im created_date führten zu TypeError (naiv minus aware)
+    now = datetime(2024, 1, 1, 12, 0)
+    cases = [
+        {"id": "naive", "created_date": "2024-01-01T11:30:00", "mts_category": "Gelb", "ordered_tests": ["BB"]},
+        {"id": "utc", "created_date": "2024-01-01T10:45:00+00:00", "mts_category": "Gelb", "ordered_tests": ["GER"]},
+        {"id": "broken", "created_date": "gestern", "ordered_tests": ["BB"]},
+    ]
+    expected = [("naive", -30.0, "Gelb", ["BB"]), ("utc", -15.0, "Gelb", ["GER"])]
+    assert case_orders(cases, now) == expected
+    assert case_orders(CompactCaseStore(cases[:2]).page(0, 10, descending=False), now) == expected
+    # Auch ein Bezugszeitpunkt mit Zeitzone passt zu naiven Fällen
+    assert case_orders(cases, now.replace(tzinfo=timezone(timedelta(hours=1)))) == expected
+    simulate(model, expected).expected_tat(["BB"], "Gelb")
@@ -2,110 +2,284 @@
 
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-import random
+from datetime import datetime, timedelta
+import functools
+import hmac
+import math
+import os
+import re
+import tempfile
 import uuid
+from streamlit.delta_generator import DeltaGenerator
+from storage import SessionStorage, SQLiteStorage
+from search import LabTestSearchIndex
+import quality
+from exporter import export_cases
+import analytics
+import mining
+from jobs import JobRunner, DONE, FAILED, CANCELLED
+from synthetic import generate_dataset
+from domain import CaseService, CatalogService, RecommendationService, reevaluation_job
+import instrumentation
+from instrumentation import span, timed, ELEMENT_COUNTER_ENV
+from panel import test_cost
+from tat import LabModel, simulate, case_orders, IN_FLIGHT_WINDOW_MINUTES
+from constants import MTS_CATEGORIES, LABTEST_CATEGORIES, URGENCY_LEVELS, CASE_COMPACT_MIN_GARBAGE
 
 # --- Globale Konstanten ---
-MTS_CATEGORIES = ['Rot', 'Orange', 'Gelb', 'Grün', 'Blau']
-LABTEST_CATEGORIES = ['Hämatologie', 'Klinische Chemie', 'Gerinnung', 'Immunologie', 'Mikrobiologie']
-URGENCY_LEVELS = ['Standard', 'Dringend', 'Notfall']
-FALLNUMMER_PRÄFIX = "2025" # Das Präfix für die fortlaufende Fallnummer
+STORAGE_DB_ENV = "LABASSIST_DB_PATH" # Pfad zur SQLite-Datenbank; ohne Angabe nur Session State
+RECOMMENDER_URL_ENV = "LABASSIST_RECOMMENDER_URL" # Externer Scoring-Dienst; ohne Angabe nur lokales Regelwerk
+ADMIN_TOKEN_ENV = "LABASSIST_ADMIN_TOKEN" # Zugangscode der Monitoring-Seite; ohne Angabe bleibt sie gesperrt
+RECOMMENDER_TIMEOUT_SECONDS = 2.0
+CASE_PAGE_SIZES = [10, 25, 50] # Auswahl für die Seitengröße der Fallliste im Dashboard
+TEST_SEARCH_LIMIT = 25 # Maximale Trefferzahl der Testsuche in Auswahllisten
+JOB_WORKERS = 2 # Threads für Hintergrundjobs (prozessweit, für alle Sessions)
+JOB_POLL_SECONDS = 1.0 # Abfrageintervall der Jobanzeige
+REEVALUATION_INLINE_LIMIT = 2000 # Bis zu so vielen betroffenen Fällen wird direkt neu bewertet, darüber als Job
+INITIAL_CASES = 5 # Beispielfälle ohne gespeicherte Daten
+EXPORT_DOWNLOAD_LIMIT = 200_000 # Bis zu so vielen Fällen Export als Download (liegt komplett im RAM), darüber nur per exporter.py
+WIDGET_ELEMENTS = {'button', 'download_button', 'form_submit_button', 'checkbox', 'toggle', 'radio', 'selectbox', 'multiselect',
+                   'slider', 'select_slider', 'text_input', 'text_area', 'number_input', 'date_input', 'time_input',
+                   'file_uploader', 'color_picker', 'data_editor', 'camera_input', 'chat_input', 'pills', 'segmented_control'} # Elementtypen mit Widget-Zustand
+ELEMENT_COUNTER_STREAMLIT = ((1, 65), (2, 0)) # Streamlit-Versionen [von, bis), mit denen der Elementzähler geprüft ist
+
+# --- Storage-Backend ---
+@st.cache_resource
+def get_storage():
+    """Prozessweites Storage-Backend: SQLite, wenn LABASSIST_DB_PATH gesetzt ist, sonst ohne Persistenz."""
+    db_path = os.environ.get(STORAGE_DB_ENV)
+    return SQLiteStorage(db_path) if db_path else SessionStorage()
+
+# --- Hintergrundjobs ---
+@st.cache_resource
+def get_job_runner():
+    """Prozessweiter Job-Runner; Jobs laufen unabhängig von Reruns der startenden Seite weiter."""
+    return JobRunner(max_workers=JOB_WORKERS)
+
+def submit_job(fn, *args, name=None, **kwargs):
+    """Startet ``fn(context, *args)`` als Job dieser Session und merkt sich die Id im Session State."""
+    job_id = get_job_runner().submit(fn, *args, name=name, owner=st.session_state.session_id, **kwargs)
+    st.session_state.job_ids.append(job_id)
+    return job_id
+
+# --- Instrumentierung ---
+def _streamlit_version():
+    match = re.match(r"(\d+)\.(\d+)", st.__version__)
+    return (int(match[1]), int(match[2])) if match else (0, 0)
+
+def _install_element_counter():
+    """Zählt jedes ausgegebene Element (markdown, button, ...) im laufenden Rerun; nur mit LABASSIST_COUNT_ELEMENTS=1.
+
+    Streamlit bietet dafür keinen öffentlichen Hook: eingehängt wird in die interne Methode
+    ``DeltaGenerator._enqueue``, und nur bei geprüften Versionen (``ELEMENT_COUNTER_STREAMLIT``).
+    Gibt zurück, ob gezählt wird.
+    """
+    lowest, below = ELEMENT_COUNTER_STREAMLIT
+    if os.environ.get(ELEMENT_COUNTER_ENV) != "1" or not lowest <= _streamlit_version() < below:
+        return False
+    enqueue = getattr(DeltaGenerator, '_enqueue', None)
+    if enqueue is None:
+        return False  # Interne Streamlit-API geändert: ohne Elementzähler weiter
+    if getattr(enqueue, 'counts_elements', False):
+        return True
+
+    @functools.wraps(enqueue)
+    def counted(self, delta_type, *args, **kwargs):
+        instrumentation.count_element(delta_type)
+        return enqueue(self, delta_type, *args, **kwargs)
+    counted.counts_elements = True
+    DeltaGenerator._enqueue = counted
+    return True
+
+ELEMENTS_COUNTED = _install_element_counter()
+
+def admin_unlocked():
+    """Zugangsprüfung für Admin-Seiten: Code aus LABASSIST_ADMIN_TOKEN, einmal je Session eingegeben."""
+    token = os.environ.get(ADMIN_TOKEN_ENV)
+    if not token:
+        st.warning(f"Diese Seite ist gesperrt. Zum Freischalten `{ADMIN_TOKEN_ENV}` setzen.", icon="🔒")
+        return False
+    if st.session_state.get('admin_unlocked'):
+        return True
+    entered = st.text_input("Zugangscode", type="password", key="admin_token")
+    if entered and hmac.compare_digest(entered.encode(), token.encode()):
+        st.session_state.admin_unlocked = True
+        return True
+    if entered:
+        st.error("Falscher Zugangscode.", icon="🚫")
+    return False
+
+def _begin_rerun(page):
+    # Durch st.stop/st.rerun abgebrochene Reruns dieser Session enden erst hier, zur Zeit ihrer letzten Messung
+    previous = st.session_state.get('metrics_rerun')
+    if previous is not None:
+        instrumentation.end_rerun(previous, finished=False)
+    st.session_state.metrics_rerun = instrumentation.begin_rerun(page, st.session_state.get('session_id'))
+    instrumentation.section("init_state")
+
+def finish_rerun():
+    """Schließt die Messung des Seitendurchlaufs ab (letzte Zeile jeder Seite)."""
+    instrumentation.end_rerun(st.session_state.pop('metrics_rerun', None))
+
 
 # --- Dummy Data Generator ---
 @st.cache_resource(show_spinner="Lade kritische Daten...")
 def _generate_initial_data():
-    """Erzeugt robuste Initialdaten für die Anwendung."""
-    
-    # Lab Tests (1. Datenquelle)
-    lab_tests_data = [
-        {"id": str(uuid.uuid4()), "test_name": "Troponin T", "test_code": "TROP", "category": "Klinische Chemie", "estimated_duration_minutes": 30, "urgency_level": "Notfall", "unit": "ng/ml", "normal_range": "0-14"},
-        {"id": str(uuid.uuid4()), "test_name": "C-reaktives Protein", "test_code": "CRP", "category": "Klinische Chemie", "estimated_duration_minutes": 45, "urgency_level": "Dringend", "unit": "mg/L", "normal_range": "<5"},
-        {"id": str(uuid.uuid4()), "test_name": "Kreatinkinase", "test_code": "CK", "category": "Klinische Chemie", "estimated_duration_minutes": 20, "urgency_level": "Dringend", "unit": "U/L", "normal_range": "30-200"},
-        {"id": str(uuid.uuid4()), "test_name": "Großes Blutbild", "test_code": "BB", "category": "Hämatologie", "estimated_duration_minutes": 60, "urgency_level": "Standard", "unit": "N/A", "normal_range": "N/A"},
-        {"id": str(uuid.uuid4()), "test_name": "D-Dimere", "test_code": "DD", "category": "Gerinnung", "estimated_duration_minutes": 35, "urgency_level": "Notfall", "unit": "ng/ml", "normal_range": "<500"},
-        {"id": str(uuid.uuid4()), "test_name": "Blutgasanalyse", "test_code": "BGA", "category": "Klinische Chemie", "estimated_duration_minutes": 15, "urgency_level": "Notfall", "unit": "N/A", "normal_range": "N/A"},
-        {"id": str(uuid.uuid4()), "test_name": "Laktat", "test_code": "LAKT", "category": "Klinische Chemie", "estimated_duration_minutes": 15, "urgency_level": "Notfall", "unit": "mmol/L", "normal_range": "<2.0"},
-        {"id": str(uuid.uuid4()), "test_name": "Nierenwerte", "test_code": "NIERE", "category": "Klinische Chemie", "estimated_duration_minutes": 30, "urgency_level": "Dringend", "unit": "N/A", "normal_range": "N/A"},
-    ]
-
-    # Recommendations (2. Datenquelle)
-    recommendations_data = [
-        {"id": str(uuid.uuid4()), "diagnosis_name": "Akutes Koronarsyndrom", "mts_category": "Rot", "recommended_tests": ["TROP", "CK", "BGA"], "mandatory_tests": ["TROP", "CK"], "optional_tests": ["CRP"], "rationale": "Typisches Set für ACS im Notfall. Schnelle Herzmarker-Bestimmung."},
-        {"id": str(uuid.uuid4()), "diagnosis_name": "Pneumonie", "mts_category": "Gelb", "recommended_tests": ["BB", "CRP", "BGA"], "mandatory_tests": ["BB", "CRP"], "optional_tests": ["LAKT"], "rationale": "Entzündungsparameter und respiratorischer Status bei Verdacht auf Lungenentzündung."},
-        {"id": str(uuid.uuid4()), "diagnosis_name": "Lungenembolie", "mts_category": "Orange", "recommended_tests": ["DD", "BGA"], "mandatory_tests": ["DD"], "optional_tests": ["BB"], "rationale": "D-Dimere zum Ausschluss, Atemanalyse aufgrund der Dringlichkeit."},
-        {"id": str(uuid.uuid4()), "diagnosis_name": "Sepsis", "mts_category": "Rot", "recommended_tests": ["BB", "CRP", "LAKT", "NIERE"], "mandatory_tests": ["BB", "CRP", "LAKT"], "optional_tests": [], "rationale": "Umfassende Abklärung bei Verdacht auf schwere systemische Infektion."},
-    ]
-
-    # Diagnoses (3. Datenquelle)
-    diagnoses_data = [
-        {"id": str(uuid.uuid4()), "diagnosis_name": "Akutes Koronarsyndrom", "category": "Kardiovaskulär"},
-        {"id": str(uuid.uuid4()), "diagnosis_name": "Lungenembolie", "category": "Respiratorisch"},
-        {"id": str(uuid.uuid4()), "diagnosis_name": "Pneumonie", "category": "Respiratorisch"},
-        {"id": str(uuid.uuid4()), "diagnosis_name": "Sepsis", "category": "Infektiös"},
-        {"id": str(uuid.uuid4()), "diagnosis_name": "Akutes Nierenversagen", "category": "Nephrologie"},
-    ]
-    
-    # Patient Cases (4. Datenquelle)
-    cases_data = []
-    for i in range(5):
-        rec = random.choice(recommendations_data)
-        ordered_tests = random.sample(rec['recommended_tests'], k=len(rec['recommended_tests']))
-        max_duration = max([t['estimated_duration_minutes'] for t in lab_tests_data if t['test_code'] in ordered_tests], default=0)
-        missing = [t for t in rec['mandatory_tests'] if t not in ordered_tests]
-        unnecessary = [t for t in ordered_tests if t not in (set(rec['recommended_tests']) | set(rec['optional_tests']))]
-
-        cases_data.append({
-            "id": str(uuid.uuid4()),
-            "case_number": f"{FALLNUMMER_PRÄFIX}-{i+1:02}",
-            "mts_category": rec['mts_category'],
-            "suspected_diagnosis": rec['diagnosis_name'],
-            "ordered_tests": ordered_tests,
-            "recommended_tests": rec['recommended_tests'],
-            "missing_tests": missing,
-            "unnecessary_tests": unnecessary,
-            "estimated_total_duration": max_duration,
-            "created_date": (datetime.now() - pd.Timedelta(days=random.randint(0, 7), minutes=random.randint(0, 1440))).isoformat(),
-            "patient_number": f"PN{random.randint(1000, 9999)}",
-            "age": random.randint(18, 90),
-            "gender": random.choice(['Männlich', 'Weiblich', 'Divers']),
-            "symptoms": "Brustschmerz, Kurzatmigkeit",
-            "vitals": {
-                "blood_pressure": f"{random.randint(90, 180)}/{random.randint(60, 120)}",
-                "temperature": round(random.uniform(36.5, 39.5), 1),
-                "heart_rate": random.randint(50, 120),
-                "respiratory_rate": random.randint(12, 30),
-                "oxygen_saturation": random.randint(90, 100),
-                "blood_sugar": random.randint(80, 200)
-            }
-        })
-
-    return {
-        "lab_tests": lab_tests_data,
-        "recommendations": recommendations_data,
-        "diagnoses": diagnoses_data,
-        "patient_cases": cases_data
-    }
+    """Erzeugt robuste Initialdaten für die Anwendung (Basiskatalog und wenige Beispielfälle)."""
+    return generate_dataset(n_cases=INITIAL_CASES)
+
+
+# --- Qualitätsprüfung ---
+@timed("quality.evaluate")
+def evaluate_quality(ordered_tests, recommendation, catalog=None):
+    """Wie ``quality.evaluate_quality``, standardmäßig mit dem Testkatalog der Session."""
+    if catalog is None:
+        catalog = st.session_state.test_catalog
+    return quality.evaluate_quality(ordered_tests, recommendation, catalog)
+
+@timed("quality.evaluate_batch")
+def evaluate_quality_batch(items, catalog=None):
+    """Wie ``quality.evaluate_quality_batch``, standardmäßig mit dem Testkatalog der Session."""
+    if catalog is None:
+        catalog = st.session_state.test_catalog
+    return quality.evaluate_quality_batch(items, catalog)
+
+
+# --- Services (Fachlogik in ``domain``, hier nur an Streamlit angebunden) ---
+@st.cache_resource
+def get_catalog_service():
+    """Prozessweiter Katalog; Sessions übernehmen neue Stände beim nächsten Rerun."""
+    return CatalogService.load(get_storage(), _generate_initial_data)
+
+@st.cache_resource
+def get_recommendation_service():
+    return RecommendationService(get_catalog_service())
+
+@st.cache_resource(show_spinner="Lade Fälle...")
+def _shared_case_service():
+    """Prozessweiter Fallbestand bei persistentem Storage: einmal aus der Datenbank gelesen, von allen Sessions geteilt.
+
+    None ohne Persistenz; dann hat jede Session ihre eigenen Beispielfälle.
+    """
+    storage = get_storage()
+    cases = storage.iter_cases()
+    if cases is None:
+        return None
+    return CaseService(storage, cases, compact_min_garbage=CASE_COMPACT_MIN_GARBAGE)
+
+def get_case_service():
+    """Fallbestand der Session (von ``init_state`` gesetzt; mit Datenbank der prozessweite Bestand)."""
+    return st.session_state.case_service
+
+LAB_TEST_FRAME_COLUMNS = {
+    "test_name": "Testname",
+    "test_code": "Testcode",
+    "category": "Kategorie",
+    "estimated_duration_minutes": "Dauer (min)",
+    "urgency_level": "Dringlichkeit",
+    "unit": "Einheit",
+    "normal_range": "Normalbereich",
+    "cost": "Kosten (€)",
+}
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def lab_test_frame(catalog_version, _lab_tests):
+    """Anzeigetabelle des Laborkatalogs, nur bei neuer Katalogversion neu aufgebaut.
+
+    Kategorie und Dringlichkeit sind kategoriell, die Dauer ganzzahlig, die Kosten effektiv. Der Frame wird
+    zwischen Sessions geteilt und darf nicht verändert werden.
+    """
+    df = pd.DataFrame.from_records(list(_lab_tests), columns=list(LAB_TEST_FRAME_COLUMNS))
+    df['category'] = pd.Categorical(df['category'], categories=LABTEST_CATEGORIES)
+    df['urgency_level'] = pd.Categorical(df['urgency_level'], categories=URGENCY_LEVELS, ordered=True)
+    df['estimated_duration_minutes'] = df['estimated_duration_minutes'].astype('int64')
+    df['cost'] = [test_cost(test) for test in _lab_tests] # ohne eigene Angabe: Standardkosten der Kategorie
+    return df.rename(columns=LAB_TEST_FRAME_COLUMNS)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def lab_test_search_index(catalog_version, _lab_tests):
+    """Suchindex über den Laborkatalog, einmal pro Katalogversion aufgebaut."""
+    return LabTestSearchIndex(_lab_tests)
+
+def lab_test_options(query, keep=(), limit=TEST_SEARCH_LIMIT):
+    """Optionen für Test-Multiselects: bereits gewählte Codes (``keep``) plus die besten Suchtreffer."""
+    index = lab_test_search_index(st.session_state.catalog_version, st.session_state.lab_tests)
+    return list(dict.fromkeys([*keep, *index.search_codes(query, limit)]))
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def lab_model(catalog_version, _lab_tests):
+    """Testdaten und Messplätze für die TAT-Simulation, einmal pro Katalogversion aufgebaut."""
+    return LabModel(_lab_tests)
+
+def lab_state(now=None):
+    """Simulierter Laborzustand zum Zeitpunkt ``now`` aus den laufenden Fällen der Session.
+
+    Wird je Fall- und Katalogstand einmal aus den Fällen der letzten ``IN_FLIGHT_WINDOW_MINUTES``
+    aufgebaut und bei späteren Reruns nur bis zur aktuellen Zeit weitersimuliert.
+    """
+    now = now or datetime.now()
+    cases = get_case_service().cases
+    key = (id(cases), cases.version, st.session_state.catalog_version)
+    cached = st.session_state.get('lab_state_cache')
+    if cached is None or cached[0] != key or now < cached[1]:
+        in_flight = cases.since(now - timedelta(minutes=IN_FLIGHT_WINDOW_MINUTES))
+        model = lab_model(st.session_state.catalog_version, st.session_state.lab_tests)
+        cached = (key, now, simulate(model, case_orders(in_flight, now)))
+        st.session_state.lab_state_cache = cached
+    state = cached[2]
+    state.advance(until=(now - cached[1]).total_seconds() / 60)
+    return state
+
+@timed("tat.expected")
+def expected_tat(ordered_tests, mts_category):
+    """Erwartete Durchlaufzeit eines jetzt eingehenden Auftrags in ganzen Minuten (siehe ``tat.LabState.expected_tat``)."""
+    estimate = lab_state().expected_tat(ordered_tests, mts_category)
+    return {**estimate, "tat": math.ceil(estimate['tat'])}
+
+@timed("panel.suggest")
+def suggest_panel(recommendation, mts_category, selected_tests=()):
+    """Sparvorschlag zur Empfehlung (siehe ``RecommendationService.suggest_panel``) samt Kosten der aktuellen Auswahl.
+
+    Als Dauer je Test dient die simulierte Fertigstellung bei aktueller Laborauslastung,
+    wenn alle Pflicht- und empfohlenen Tests gemeinsam angefordert würden.
+    """
+    service = get_recommendation_service()
+    snapshot = st.session_state.catalog_snapshot
+    candidates = [*recommendation.get('mandatory_tests', []), *recommendation.get('recommended_tests', [])]
+    durations = lab_state().expected_tat(candidates, mts_category)['tests']
+    suggestion = service.suggest_panel(recommendation, mts_category, durations=durations, snapshot=snapshot)
+    costs, _ = service.panel_attributes(snapshot)
+    selected_cost = sum(costs.get(code, 0.0) for code in dict.fromkeys(selected_tests))
+    return {**suggestion, "duration": math.ceil(suggestion['duration']), "selected_cost": selected_cost}
+
+def _use_catalog(snapshot):
+    """Stellt den Snapshot unter den gewohnten Session-State-Schlüsseln bereit (nur Referenzen)."""
+    st.session_state.catalog_snapshot = snapshot
+    st.session_state.catalog_version = snapshot.version
+    st.session_state.lab_tests = snapshot.lab_tests
+    st.session_state.recommendations = snapshot.recommendations
+    st.session_state.diagnoses = snapshot.diagnoses
+    st.session_state.recommendation_index = snapshot.recommendation_index
+    st.session_state.test_catalog = snapshot.test_catalog
+    st.session_state.vital_rules = snapshot.vital_rules
+
 
 # --- Zustandsinitialisierung (Start-up) ---
-def init_state():
+def init_state(page=None):
+    """Lädt Katalog und Fallbestand der Session; mit ``page`` beginnt zugleich die Messung des Reruns."""
+    if page is not None:
+        _begin_rerun(page)
+    _use_catalog(get_catalog_service().snapshot)
+
     if 'data_initialized' not in st.session_state:
-        data = _generate_initial_data()
-        st.session_state.lab_tests = data['lab_tests']
-        st.session_state.recommendations = data['recommendations']
-        st.session_state.diagnoses = data['diagnoses']
-        st.session_state.patient_cases = data['patient_cases']
+        with span("init_state.load_cases"):
+            # Mit Datenbank nur eine Referenz auf den gemeinsamen Bestand, keine Kopie je Session
+            service = _shared_case_service()
+            if service is None:
+                service = CaseService(get_storage(), _generate_initial_data()['patient_cases'], compact_min_garbage=CASE_COMPACT_MIN_GARBAGE)
+            st.session_state.case_service = service
         st.session_state.data_initialized = True
-        
-        # Initialisierung des Fallzählers für fortlaufende Nummerierung
-        latest_case_num = 0
-        if st.session_state.patient_cases:
-            try:
-                latest_case_num = max([int(c['case_number'].split('-')[-1]) for c in st.session_state.patient_cases if c['case_number'].startswith(FALLNUMMER_PRÄFIX)])
-            except:
-                pass
-        st.session_state.case_counter = latest_case_num
-        
+
     # Initialisierung der UI-Zustände (wichtig für Kompatibilität)
     if 'edit_dialog_open' not in st.session_state: st.session_state.edit_dialog_open = False
     if 'new_rec_dialog_open' not in st.session_state: st.session_state.new_rec_dialog_open = False
@@ -115,46 +289,190 @@ def init_state():
     if 'selected_tests' not in st.session_state: st.session_state.selected_tests = []
     if 'current_recommendation' not in st.session_state: st.session_state.current_recommendation = None
     if 'is_analyzing' not in st.session_state: st.session_state.is_analyzing = False
+    if 'cases_page' not in st.session_state: st.session_state.cases_page = 0
+    if 'cases_page_size' not in st.session_state: st.session_state.cases_page_size = CASE_PAGE_SIZES[0]
+    if 'session_id' not in st.session_state: st.session_state.session_id = str(uuid.uuid4())
+    if 'job_ids' not in st.session_state: st.session_state.job_ids = []
+    if 'job_messages' not in st.session_state: st.session_state.job_messages = []
+    collect_finished_jobs()
+
+
+# --- Empfehlungsindex ---
+def find_recommendation(diagnosis_name, mts_category):
+    """Liefert die Empfehlung für Diagnose und MTS-Kategorie in O(1) oder None (Katalogstand der Session)."""
+    return get_recommendation_service().find(diagnosis_name, mts_category, st.session_state.catalog_snapshot)
+
+@timed("mining.cases")
+def mine_recommendations(min_cases=mining.MIN_CASES, **thresholds):
+    """Regelvorschläge aus dem Fallbestand der Session (FP-Growth, siehe ``mining``), in einem Prozess.
+
+    Für große Datenbanken gibt es die Kommandozeile ``python mining.py --db ...`` mit mehreren Prozessen.
+    """
+    test_codes = [test['test_code'] for test in st.session_state.lab_tests]
+    transactions = mining.from_cases(get_case_service().cases, test_codes)
+    return mining.mine(transactions, min_cases, workers=1, **thresholds)
+
+@st.cache_resource
+def get_recommendation_provider():
+    """Prozessweiter Empfehlungs-Provider: externer Dienst mit lokalem Regelwerk als Fallback oder nur lokal."""
+    return get_recommendation_service().provider(os.environ.get(RECOMMENDER_URL_ENV), timeout=RECOMMENDER_TIMEOUT_SECONDS)
 
 
 # --- CRUD Funktionen (ersetzen useMutation) ---
+@timed("cases.create")
 def create_case(data):
     """Generiert die fortlaufende Fallnummer und speichert den Fall."""
-    st.session_state.case_counter += 1
-    new_case_number = f"{FALLNUMMER_PRÄFIX}-{st.session_state.case_counter:02}"
-    
-    data['id'] = str(uuid.uuid4())
-    data['created_date'] = datetime.now().isoformat()
-    data['case_number'] = new_case_number
-    st.session_state.patient_cases.append(data)
+    get_case_service().create(data)
 
+@timed("cases.update")
 def update_case(case_id, data):
-    for i, case in enumerate(st.session_state.patient_cases):
-        if case['id'] == case_id:
-            for key in ['id', 'created_date', 'updated_date', 'created_by']:
-                if key in data:
-                    del data[key]
-            st.session_state.patient_cases[i] = {**case, **data}
-            return True
-    return False
+    return get_case_service().update(case_id, data)
 
+@timed("cases.delete")
 def delete_case(case_id):
-    st.session_state.patient_cases = [c for c in st.session_state.patient_cases if c['id'] != case_id]
+    get_case_service().delete(case_id)
 
+@timed("catalog.create_lab_test")
 def create_lab_test(data):
-    data['id'] = str(uuid.uuid4())
-    data['estimated_duration_minutes'] = int(data['estimated_duration_minutes'])
-    st.session_state.lab_tests.append(data)
+    catalog = get_catalog_service()
+    catalog.create_lab_test(data)
+    _use_catalog(catalog.snapshot)
 
+@timed("catalog.delete_lab_test")
 def delete_lab_test(test_id):
-    st.session_state.lab_tests = [t for t in st.session_state.lab_tests if t['id'] != test_id]
+    catalog = get_catalog_service()
+    catalog.delete_lab_test(test_id)
+    _use_catalog(catalog.snapshot)
 
+@timed("recommendations.create")
 def create_recommendation(data):
-    data['id'] = str(uuid.uuid4())
-    st.session_state.recommendations.append(data)
+    """Legt die Empfehlung an und bewertet die betroffenen Fälle neu; liefert die Anzahl geänderter Fälle."""
+    get_recommendation_service().create(data)
+    _use_catalog(get_catalog_service().snapshot)
+    return reevaluate_cases_for(data['diagnosis_name'], data['mts_category'])
 
+@timed("recommendations.delete")
 def delete_recommendation(rec_id):
-    st.session_state.recommendations = [r for r in st.session_state.recommendations if r['id'] != rec_id]
+    """Löscht die Empfehlung und bewertet die betroffenen Fälle neu; liefert die Anzahl geänderter Fälle."""
+    removed = get_recommendation_service().delete(rec_id)
+    _use_catalog(get_catalog_service().snapshot)
+    if removed is None:
+        return 0
+    return reevaluate_cases_for(removed['diagnosis_name'], removed['mts_category'])
+
+@timed("catalog.create_vital_rule")
+def create_vital_rule(data):
+    """Legt die Vitalregel an; sie gilt ab der nächsten Analyse im Wizard (bestehende Fälle bleiben unverändert)."""
+    catalog = get_catalog_service()
+    catalog.create_vital_rule(data)
+    _use_catalog(catalog.snapshot)
+
+@timed("catalog.delete_vital_rule")
+def delete_vital_rule(rule_id):
+    catalog = get_catalog_service()
+    catalog.delete_vital_rule(rule_id)
+    _use_catalog(catalog.snapshot)
+
+@timed("cases.reevaluate")
+def reevaluate_cases_for(diagnosis_name, mts_category):
+    """Bewertet alle Fälle mit dieser Diagnose/MTS-Kategorie gegen die aktuell gültige Empfehlung neu.
+
+    Die betroffenen Fälle kommen aus dem Gruppenindex des Fallspeichers (kein Durchlauf über
+    alle Fälle); geänderte Fälle werden gesammelt in einer Transaktion gespeichert.
+    Bei mehr als ``REEVALUATION_INLINE_LIMIT`` Fällen läuft die Neubewertung als Hintergrundjob,
+    der die Fälle selbst übernimmt (auch wenn die Session endet); dann wird None geliefert.
+    """
+    service = get_case_service()
+    affected = service.affected(diagnosis_name, mts_category)
+    if not affected:
+        return 0
+    recommendation = find_recommendation(diagnosis_name, mts_category)
+    if len(affected) > REEVALUATION_INLINE_LIMIT:
+        submit_job(reevaluation_job, service, affected, recommendation, st.session_state.test_catalog,
+                   name=f"Neubewertung {diagnosis_name} ({mts_category})")
+        return None
+    return service.reevaluate(affected, recommendation, st.session_state.test_catalog)
+
+def collect_finished_jobs():
+    """Merkt sich eine Meldung pro beendetem Job dieser Session (die Jobs übernehmen ihre Ergebnisse selbst)."""
+    runner = get_job_runner()
+    still_running = []
+    for job_id in st.session_state.job_ids:
+        job = runner.get(job_id)
+        if job is None:
+            continue
+        if not job.done:
+            still_running.append(job_id)
+            continue
+        if job.status == DONE and job.result and job.result['applied']:
+            st.session_state.job_messages.append(f"{job.name}: {job.result['applied']} Fälle neu bewertet.")
+        elif job.status == DONE:
+            st.session_state.job_messages.append(f"{job.name}: keine Änderungen.")
+        elif job.status == FAILED:
+            st.session_state.job_messages.append(f"{job.name} fehlgeschlagen: {job.error}")
+        elif job.status == CANCELLED:
+            st.session_state.job_messages.append(f"{job.name} abgebrochen ({job.message or 'vor dem Start'}).")
+        runner.forget(job_id)
+    st.session_state.job_ids = still_running
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _job_status_fragment():
+    runner = get_job_runner()
+    jobs = [job for job in map(runner.get, st.session_state.job_ids) if job is not None]
+    if any(job.done for job in jobs) or not jobs:
+        st.rerun()  # ganze Seite neu laufen lassen, damit sie die übernommenen Fälle zeigt
+    for job in jobs:
+        col_progress, col_cancel = st.columns([5, 1], vertical_alignment="center")
+        with col_progress:
+            st.progress(job.progress, text=f"**{job.name}** – {job.message or 'wartet...'}")
+        with col_cancel:
+            if st.button("Abbrechen", key=f"cancel_job_{job.id}", disabled=job.cancel_requested):
+                runner.cancel(job.id)
+
+def render_jobs():
+    """Zeigt Meldungen beendeter Jobs und pollt laufende Jobs dieser Session, ohne die Seite zu blockieren."""
+    for message in st.session_state.job_messages:
+        st.toast(message, icon="⚙️")
+    st.session_state.job_messages = []
+    if st.session_state.job_ids:
+        _job_status_fragment()
+
+
+# --- Auswertungen ---
+@timed("analytics.case_frame")
+def case_frame():
+    """Spaltenorientierte Fallübersicht für die Analysen, pro Session einmal je Datenstand gebaut."""
+    cases = get_case_service().cases
+    cached = st.session_state.get('case_frame_cache')
+    if cached is None or cached[0] is not cases or cached[1] != cases.version:
+        cached = (cases, cases.version, analytics.build_case_frame(cases))
+        st.session_state.case_frame_cache = cached
+    return cached[2]
+
+
+# --- Export ---
+def case_export(fmt, compression=None):
+    """Liefert eine Funktion für ``st.download_button(data=...)``, die den Export erst beim Klick erzeugt.
+
+    Die Fälle werden blockweise in eine temporäre Datei geschrieben (mit SQLite direkt aus
+    der Datenbank, sonst aus einer Momentaufnahme der Session); der Rerun bleibt unberührt.
+    Streamlit liest die fertige Datei für den Download allerdings vollständig in den
+    Speicher, der Speicherbedarf wächst also mit der Exportgröße. Deshalb bietet das
+    Dashboard den Download nur bis ``EXPORT_DOWNLOAD_LIMIT`` Fälle an; größere Bestände
+    exportiert ``python exporter.py`` direkt in eine Datei (konstanter Speicher).
+    """
+    storage = get_storage()
+    cases = get_case_service().cases
+
+    def build():
+        source = storage.iter_cases()
+        if source is None:
+            source = cases.snapshot()
+        target = tempfile.TemporaryFile()
+        export_cases(source, target, fmt, compression)
+        target.seek(0)
+        return target
+    return build
 
 
 # --- Styling Helper ---
@@ -177,6 +495,7 @@ LAB_CATEGORIES_BADGE_MAP = {
     'Mikrobiologie': 'bg-amber-100 text-amber-800'
 }
 
+@timed("custom_css")
 def custom_css():
     """Definiert das optimierte, bombastische CSS für die Streamlit-App."""
     